@@ -1,80 +1,292 @@
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
+from tkinter import ttk, scrolledtext, messagebox, filedialog
 import threading, sys
-import pythoncom   # <--- important pour COM/Outlook
-from traitement_npai import pipeline
-from couts_et_graphique import main as analyse_main
+import functools
+import queue
+import itertools
+import multiprocessing
+import progression
+# pythoncom, traitement_npai (pandas, pyarrow), couts_et_graphique et recherche_npai sont importés au premier
+# lancement d'un traitement, dans le thread de travail : la fenêtre s'ouvre tout de suite.
+
+INTERVALLE_POMPE_MS = 100        # fréquence de vidage de la file dans la boucle Tk
+MAX_EVENEMENTS_PAR_TOUR = 5000   # au-delà, la suite attend le tour suivant (l'interface reste réactive)
+MAX_LIGNES_LOG = 5000            # lignes conservées dans chaque journal
+
+
+# ======== Onglet de traitement (widgets manipulés uniquement depuis la boucle Tk) ========
+class Onglet:
+    def __init__(self, progress, etape, log):
+        self.progress = progress
+        self.etape = etape
+        self.log = log
+
+    def ajouter_log(self, texte):
+        self.log.insert("end", texte)
+        nb_lignes = int(self.log.index("end-1c").split(".")[0])
+        if nb_lignes > MAX_LIGNES_LOG:
+            self.log.delete("1.0", f"{nb_lignes - MAX_LIGNES_LOG + 1}.0")
+        self.log.see("end")
+
+    def afficher(self, evt):
+        if evt.total:
+            self.progress.stop()
+            self.progress.config(mode="determinate", maximum=evt.total, value=evt.fait or 0)
+            self.etape.config(text=f"{evt.etape} : {evt.fait or 0} / {evt.total}")
+        else:
+            if str(self.progress.cget("mode")) != "indeterminate":
+                self.progress.config(mode="indeterminate", value=0)
+                self.progress.start()
+            self.etape.config(text=evt.etape if evt.fait is None else f"{evt.etape} : {evt.fait}")
+
+    def demarrer(self, btn):
+        btn.config(state="disabled")
+        self.progress.config(mode="indeterminate", value=0)
+        self.progress.start()
+        self.etape.config(text="En cours…")
+
+    def terminer(self, btn, erreur):
+        self.progress.stop()
+        btn.config(state="normal")
+        if erreur is None:
+            self.progress.config(mode="determinate", maximum=1, value=1)
+            self.etape.config(text="Terminé")
+        else:
+            self.progress.config(mode="determinate", value=0)
+            self.etape.config(text="Erreur")
+            messagebox.showerror("Erreur", erreur)
+
+
+# ======== File de logs / événements (thread-safe) ========
+class BusEvenements:
+    """
+    Les threads de travail ne touchent jamais Tk : print, progression et fin de tâche sont mis
+    en file, puis la boucle Tk vide la file par lots (after). Chaque événement est rattaché à
+    l'onglet de la tâche qui l'émet (nom du thread, sans le suffixe "/étage" des threads lancés par
+    la tâche ; onglet de la dernière tâche sinon).
+    """
+    def __init__(self):
+        self.file = queue.Queue()
+        self.cibles = {}
+        self.defaut = None
+
+    def enregistrer(self, nom_thread, onglet):
+        self.cibles[nom_thread] = onglet
+        self.defaut = onglet
+
+    def _cible(self):
+        return self.cibles.get(threading.current_thread().name.split("/")[0], self.defaut)
+
+    def log(self, msg):
+        self.file.put(("log", self._cible(), msg))
+
+    def progres(self, evt):
+        self.file.put(("progres", self._cible(), evt))
+
+    def fin(self, onglet, btn, erreur):
+        self.file.put(("fin", onglet, (btn, erreur)))
+
+    def pomper(self, root):
+        textes, progres, fins = {}, {}, []
+        for _ in range(MAX_EVENEMENTS_PAR_TOUR):
+            try:
+                genre, onglet, contenu = self.file.get_nowait()
+            except queue.Empty:
+                break
+            if onglet is None:
+                continue
+            if genre == "log":
+                textes.setdefault(onglet, []).append(contenu)
+            elif genre == "progres":
+                progres[onglet] = contenu          # seul le dernier état compte
+            else:
+                progres.pop(onglet, None)
+                fins.append((onglet, contenu))
+        for onglet, morceaux in textes.items():
+            onglet.ajouter_log("".join(morceaux))   # une insertion par lot, pas par print
+        for onglet, evt in progres.items():
+            onglet.afficher(evt)
+        for onglet, (btn, erreur) in fins:
+            onglet.terminer(btn, erreur)
+        root.after(INTERVALLE_POMPE_MS, self.pomper, root)
+
+
+BUS = BusEvenements()
+_numeros_taches = itertools.count(1)
 
 
 # ======== Redirection des logs ========
 class RedirectLogs:
-    def __init__(self, widget):
-        self.widget = widget
     def write(self, msg):
-        self.widget.insert("end", msg)
-        self.widget.see("end")
+        if msg:
+            BUS.log(msg)
     def flush(self):
         pass
 
 
+# ======== Traitements (imports différés) ========
+def pipeline(**kwargs):
+    from traitement_npai import pipeline as lancer
+    lancer(**kwargs)
+
+
+def exporter_classeurs():
+    from traitement_npai import exporter_excel
+    exporter_excel()
+
+
+def analyse_main():
+    from couts_et_graphique import main as lancer
+    lancer()
+
+
+def recherche_contrats(texte=None, chemin=None):
+    import recherche_npai
+    contrats = recherche_npai.lire_fichier_contrats(chemin) if chemin else recherche_npai.lire_contrats(texte)
+    if not contrats:
+        print("ℹ️ Aucun contrat à rechercher")
+        return
+    recherche_npai.mettre_a_jour_index()    # immédiat si rien n'a été intégré depuis
+    recherche_npai.afficher_contrats(contrats)
+
+
+def comptes_par_type(debut, fin):
+    import recherche_npai
+    recherche_npai.mettre_a_jour_index()
+    recherche_npai.afficher_comptes(debut, fin)
+
+
 # ======== Fonction générique pour exécuter un traitement ========
-def run_task(func, btn, progress, use_com=False):
+def run_task(func, btn, onglet, use_com=False):
+    nom = f"tache-{next(_numeros_taches)}"
+
     def wrapper():
-        btn.config(state="disabled")
-        progress.start()
+        erreur, com = None, None
         try:
             if use_com:
+                import pythoncom   # <--- important pour COM/Outlook
                 pythoncom.CoInitializeEx(pythoncom.COINIT_APARTMENTTHREADED)
+                com = pythoncom
             func()
         except Exception as e:
-            messagebox.showerror("Erreur", str(e))
+            erreur = str(e)
         finally:
-            if use_com:
-                pythoncom.CoUninitialize()
-            btn.config(state="normal")
-            progress.stop()
-    threading.Thread(target=wrapper, daemon=True).start()
+            if com is not None:
+                com.CoUninitialize()
+            BUS.fin(onglet, btn, erreur)
+
+    onglet.demarrer(btn)
+    BUS.enregistrer(nom, onglet)
+    threading.Thread(target=wrapper, name=nom, daemon=True).start()
 
 
 # ======== Interface principale ========
-root = tk.Tk()
-root.title("Outil RA NPAI")
-root.geometry("700x500")
+def main():
+    root = tk.Tk()
+    root.title("Outil RA NPAI")
+    root.geometry("700x500")
+
+    notebook = ttk.Notebook(root)
+    frame1 = ttk.Frame(notebook)
+    frame2 = ttk.Frame(notebook)
+    frame3 = ttk.Frame(notebook)
+    notebook.add(frame1, text="Pipeline NPAI")
+    notebook.add(frame2, text="Analyse Frais")
+    notebook.add(frame3, text="Recherche contrats")
+    notebook.pack(expand=True, fill="both")
+
+    # --- Onglet 1 : Pipeline NPAI ---
+    btn_run1 = ttk.Button(frame1, text="Lancer pipeline",
+                          command=lambda: run_task(pipeline, btn_run1, onglet1, use_com=True))
+    btn_run1.pack(pady=5)
+
+    btn_rebuild1 = ttk.Button(frame1, text="Reconstruction totale",
+                              command=lambda: run_task(lambda: pipeline(reconstruction_totale=True),
+                                                       btn_rebuild1, onglet1, use_com=True))
+    btn_rebuild1.pack(pady=5)
+
+    btn_export1 = ttk.Button(frame1, text="Exporter les classeurs Excel",
+                             command=lambda: run_task(exporter_classeurs, btn_export1, onglet1))
+    btn_export1.pack(pady=5)
+
+    progress1 = ttk.Progressbar(frame1, mode="indeterminate")
+    progress1.pack(fill="x", padx=10, pady=5)
+    etape1 = ttk.Label(frame1, text="")
+    etape1.pack(fill="x", padx=10)
+
+    log1 = scrolledtext.ScrolledText(frame1, wrap="word", height=15)
+    log1.pack(expand=True, fill="both", padx=10, pady=5)
+    onglet1 = Onglet(progress1, etape1, log1)
+
+
+    # --- Onglet 2 : Analyse Frais ---
+    btn_run2 = ttk.Button(frame2, text="Lancer analyse frais",
+                          command=lambda: run_task(analyse_main, btn_run2, onglet2))
+    btn_run2.pack(pady=5)
+
+    progress2 = ttk.Progressbar(frame2, mode="indeterminate")
+    progress2.pack(fill="x", padx=10, pady=5)
+    etape2 = ttk.Label(frame2, text="")
+    etape2.pack(fill="x", padx=10)
 
-notebook = ttk.Notebook(root)
-frame1 = ttk.Frame(notebook)
-frame2 = ttk.Frame(notebook)
-notebook.add(frame1, text="Pipeline NPAI")
-notebook.add(frame2, text="Analyse Frais")
-notebook.pack(expand=True, fill="both")
+    log2 = scrolledtext.ScrolledText(frame2, wrap="word", height=15)
+    log2.pack(expand=True, fill="both", padx=10, pady=5)
+    onglet2 = Onglet(progress2, etape2, log2)
 
-# --- Onglet 1 : Pipeline NPAI ---
-btn_run1 = ttk.Button(frame1, text="Lancer pipeline",
-                      command=lambda: run_task(lambda: pipeline(reconstruction_totale=True),
-                                               btn_run1, progress1, use_com=True))
-btn_run1.pack(pady=5)
+    # --- Onglet 3 : Recherche contrats (historique indexé par SCS-CONTRAT) ---
+    # Les saisies sont lues ici, dans la boucle Tk, puis passées à la tâche
+    ttk.Label(frame3, text="Contrats SCS (un par ligne, collés depuis Excel) :").pack(anchor="w", padx=10, pady=(5, 0))
+    contrats3 = tk.Text(frame3, height=4)
+    contrats3.pack(fill="x", padx=10)
 
-progress1 = ttk.Progressbar(frame1, mode="indeterminate")
-progress1.pack(fill="x", padx=10, pady=5)
+    ligne3 = ttk.Frame(frame3)
+    ligne3.pack(fill="x", padx=10, pady=5)
+    btn_chercher3 = ttk.Button(ligne3, text="Rechercher", command=lambda: run_task(
+        functools.partial(recherche_contrats, texte=contrats3.get("1.0", "end")), btn_chercher3, onglet3))
+    btn_chercher3.pack(side="left")
 
-log1 = scrolledtext.ScrolledText(frame1, wrap="word", height=15)
-log1.pack(expand=True, fill="both", padx=10, pady=5)
+    def charger_liste():
+        chemin = filedialog.askopenfilename(title="Liste de contrats",
+                                            filetypes=[("Listes", "*.txt *.csv *.xlsx"), ("Tous", "*.*")])
+        if chemin:
+            run_task(functools.partial(recherche_contrats, chemin=chemin), btn_liste3, onglet3)
+    btn_liste3 = ttk.Button(ligne3, text="Charger une liste…", command=charger_liste)
+    btn_liste3.pack(side="left", padx=5)
 
-# Rediriger stdout/stderr vers log1
-sys.stdout = RedirectLogs(log1)
-sys.stderr = RedirectLogs(log1)
+    ttk.Label(ligne3, text="Du").pack(side="left", padx=(20, 2))
+    debut3 = ttk.Entry(ligne3, width=11)
+    debut3.pack(side="left")
+    ttk.Label(ligne3, text="au").pack(side="left", padx=2)
+    fin3 = ttk.Entry(ligne3, width=11)
+    fin3.pack(side="left")
+    btn_comptes3 = ttk.Button(ligne3, text="Compter par type", command=lambda: run_task(
+        functools.partial(comptes_par_type, debut3.get(), fin3.get()), btn_comptes3, onglet3))
+    btn_comptes3.pack(side="left", padx=5)
 
+    progress3 = ttk.Progressbar(frame3, mode="indeterminate")
+    progress3.pack(fill="x", padx=10, pady=5)
+    etape3 = ttk.Label(frame3, text="")
+    etape3.pack(fill="x", padx=10)
 
-# --- Onglet 2 : Analyse Frais ---
-btn_run2 = ttk.Button(frame2, text="Lancer analyse frais",
-                      command=lambda: run_task(analyse_main, btn_run2, progress2))
-btn_run2.pack(pady=5)
+    # résultats en tableau : pas de retour à la ligne, police à chasse fixe, défilement horizontal
+    log3 = scrolledtext.ScrolledText(frame3, wrap="none", height=15, font=("Consolas", 9))
+    defilement3 = ttk.Scrollbar(frame3, orient="horizontal", command=log3.xview)
+    log3.config(xscrollcommand=defilement3.set)
+    log3.pack(expand=True, fill="both", padx=10, pady=(5, 0))
+    defilement3.pack(fill="x", padx=10, pady=(0, 5))
+    onglet3 = Onglet(progress3, etape3, log3)
 
-progress2 = ttk.Progressbar(frame2, mode="indeterminate")
-progress2.pack(fill="x", padx=10, pady=5)
+    # Logs et progression des traitements : mis en file, affichés par la boucle Tk
+    BUS.defaut = onglet1
+    sys.stdout = RedirectLogs()
+    sys.stderr = RedirectLogs()
+    progression.abonner(BUS.progres)
+    BUS.pomper(root)
 
-log2 = scrolledtext.ScrolledText(frame2, wrap="word", height=15)
-log2.pack(expand=True, fill="both", padx=10, pady=5)
+    root.mainloop()
 
 
-root.mainloop()
+if __name__ == "__main__":
+    # Requis pour les processus de lecture CSV (Windows / exécutable PyInstaller)
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,117 @@
+"""
+Banc d'essai : dédoublonnage à l'ajout d'un lot dans un stockage existant.
+- lignes : ancien chemin (relecture complète des partitions touchées, concat + duplicated) contre
+  l'index d'empreintes de stockage_npai.ajouter_lignes (seules les empreintes sont relues) ;
+- 'Sans doublons' : ancien tri global sur l'écart de date + drop_duplicates contre la réduction par
+  contrat de traitement_npai.reduire_sans_doublons.
+Durée et pic de mémoire du processus (au-dessus du niveau de départ) de chaque chemin ; les résultats
+sont comparés.
+
+    python benchmarks/bench_dedoublonnage.py --lignes 1000000 --ajout 10000
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import donnees_synthetiques as ds   # noqa: E402
+import stockage_npai                # noqa: E402
+import mesures_npai                 # noqa: E402
+import traitement_npai              # noqa: E402
+
+
+def ancien_ajout(dossier, df, brouillon):
+    """
+    Doublons cherchés en relisant toutes les lignes des partitions touchées, puis partition réécrite
+    entière (ici dans `brouillon`, le stockage n'est pas modifié).
+    """
+    dates = stockage_npai.lire_dates(df[stockage_npai.COLONNE_PARTITION])
+    ajoutees = 0
+    for (an, mo), idx in df.groupby([dates.dt.year, dates.dt.month], dropna=False).groups.items():
+        rep = stockage_npai.chemin_partition(dossier, stockage_npai.cle_partition(an, mo))
+        nouvelles = df.loc[idx].drop_duplicates()
+        existantes = stockage_npai.sans_colonnes_internes(
+            stockage_npai.lire_fichiers(stockage_npai.lister_fichiers_partition(rep)))
+        fusion = pd.concat([existantes, nouvelles], ignore_index=True)
+        deja = fusion.duplicated().to_numpy()[len(existantes):]
+        pd.concat([existantes, nouvelles[~deja]], ignore_index=True).to_parquet(
+            os.path.join(brouillon, "partition.parquet"), index=False)
+        ajoutees += int((~deja).sum())
+    return ajoutees
+
+
+def ancien_sans_doublons(candidats):
+    return (
+        candidats
+        .dropna(subset=["SCS-CONTRAT", "DATE TRAITEMENT PND"])
+        .assign(Diff=lambda x: (stockage_npai.lire_dates(x["DATE TRAITEMENT PND"])
+                                - traitement_npai.DATE_COMPARAISON).abs())
+        .sort_values("Diff", kind="mergesort")
+        .drop_duplicates(subset=["SCS-CONTRAT"], keep="first")
+        .drop(columns=["Diff"])
+    )
+
+
+def mesurer(fn):
+    depart = mesures_npai.memoire_processus() or 0
+    pic, fin = [depart], threading.Event()
+
+    def relever():
+        while not fin.wait(0.01):
+            pic[0] = max(pic[0], mesures_npai.memoire_processus() or 0)
+
+    releve = threading.Thread(target=relever, daemon=True)
+    releve.start()
+    t0 = time.perf_counter()
+    resultat = fn()
+    duree = time.perf_counter() - t0
+    fin.set()
+    releve.join()
+    return resultat, duree, pic[0] - depart
+
+
+def afficher(nom, ancien, nouveau):
+    print(f"{nom:<16} ancien {ancien[1]:8.3f} s {ancien[2] / 2**20:8.1f} Mo   "
+          f"nouveau {nouveau[1]:8.3f} s {nouveau[2] / 2**20:8.1f} Mo   gain {ancien[1] / nouveau[1]:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lignes", type=int, default=200_000, help="lignes déjà présentes dans le stockage")
+    parser.add_argument("--ajout", type=int, default=None, help="lignes du lot ajouté (défaut : 1 %%, dont la moitié déjà vue)")
+    args = parser.parse_args()
+    nb_ajout = args.ajout or max(2, args.lignes // 100)
+
+    dossier = tempfile.mkdtemp(prefix="bench_dedoublonnage_")
+    try:
+        historique = ds.generer_lignes(args.lignes, graine=1)
+        stockage_npai.ajouter_lignes(os.path.join(dossier, "store"), historique)
+        lot = pd.concat([historique.sample(nb_ajout // 2, random_state=2),
+                         ds.generer_lignes(nb_ajout - nb_ajout // 2, graine=2)], ignore_index=True)
+
+        # nouveau chemin mesuré en premier : la mémoire libérée par l'autre ne fausse pas son pic
+        copie = os.path.join(dossier, "copie")
+        shutil.copytree(os.path.join(dossier, "store"), copie)
+        nouveau = mesurer(lambda: stockage_npai.ajouter_lignes(os.path.join(dossier, "store"), lot))
+        ancien = mesurer(lambda: ancien_ajout(copie, lot, tempfile.mkdtemp(dir=dossier)))
+        assert ancien[0] == nouveau[0], f"lignes ajoutées différentes : {ancien[0]} / {nouveau[0]}"
+        afficher("lignes", ancien, nouveau)
+
+        candidats = pd.concat([historique, lot], ignore_index=True)[traitement_npai.COLONNES_VOULUES]
+        nouveau = mesurer(lambda: traitement_npai.reduire_sans_doublons(candidats))
+        ancien = mesurer(lambda: ancien_sans_doublons(candidats))
+        par_contrat = lambda df: df.sort_values("SCS-CONTRAT").reset_index(drop=True)
+        assert par_contrat(ancien[0]).equals(par_contrat(nouveau[0])), "gagnants différents"
+        afficher("sans doublons", ancien, nouveau)
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Banc d'essai : lecture des CSV Asterion, ancien chemin (sep=None / moteur python, relecture en latin1
+en cas d'échec) contre lecture_csv.lire_csv (extrait + moteur C), en vue complète et en vue étroite.
+
+    python benchmarks/bench_lecture_csv.py --lignes 200000 --repetitions 3
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lecture_csv  # noqa: E402
+
+COLONNES_VOULUES = ["ENTITÉ", "TYPE DE DOCUMENT", "SCS-CONTRAT", "DATE RÉCEPTION", "DATE TRAITEMENT PND"]
+TYPES = ["Facture", "Relance", "Courrier simple", "Duplicata facture", "Facture PDF", "Relançe"]
+
+
+def generer_csv(chemin, nb_lignes, sep, encodage, graine=0):
+    rnd = random.Random(graine)
+    df = pd.DataFrame({
+        "ENTITÉ": [rnd.choice(["SFR", "RED", "SFR Pro"]) for _ in range(nb_lignes)],
+        "TYPE DE DOCUMENT": [rnd.choice(TYPES) for _ in range(nb_lignes)],
+        "SCS-CONTRAT": [rnd.randrange(10**8, 10**9) for _ in range(nb_lignes)],
+        "DATE RÉCEPTION": [f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025" for _ in range(nb_lignes)],
+        "DATE TRAITEMENT PND": [f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025" for _ in range(nb_lignes)],
+        "ADRESSE": [f"{rnd.randint(1, 200)} rue de l'Église" for _ in range(nb_lignes)],
+        "COMMENTAIRE": [rnd.choice(["", "Destinataire inconnu", "Adresse incomplète"]) for _ in range(nb_lignes)],
+    })
+    df.to_csv(chemin, sep=sep, encoding=encodage, index=False)
+
+
+def ancien_chemin(chemin):
+    try:
+        return pd.read_csv(chemin, encoding="utf-8", sep=None, engine="python")
+    except UnicodeDecodeError:
+        return pd.read_csv(chemin, encoding="latin1", sep=None, engine="python")
+
+
+def chronometrer(fn, repetitions):
+    meilleur = float("inf")
+    for _ in range(repetitions):
+        t0 = time.perf_counter()
+        fn()
+        meilleur = min(meilleur, time.perf_counter() - t0)
+    return meilleur
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lignes", type=int, default=100_000)
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cas = {
+            "utf-8 ;": (os.path.join(tmp, "export_20250101_utf8.csv"), ";", "utf-8"),
+            "latin1 ,": (os.path.join(tmp, "export_20250101_latin1.csv"), ",", "latin1"),
+        }
+        print(f"{'cas':<10} {'ancien (s)':>11} {'complet (s)':>12} {'étroit (s)':>11} {'gain':>7}")
+        for nom, (chemin, sep, encodage) in cas.items():
+            generer_csv(chemin, args.lignes, sep, encodage)
+            reference = ancien_chemin(chemin)
+            assert lecture_csv.lire_csv(chemin).equals(reference), f"résultats différents ({nom})"
+
+            formats = {}
+            t_ancien = chronometrer(lambda: ancien_chemin(chemin), args.repetitions)
+            t_complet = chronometrer(lambda: lecture_csv.lire_csv(chemin, formats), args.repetitions)
+            t_etroit = chronometrer(lambda: lecture_csv.lire_csv(chemin, formats, colonnes=COLONNES_VOULUES),
+                                    args.repetitions)
+            print(f"{nom:<10} {t_ancien:>11.3f} {t_complet:>12.3f} {t_etroit:>11.3f} {t_ancien / t_complet:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Banc d'essai : normalisation type / date de couts_et_graphique, ancien chemin (strip + apply ligne à
+ligne, pd.to_datetime sur toute la colonne) contre standardiser (valeurs distinctes mémorisées).
+
+    python benchmarks/bench_normalisation.py --lignes 1000000 --repetitions 3
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import couts_et_graphique  # noqa: E402
+
+TYPES = ["Facture", " Relance ", "Courrier simple", "Duplicata facture", "Facture PDF", "Relançe", "Autre"]
+
+
+def generer(nb_lignes, graine=0):
+    rnd = random.Random(graine)
+    jours = pd.date_range("2024-01-01", "2025-12-31").strftime("%d/%m/%Y").tolist()
+    return pd.DataFrame({
+        "TYPE DE DOCUMENT": [rnd.choice(TYPES) for _ in range(nb_lignes)],
+        "DATE TRAITEMENT PND": [rnd.choice(jours) for _ in range(nb_lignes)],
+    })
+
+
+def ancien_chemin(df):
+    out = pd.DataFrame({
+        "TypeDocument": df["TYPE DE DOCUMENT"].astype(str).str.strip(),
+        "Date": pd.to_datetime(df["DATE TRAITEMENT PND"], errors="coerce", dayfirst=True)
+    }).dropna(subset=["TypeDocument", "Date"])
+    out["TypeNorm"] = out["TypeDocument"].apply(couts_et_graphique.normaliser_type)
+    out["Year"] = out["Date"].dt.year.astype(int)
+    out["Month"] = out["Date"].dt.month.astype(int)
+    return out
+
+
+def nouveau_chemin(df):
+    return couts_et_graphique.standardiser(df, "TYPE DE DOCUMENT", "DATE TRAITEMENT PND")
+
+
+def chronometrer(fn, repetitions):
+    meilleur = float("inf")
+    for _ in range(repetitions):
+        t0 = time.perf_counter()
+        fn()
+        meilleur = min(meilleur, time.perf_counter() - t0)
+    return meilleur
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lignes", type=int, default=500_000)
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    df = generer(args.lignes)
+    reference, resultat = ancien_chemin(df), nouveau_chemin(df)
+    colonnes = ["TypeDocument", "Date", "TypeNorm", "Year", "Month"]
+    assert reference[colonnes].astype(str).equals(resultat[colonnes].astype(str)), "résultats différents"
+    for annee in (2024, 2025):
+        assert couts_et_graphique.frais_par_annee(couts_et_graphique.construire_cube(reference), annee).equals(
+            couts_et_graphique.frais_par_annee(couts_et_graphique.construire_cube(resultat), annee)), \
+            f"frais {annee} différents"
+
+    t_ancien = chronometrer(lambda: ancien_chemin(df), args.repetitions)
+    t_nouveau = chronometrer(lambda: nouveau_chemin(df), args.repetitions)
+    print(f"{args.lignes} lignes : ancien {t_ancien:.3f} s, nouveau {t_nouveau:.3f} s, "
+          f"gain {t_ancien / t_nouveau:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
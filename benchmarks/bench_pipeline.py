@@ -0,0 +1,104 @@
+"""
+Banc d'essai : pipeline complet (mails -> ZIP -> CSV -> stockage) sur une boîte de .eml dont chaque
+message est ralenti (attente réseau / COM simulée), enchaîné étape par étape (téléchargement de tout,
+puis liste des ZIP, puis lecture et intégration) contre les étages en parallèle de pipeline().
+Les deux passages partent du même état vide ; les stockages obtenus sont comparés.
+
+    python benchmarks/bench_pipeline.py --lignes 1000000 --attente 0.5
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import format_datetime, make_msgid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import donnees_synthetiques as ds   # noqa: E402
+import traitement_npai              # noqa: E402
+import stockage_npai                # noqa: E402
+import sources_mail                 # noqa: E402
+import config_npai                  # noqa: E402
+
+
+class SourceLente(sources_mail.SourceDossierEml):
+    """Boîte de .eml dont chaque message arrive après `attente` secondes."""
+    sauvegarde_concurrente = False
+
+    def __init__(self, dossier, attente):
+        super().__init__(dossier)
+        self.attente = attente
+
+    def messages(self, depuis=None):
+        for message in super().messages(depuis):
+            time.sleep(self.attente)
+            yield message
+
+
+def ecrire_boite(dossier, fichiers_zip):
+    os.makedirs(dossier)
+    debut = datetime(2025, 1, 1, 8, 0)
+    for i, fichier_zip in enumerate(fichiers_zip):
+        msg = EmailMessage()
+        msg["Date"] = format_datetime((debut + timedelta(hours=i)).astimezone())
+        msg["Message-ID"] = make_msgid()
+        msg.set_content("Fichiers NPAI en pièce jointe.")
+        with open(fichier_zip, "rb") as f:
+            msg.add_attachment(f.read(), maintype="application", subtype="zip",
+                               filename=os.path.basename(fichier_zip))
+        with open(os.path.join(dossier, f"{i:06d}.eml"), "wb") as f:
+            f.write(msg.as_bytes())
+
+
+def enchaine(source):
+    fichiers_zip = traitement_npai.telecharger_zip_outlook(source)
+    traitement_npai.maj_aggregats(sources=traitement_npai.lister_csv_zip(fichiers_zip))
+
+
+def passage(base, boite, attente, fn, nb_processus):
+    shutil.rmtree(base, ignore_errors=True)
+    traitement_npai.configurer(base)
+    traitement_npai.EXPORTER_EXCEL = False
+    traitement_npai.ARCHIVER_ZIP = False
+    traitement_npai.NB_PROCESSUS_LECTURE = nb_processus
+    t0 = time.perf_counter()
+    fn(SourceLente(boite, attente))
+    duree = time.perf_counter() - t0
+    store = stockage_npai.lire_store(config_npai.store_complet())
+    colonnes = sorted(c for c in store.columns if not str(c).startswith("_"))
+    return duree, store[colonnes].astype(str).sort_values(colonnes).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lignes", type=int, default=500_000)
+    parser.add_argument("--lignes-par-fichier", type=int, default=50_000)
+    parser.add_argument("--attente", type=float, default=0.5, help="secondes par message (réseau / COM simulé)")
+    parser.add_argument("--processus", type=int, default=None, help="processus de lecture CSV (défaut : cœurs - 1)")
+    args = parser.parse_args()
+
+    dossier = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        generes = os.path.join(dossier, "generes")
+        fichiers_zip = ds.generer_zip(generes, ds.generer_csv(generes, args.lignes, args.lignes_par_fichier, graine=1),
+                                      csv_par_zip=2)
+        boite = os.path.join(dossier, "boite")
+        ecrire_boite(boite, fichiers_zip)
+        print(f"{len(fichiers_zip)} messages, {args.lignes:,} lignes, {args.attente} s par message")
+
+        etapes = passage(os.path.join(dossier, "etapes"), boite, args.attente, enchaine, args.processus)
+        paralleles = passage(os.path.join(dossier, "paralleles"), boite, args.attente,
+                             lambda source: traitement_npai.pipeline(source_mail=source), args.processus)
+        assert etapes[1].equals(paralleles[1]), "stockages différents"
+        print(f"étape par étape    : {etapes[0]:8.3f} s")
+        print(f"étages parallèles  : {paralleles[0]:8.3f} s   gain {etapes[0] / paralleles[0]:.2f}x")
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
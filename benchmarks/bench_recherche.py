@@ -0,0 +1,81 @@
+"""
+Banc d'essai : recherche de contrats dans l'historique NPAI.
+Index des contrats (recherche_npai) contre la lecture complète du stockage filtrée par contrat :
+construction de l'index, recherche d'un contrat, d'une liste de contrats, comptage par type sur un mois.
+Les résultats des deux chemins sont comparés.
+
+    python benchmarks/bench_recherche.py --lignes 1000000 --liste 500
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import donnees_synthetiques as ds   # noqa: E402
+import stockage_npai                # noqa: E402
+import recherche_npai               # noqa: E402
+
+
+def chrono(fn):
+    t0 = time.perf_counter()
+    resultat = fn()
+    return resultat, time.perf_counter() - t0
+
+
+def par_balayage(store, contrats):
+    """Ancien chemin : tout le stockage relu, puis filtré (comme un filtre dans le classeur Excel)."""
+    df = stockage_npai.lire_store(store)
+    return df[stockage_npai.cle_texte(df["SCS-CONTRAT"]).isin(contrats)]
+
+
+def comptes_par_balayage(store, debut, fin):
+    df = stockage_npai.lire_store(store, colonnes=["TYPE DE DOCUMENT", "DATE TRAITEMENT PND"])
+    dates = stockage_npai.lire_dates(df["DATE TRAITEMENT PND"])
+    return df[(dates >= debut) & (dates <= fin)]["TYPE DE DOCUMENT"].astype("string").str.strip().value_counts()
+
+
+def afficher(nom, ancien, nouveau):
+    print(f"{nom:<22} balayage {ancien:8.3f} s   index {nouveau:8.3f} s   gain {ancien / nouveau:.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lignes", type=int, default=500_000)
+    parser.add_argument("--liste", type=int, default=500, help="contrats de la recherche par liste")
+    args = parser.parse_args()
+
+    dossier = tempfile.mkdtemp(prefix="bench_recherche_")
+    try:
+        store, index = os.path.join(dossier, "store"), os.path.join(dossier, "index")
+        historique = ds.generer_lignes(args.lignes, graine=1)
+        for morceau in range(0, args.lignes, ds.LIGNES_PAR_FICHIER):   # un fichier par CSV intégré
+            stockage_npai.ajouter_lignes(store, historique.iloc[morceau:morceau + ds.LIGNES_PAR_FICHIER])
+        contrats = stockage_npai.cle_texte(historique["SCS-CONTRAT"]).drop_duplicates()
+        liste = contrats.sample(min(args.liste, len(contrats)), random_state=2).tolist()
+        del historique
+
+        nb, duree = chrono(lambda: recherche_npai.mettre_a_jour_index(store, index))
+        print(f"construction de l'index : {duree:.3f} s ({nb:,} lignes)")
+
+        for nom, demandes in (("un contrat", liste[:1]), (f"liste de {len(liste)}", liste)):
+            trouve, nouveau = chrono(lambda: recherche_npai.chercher_contrats(demandes, index))
+            attendu, ancien = chrono(lambda: par_balayage(store, demandes))
+            assert len(trouve) == len(attendu), f"{nom} : {len(trouve)} lignes / {len(attendu)}"
+            afficher(nom, ancien, nouveau)
+
+        debut, fin = pd.Timestamp(2025, 3, 1), pd.Timestamp(2025, 3, 31)
+        table, nouveau = chrono(lambda: recherche_npai.compter_par_type(debut, fin, index))
+        attendu, ancien = chrono(lambda: comptes_par_balayage(store, debut, fin))
+        assert table.loc["TOTAL", "Nombre"] == attendu.sum(), "comptes différents"
+        afficher("comptage sur un mois", ancien, nouveau)
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
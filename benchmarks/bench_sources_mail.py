@@ -0,0 +1,74 @@
+"""
+Banc d'essai : récupération des pièces jointes ZIP depuis une source de mails, sans Outlook.
+Génère un dossier de .eml (historique), puis compare un premier passage complet à un passage
+incrémental (filigrane) après l'arrivée de quelques nouveaux messages.
+
+    python benchmarks/bench_sources_mail.py --messages 2000 --nouveaux 5
+"""
+import io
+import os
+import sys
+import time
+import zipfile
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import format_datetime, make_msgid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import traitement_npai  # noqa: E402
+import sources_mail  # noqa: E402
+
+
+def ecrire_eml(dossier, i, recu_le, taille_csv=20_000):
+    tampon = io.BytesIO()
+    with zipfile.ZipFile(tampon, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"NPAI_{i:06d}.csv", ("ENTITÉ;TYPE DE DOCUMENT\n" + "SFR;Facture\n" * (taille_csv // 12)))
+    msg = EmailMessage()
+    msg["Subject"] = f"Asterion NPAI {i}"
+    msg["From"] = "asterion@example.com"
+    msg["To"] = "SFR-RA-NPAI@sfr.com"
+    msg["Date"] = format_datetime(recu_le.astimezone())
+    msg["Message-ID"] = make_msgid()
+    msg.set_content("Fichiers NPAI en pièce jointe.")
+    msg.add_attachment(tampon.getvalue(), maintype="application", subtype="zip", filename=f"NPAI_{i:06d}.zip")
+    with open(os.path.join(dossier, f"{i:06d}.eml"), "wb") as f:
+        f.write(msg.as_bytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--nouveaux", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        boite = os.path.join(tmp, "boite")
+        os.makedirs(boite)
+        debut = datetime(2025, 1, 1, 8, 0)
+        for i in range(args.messages):
+            ecrire_eml(boite, i, debut + timedelta(hours=i))
+
+        traitement_npai.DOSSIER_TEMP = os.path.join(tmp, "tmp_zip")
+        traitement_npai.FICHIER_FILIGRANE_MAIL = os.path.join(tmp, "filigrane_mail.json")
+        source = sources_mail.SourceDossierEml(boite)
+
+        t0 = time.perf_counter()
+        zips = traitement_npai.telecharger_zip_outlook(source)
+        t_complet = time.perf_counter() - t0
+        for z in zips:
+            os.remove(z)
+
+        for i in range(args.messages, args.messages + args.nouveaux):
+            ecrire_eml(boite, i, debut + timedelta(hours=i))
+        t0 = time.perf_counter()
+        zips = traitement_npai.telecharger_zip_outlook(source)
+        t_increment = time.perf_counter() - t0
+
+        print(f"passage complet     : {t_complet:.3f} s ({args.messages} messages)")
+        print(f"passage incrémental : {t_increment:.3f} s ({len(zips)} nouveaux ZIP)")
+
+
+if __name__ == "__main__":
+    main()
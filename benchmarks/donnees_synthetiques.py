@@ -0,0 +1,156 @@
+"""
+Générateur de données Asterion synthétiques, à l'échelle voulue :
+- CSV aux colonnes COLONNES_VOULUES (+ colonnes annexes), séparateurs et encodages variés ;
+- archives ZIP de ces CSV (comme les pièces jointes reçues par mail) ;
+- classeur multi-feuilles comme la concaténation 2024 (feuille de synthèse + feuille(s) de données).
+
+Les lignes sont produites par lots (mémoire bornée même à 10 millions de lignes). Le jeu est
+déterministe pour une graine donnée.
+
+    python benchmarks/donnees_synthetiques.py --dossier /tmp/npai --lignes 1000000 --zip --classeur
+    NPAI_DOSSIER_BASE=/tmp/npai python traitement_npai.py
+"""
+import os
+import sys
+import zipfile
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import export_npai  # noqa: E402
+
+COLONNES_VOULUES = ["ENTITÉ", "TYPE DE DOCUMENT", "SCS-CONTRAT", "DATE RÉCEPTION", "DATE TRAITEMENT PND"]
+COLONNES_ANNEXES = ["NOM", "ADRESSE", "CODE POSTAL", "VILLE", "MOTIF PND"]
+
+ENTITES = (["SFR", "RED", "SFR Pro"], [0.6, 0.3, 0.1])
+TYPES = (["Facture", "Relance", "Courrier simple", "Duplicata facture", "Facture PDF", "Relançe", " FACTURE ",
+          "Courrier", "Autre"],
+         [0.35, 0.2, 0.15, 0.05, 0.08, 0.04, 0.05, 0.07, 0.01])
+MOTIFS = ["Destinataire inconnu à l'adresse", "Adresse incomplète", "Refusé", "Non réclamé", ""]
+VILLES = ["Paris", "Lyon", "Marseille", "Lille", "Saint-Étienne", "Besançon", "Orléans", "Nîmes"]
+# (séparateur, encodage) tournant d'un fichier à l'autre, comme les différentes chaînes d'export
+FORMATS = [(";", "utf-8"), (";", "latin1"), (",", "utf-8-sig"), ("\t", "utf-8"), ("|", "latin1")]
+
+LIGNES_PAR_FICHIER = 250_000
+LIGNES_FEUILLE_EXCEL = export_npai.LIMITE_LIGNES_EXCEL - 1
+
+
+def generer_lignes(nb_lignes: int, graine: int = 0, debut="2024-01-01", fin="2025-12-31",
+                   nb_contrats: int | None = None, taux_doublons: float = 0.02,
+                   taux_dates_invalides: float = 0.001) -> pd.DataFrame:
+    """
+    Lignes Asterion : un contrat apparaît plusieurs fois (nb_contrats < nb_lignes), une part des
+    lignes est renvoyée à l'identique (taux_doublons) et quelques dates sont vides ou invalides.
+    """
+    rng = np.random.default_rng(graine)
+    nb_uniques = max(1, nb_lignes - int(nb_lignes * taux_doublons))
+    nb_contrats = nb_contrats or max(1, nb_lignes // 3)
+
+    jours = pd.date_range(debut, fin, freq="D")
+    reception = rng.integers(0, len(jours), nb_uniques)
+    traitement = np.minimum(reception + rng.integers(0, 21, nb_uniques), len(jours) - 1)
+    libelles_jours = np.asarray(jours.strftime("%d/%m/%Y"), dtype=object)
+    date_traitement = libelles_jours[traitement]
+    invalides = rng.random(nb_uniques) < taux_dates_invalides
+    date_traitement[invalides] = rng.choice(np.array(["", "31/02/2025", "n/a"], dtype=object), invalides.sum())
+
+    contrats = rng.integers(10**8, 10**9, nb_contrats)
+    adresses = np.array([f"{n} rue de l'Église" for n in range(1, 301)], dtype=object)
+    df = pd.DataFrame({
+        "ENTITÉ": rng.choice(ENTITES[0], nb_uniques, p=ENTITES[1]),
+        "TYPE DE DOCUMENT": rng.choice(TYPES[0], nb_uniques, p=TYPES[1]),
+        "SCS-CONTRAT": contrats[rng.integers(0, nb_contrats, nb_uniques)],
+        "DATE RÉCEPTION": libelles_jours[reception],
+        "DATE TRAITEMENT PND": date_traitement,
+        "NOM": rng.choice(np.array(["MARTIN", "BERNARD", "DUBOIS", "THOMAS", "ROBERT", "PETIT", "LEFÈVRE"],
+                                   dtype=object), nb_uniques),
+        "ADRESSE": adresses[rng.integers(0, len(adresses), nb_uniques)],
+        "CODE POSTAL": rng.integers(1000, 96000, nb_uniques),
+        "VILLE": rng.choice(np.array(VILLES, dtype=object), nb_uniques),
+        "MOTIF PND": rng.choice(np.array(MOTIFS, dtype=object), nb_uniques),
+    })
+    if nb_lignes > nb_uniques:
+        doublons = df.iloc[rng.integers(0, nb_uniques, nb_lignes - nb_uniques)]
+        df = pd.concat([df, doublons], ignore_index=True)
+    return df
+
+
+def generer_csv(dossier: str, nb_lignes: int, lignes_par_fichier: int = LIGNES_PAR_FICHIER, graine: int = 0,
+                prefixe: str = "Export_Asterion") -> list[str]:
+    """CSV de `lignes_par_fichier` lignes au plus, séparateur / encodage tournants. Renvoie les chemins."""
+    os.makedirs(dossier, exist_ok=True)
+    chemins = []
+    for i, debut in enumerate(range(0, nb_lignes, lignes_par_fichier)):
+        n = min(lignes_par_fichier, nb_lignes - debut)
+        sep, encodage = FORMATS[i % len(FORMATS)]
+        chemin = os.path.join(dossier, f"{prefixe}_{20250101 + i}_B2C_{graine:03d}.csv")
+        generer_lignes(n, graine=graine * 100_003 + i).to_csv(chemin, sep=sep, encoding=encodage, index=False)
+        chemins.append(chemin)
+    return chemins
+
+
+def generer_zip(dossier: str, fichiers_csv, csv_par_zip: int = 4, supprimer_csv: bool = True) -> list[str]:
+    """Regroupe les CSV dans des ZIP (pièces jointes des mails Asterion)."""
+    os.makedirs(dossier, exist_ok=True)
+    archives = []
+    fichiers_csv = list(fichiers_csv)
+    for i in range(0, len(fichiers_csv), csv_par_zip):
+        lot = fichiers_csv[i:i + csv_par_zip]
+        chemin = os.path.join(dossier, f"NPAI_{os.path.splitext(os.path.basename(lot[0]))[0]}.zip")
+        with zipfile.ZipFile(chemin, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for f in lot:
+                zf.write(f, os.path.basename(f))
+        archives.append(chemin)
+        if supprimer_csv:
+            for f in lot:
+                os.remove(f)
+    return archives
+
+
+def generer_classeur(chemin: str, nb_lignes: int, feuille: str = "20240101-20241216", graine: int = 0,
+                     debut="2024-01-01", fin="2024-12-16") -> dict:
+    """
+    Classeur du type « concaténation » : une feuille de synthèse sans les colonnes attendues, puis la
+    feuille de données (continuée sur "feuille (2)"… au-delà de la limite d'Excel). Renvoie {feuille: lignes}.
+    """
+    os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+
+    def morceaux():
+        for i, d in enumerate(range(0, nb_lignes, LIGNES_PAR_FICHIER)):
+            n = min(LIGNES_PAR_FICHIER, nb_lignes - d)
+            yield generer_lignes(n, graine=graine * 100_003 + i, debut=debut, fin=fin)
+
+    synthese = pd.DataFrame({"Mois": pd.date_range(debut, fin, freq="MS").strftime("%m/%Y"),
+                             "Commentaire": "voir onglet de données"})
+    return export_npai.ecrire_classeur(chemin, [
+        ("Synthèse", list(synthese.columns), [synthese]),
+        (feuille, COLONNES_VOULUES + COLONNES_ANNEXES, morceaux()),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dossier", required=True, help="dossier de base (à passer ensuite dans NPAI_DOSSIER_BASE)")
+    parser.add_argument("--lignes", type=int, default=100_000)
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("--zip", action="store_true", help="CSV regroupés en ZIP dans tmp_zip (sinon CSV dans 'Fichiers traités')")
+    parser.add_argument("--classeur", action="store_true", help="classeur 2024 multi-feuilles en plus")
+    args = parser.parse_args()
+
+    if args.zip:
+        tmp = os.path.join(args.dossier, "tmp_zip")
+        archives = generer_zip(tmp, generer_csv(tmp, args.lignes, graine=args.graine))
+        print(f"{len(archives)} ZIP écrits dans {tmp}")
+    else:
+        dossier_csv = os.path.join(args.dossier, "Fichiers traités")
+        print(f"{len(generer_csv(dossier_csv, args.lignes, graine=args.graine))} CSV écrits dans {dossier_csv}")
+    if args.classeur:
+        chemin = os.path.join(args.dossier, "SFR-concaténation20250204.xlsx")
+        lignes = min(args.lignes, LIGNES_FEUILLE_EXCEL)
+        generer_classeur(chemin, lignes, graine=args.graine)
+        print(f"Classeur écrit : {chemin} ({lignes} lignes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Bancs d'essai de bout en bout sur données synthétiques (donnees_synthetiques.py), à plusieurs échelles :
+maj_aggregats (reconstruction puis ajout incrémental), exports Excel / csv.gz / Parquet, lire_fichier
+(sans cache, puis avec), normaliser_type (ligne à ligne et par libellés distincts), cube et frais_par_annee.
+Tous les chemins sont redirigés vers un dossier temporaire : aucun accès au partage U:\\.
+
+    python benchmarks/suite_npai.py --echelles 10k,1M,10M --json resultats.json
+
+Le classeur lu par lire_fichier est limité à une feuille Excel pleine (1 048 575 lignes).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import donnees_synthetiques as ds   # noqa: E402
+import traitement_npai              # noqa: E402
+import couts_et_graphique           # noqa: E402
+import export_npai                  # noqa: E402
+import stockage_npai                # noqa: E402
+import config_npai                  # noqa: E402
+
+ECHELLES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+
+
+class Chrono:
+    def __init__(self, echelle, nb_lignes):
+        self.echelle = echelle
+        self.nb_lignes = nb_lignes
+        self.resultats = []
+
+    def mesurer(self, nom, fn, lignes=None):
+        lignes = self.nb_lignes if lignes is None else lignes
+        t0 = time.perf_counter()
+        resultat = fn()
+        duree = time.perf_counter() - t0
+        self.resultats.append({"echelle": self.echelle, "etape": nom, "lignes": lignes, "duree_s": round(duree, 3),
+                               "lignes_par_s": round(lignes / duree) if duree > 0 else None})
+        print(f"  {nom:<38} {duree:>9.3f} s  {lignes / duree if duree > 0 else 0:>12,.0f} lignes/s", flush=True)
+        return resultat
+
+
+def bancs(echelle: str, nb_lignes: int, base: str, nb_processus) -> list[dict]:
+    chrono = Chrono(echelle, nb_lignes)
+    print(f"=== {echelle} ({nb_lignes:,} lignes) ===", flush=True)
+    traitement_npai.configurer(base)
+    couts_et_graphique.configurer(base)
+    traitement_npai.EXPORTER_EXCEL = False
+    traitement_npai.ARCHIVER_ZIP = False
+    traitement_npai.NB_PROCESSUS_LECTURE = nb_processus
+
+    # --- Données ---
+    tmp = traitement_npai.DOSSIER_TEMP
+    archives = ds.generer_zip(tmp, ds.generer_csv(tmp, nb_lignes, graine=1))
+    supplement = ds.generer_zip(os.path.join(base, "supplement"),
+                                ds.generer_csv(os.path.join(base, "supplement"), max(1, nb_lignes // 100), graine=2))
+
+    # --- Ingestion ---
+    sources = traitement_npai.lister_csv_zip(archives)
+    chrono.mesurer("maj_aggregats (reconstruction)",
+                   lambda: traitement_npai.maj_aggregats(reconstruction_totale=True, sources=sources))
+    sources = traitement_npai.lister_csv_zip(supplement)
+    chrono.mesurer("maj_aggregats (ajout de 1 %)",
+                   lambda: traitement_npai.maj_aggregats(sources=sources), lignes=max(1, nb_lignes // 100))
+
+    # --- Exports ---
+    store = config_npai.store_complet()
+    colonnes = [c for c in stockage_npai.colonnes_store(store) if not str(c).startswith("_")]
+    lignes_store = sum(len(df) for df in stockage_npai.iterer_store(store, colonnes[:1]))
+    chrono.mesurer("ecrire_classeur (NPAI 2025)", lambda: export_npai.ecrire_classeur(
+        traitement_npai.FICHIER_COMPLET, [("Sheet1", colonnes, stockage_npai.iterer_store(store, colonnes))]),
+        lignes=lignes_store)
+    chrono.mesurer("ecrire_csv_gz", lambda: export_npai.ecrire_csv_gz(
+        traitement_npai.FICHIER_COMPLET + ".csv.gz", colonnes, stockage_npai.iterer_store(store, colonnes)),
+        lignes=lignes_store)
+    chrono.mesurer("ecrire_parquet", lambda: export_npai.ecrire_parquet(
+        traitement_npai.FICHIER_COMPLET + ".parquet", colonnes, stockage_npai.iterer_store(store, colonnes)),
+        lignes=lignes_store)
+
+    # --- Analyse des frais ---
+    lignes_xlsx = min(nb_lignes, ds.LIGNES_FEUILLE_EXCEL)
+    ds.generer_classeur(couts_et_graphique.FICHIER_2024, lignes_xlsx, feuille=couts_et_graphique.FEUILLE_2024)
+    dossier_cache = couts_et_graphique.DOSSIER_CACHE
+    couts_et_graphique.DOSSIER_CACHE = None
+    chrono.mesurer("lire_fichier (sans cache)", lambda: couts_et_graphique.lire_fichier(
+        couts_et_graphique.FICHIER_2024, couts_et_graphique.FEUILLE_2024), lignes=lignes_xlsx)
+    chrono.mesurer("lire_fichier (auto-détection)", lambda: couts_et_graphique.lire_fichier(
+        couts_et_graphique.FICHIER_2024, None), lignes=lignes_xlsx)
+    couts_et_graphique.DOSSIER_CACHE = dossier_cache
+    couts_et_graphique.lire_fichier(couts_et_graphique.FICHIER_2024, couts_et_graphique.FEUILLE_2024)
+    chrono.mesurer("lire_fichier (cache)", lambda: couts_et_graphique.lire_fichier(
+        couts_et_graphique.FICHIER_2024, couts_et_graphique.FEUILLE_2024), lignes=lignes_xlsx)
+
+    # valeurs passées en argument par défaut : le `del` qui libère la mémoire ne les retire pas aux mesures
+    types = stockage_npai.lire_store(store, colonnes=["TYPE DE DOCUMENT"])["TYPE DE DOCUMENT"]
+    chrono.mesurer("normaliser_type (ligne à ligne)",
+                   lambda types=types: types.astype(str).str.strip().map(couts_et_graphique.normaliser_type),
+                   lignes=len(types))
+    couts_et_graphique._TYPES_NORMALISES.clear()
+    chrono.mesurer("normaliser_types (libellés distincts)",
+                   lambda types=types: couts_et_graphique.normaliser_types(types), lignes=len(types))
+    del types
+
+    df = chrono.mesurer("lire_store (2 colonnes)", lambda: couts_et_graphique.lire_store(store), lignes=lignes_store)
+    cube = chrono.mesurer("construire_cube", lambda df=df: couts_et_graphique.construire_cube(df), lignes=len(df))
+    annees = couts_et_graphique.annees_du_cube(cube)
+    chrono.mesurer("frais_par_annee (toutes années)",
+                   lambda: [couts_et_graphique.frais_par_annee(cube, an) for an in annees], lignes=len(df))
+    del df
+    chemin_cube = os.path.join(base, "cube_store.json")
+    chrono.mesurer("cube_store (premier calcul)", lambda: couts_et_graphique.cube_store(store, chemin_cube),
+                   lignes=lignes_store)
+    chrono.mesurer("cube_store (sans changement)", lambda: couts_et_graphique.cube_store(store, chemin_cube),
+                   lignes=lignes_store)
+    return chrono.resultats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--echelles", default="10k", help=f"parmi {', '.join(ECHELLES)} ou un nombre de lignes")
+    parser.add_argument("--dossier", default=None, help="dossier de travail (temporaire par défaut, supprimé à la fin)")
+    parser.add_argument("--processus", type=int, default=None, help="processus de lecture CSV (défaut : cœurs - 1)")
+    parser.add_argument("--json", default=None, help="fichier de résultats (ajoutés à la suite s'il existe)")
+    args = parser.parse_args()
+
+    resultats = []
+    racine = args.dossier or tempfile.mkdtemp(prefix="bench_npai_")
+    try:
+        for echelle in args.echelles.split(","):
+            nb_lignes = ECHELLES.get(echelle) or int(echelle)
+            base = os.path.join(racine, echelle)
+            shutil.rmtree(base, ignore_errors=True)
+            resultats.extend(bancs(echelle, nb_lignes, base, args.processus))
+            shutil.rmtree(base, ignore_errors=True)
+    finally:
+        if args.dossier is None:
+            shutil.rmtree(racine, ignore_errors=True)
+
+    if args.json:
+        anciens = []
+        if os.path.exists(args.json):
+            with open(args.json, encoding="utf-8") as f:
+                anciens = json.load(f)
+        execution = {"date": datetime.now().isoformat(timespec="seconds"), "resultats": resultats}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(anciens + [execution], f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import re
+import json
+
+# ============================================================
+#     EMPLACEMENT DES DONNÉES
+# ============================================================
+# Par défaut, tout se trouve sur le partage U:\ de l'équipe. La variable d'environnement
+# NPAI_DOSSIER_BASE (ou la fonction configurer() de chaque module) redirige tous les chemins vers
+# un autre dossier : autre poste, serveur Linux, jeux de test, bancs d'essai.
+# Les chemins lus ou écrits par plusieurs modules (stockage, index des contrats) sont définis ici
+# seulement : chaque module les lit au moment de s'en servir.
+
+VARIABLE_DOSSIER_BASE = "NPAI_DOSSIER_BASE"
+DOSSIER_BASE_DEFAUT = r"U:\Business Assurance\Revenue Assurance\RA_2024\FE2026\PND-NPAI\Fichiers Asterion\B2C\Etude Asterion 2025"
+
+
+def dossier_base() -> str:
+    return os.environ.get(VARIABLE_DOSSIER_BASE) or DOSSIER_BASE_DEFAUT
+
+
+def rebaser(espace: dict, ancienne_base: str, nouvelle_base: str):
+    """
+    Remplace `ancienne_base` par `nouvelle_base` dans toutes les constantes de chemin (NOMS_EN_MAJUSCULES)
+    de `espace` (globals() d'un module). Les séparateurs \\ ou / de la partie relative sont adaptés au
+    système courant.
+    """
+    for nom, valeur in list(espace.items()):
+        if not nom.isupper() or not isinstance(valeur, str) or not valeur.startswith(ancienne_base):
+            continue
+        reste = valeur[len(ancienne_base):]
+        if reste and reste[0] not in "\\/":
+            continue    # simple préfixe commun, pas un chemin sous la base
+        morceaux = [m for m in re.split(r"[\\/]+", reste) if m]
+        espace[nom] = os.path.join(nouvelle_base, *morceaux)
+
+
+DOSSIER_BASE = dossier_base()
+DOSSIER_STORE = os.path.join(DOSSIER_BASE, "store_npai")                 # stockage colonnaire (traitement_npai)
+DOSSIER_INDEX_CONTRATS = os.path.join(DOSSIER_BASE, "index_contrats")   # recherche par SCS-CONTRAT (recherche_npai)
+CHEMINS_PARTAGES = ("DOSSIER_STORE", "DOSSIER_INDEX_CONTRATS")
+
+
+def store_complet(dossier_store: str | None = None) -> str:
+    """Toutes colonnes, partitionné année/mois ; dossier_store : autre racine (reconstruction en cours)."""
+    return os.path.join(dossier_store or DOSSIER_STORE, "complet")
+
+
+def store_sans_doublons(dossier_store: str | None = None) -> str:
+    """Une ligne par SCS-CONTRAT, en seaux par contrat."""
+    return os.path.join(dossier_store or DOSSIER_STORE, "sans_doublons")
+
+
+def configurer(espace: dict, nouvelle_base: str):
+    """
+    configurer() d'un module : ses chemins (`espace` = ses globals()) et les chemins partagés redirigés
+    vers `nouvelle_base`. Un chemin partagé placé hors de la base (-p DOSSIER_STORE=…) n'est pas touché.
+    """
+    global DOSSIER_BASE
+    rebaser(espace, espace["DOSSIER_BASE"], nouvelle_base)
+    espace["DOSSIER_BASE"] = nouvelle_base
+    partages = {nom: globals()[nom] for nom in CHEMINS_PARTAGES}
+    rebaser(partages, DOSSIER_BASE, nouvelle_base)
+    globals().update(partages)
+    DOSSIER_BASE = nouvelle_base
+
+
+# ============================================================
+#     FICHIER DE CONFIGURATION ET PARAMÈTRES EN LIGNE DE COMMANDE
+# ============================================================
+# Fichier JSON, par exemple :
+#   {"dossier_base": "/srv/npai",
+#    "traitement_npai": {"NB_PROCESSUS_LECTURE": 4, "EXPORT_PARQUET": true},
+#    "couts_et_graphique": {"ANNEES": [2024, 2025]},
+#    "config_npai": {"DOSSIER_STORE": "/data/store_npai"}}
+# Chaque section remplace des constantes existantes du module du même nom ; les chemins partagés
+# (CHEMINS_PARTAGES) valent pour tous les modules, où qu'ils soient réglés.
+
+VARIABLE_CONFIG = "NPAI_CONFIG"
+
+
+def charger_config(chemin: str | None) -> dict:
+    """Configuration JSON (`chemin`, sinon variable NPAI_CONFIG, sinon vide)."""
+    chemin = chemin or os.environ.get(VARIABLE_CONFIG)
+    if not chemin:
+        return {}
+    with open(chemin, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def lire_parametre(texte: str) -> tuple[str, object]:
+    """'CLE=valeur' -> (CLE, valeur), la valeur étant lue en JSON si possible (4, true, [2024, 2025]…)."""
+    if "=" not in texte:
+        raise ValueError(f"Paramètre attendu sous la forme CLE=valeur : {texte}")
+    cle, valeur = texte.split("=", 1)
+    try:
+        return cle.strip(), json.loads(valeur)
+    except ValueError:
+        return cle.strip(), valeur
+
+
+def appliquer(module, reglages: dict):
+    """Remplace des constantes du module ; une clé inconnue est une erreur (faute de frappe)."""
+    for cle, valeur in reglages.items():
+        if not cle.isupper() or not hasattr(module, cle):
+            raise KeyError(f"Paramètre inconnu pour {module.__name__} : {cle}")
+        setattr(module, cle, valeur)
@@ -1,18 +1,38 @@
 import os
+import json
+import hashlib
 import unicodedata
+from functools import lru_cache
 import pandas as pd
-import matplotlib.pyplot as plt
-from openpyxl import load_workbook
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+import stockage_npai
+import rapport_npai
+import progression
+import mesures_npai
+import config_npai
 
 # ================== PARAMÈTRES ==================
-FICHIER_2024 = r"U:\Business Assurance\Revenue Assurance\RA_2024\FE2026\PND-NPAI\Fichiers Asterion\B2C\Etude Asterion 2025\SFR-concaténation20250204.xlsx"
+DOSSIER_BASE = config_npai.dossier_base()    # partage U:\ par défaut, ou variable NPAI_DOSSIER_BASE
+
+FICHIER_2024 = os.path.join(DOSSIER_BASE, "SFR-concaténation20250204.xlsx")
 FEUILLE_2024 = "20240101-20241216"   # feuille 2024 à lire
 
-FICHIER_2025 = r"U:\Business Assurance\Revenue Assurance\RA_2024\FE2026\PND-NPAI\Fichiers Asterion\B2C\Etude Asterion 2025\NPAI 2025.xlsx"
+FICHIER_2025 = os.path.join(DOSSIER_BASE, "NPAI 2025.xlsx")
 FEUILLE_2025 = None                  # None => auto-détection de la feuille contenant les colonnes attendues
+# Stockage colonnaire alimenté par traitement_npai (config_npai.store_complet()) : prioritaire sur
+# FICHIER_2025 s'il existe.
+
+FICHIER_SORTIE = os.path.join(DOSSIER_BASE, "Frais documents.xlsx")
+IMAGE_GRAPHE  = os.path.join(DOSSIER_BASE, "Evolution_traitements.png")
 
-FICHIER_SORTIE = r"U:\Business Assurance\Revenue Assurance\RA_2024\FE2026\PND-NPAI\Fichiers Asterion\B2C\Etude Asterion 2025\Frais documents.xlsx"
-IMAGE_GRAPHE  = r"U:\Business Assurance\Revenue Assurance\RA_2024\FE2026\PND-NPAI\Fichiers Asterion\B2C\Etude Asterion 2025\Evolution_traitements.png"
+DOSSIER_CACHE = os.path.join(DOSSIER_BASE, "cache_analyse")
+# ^ classeurs déjà normalisés (Parquet), réutilisés tant que le fichier source n'a pas changé ; None => pas de cache
+VERSION_CACHE = 1                    # à incrémenter si standardiser / normaliser_type changent
+DOSSIER_RAPPORTS = os.path.join(DOSSIER_BASE, "rapports_execution")
+# ^ rapport JSON par exécution (durées, volumes, mémoire par étape)
 
 # Tarifs par type
 TARIFS = {
@@ -22,6 +42,9 @@ TARIFS = {
     "DUPLICATA": 0.75,  # même que facture
 }
 
+# Années du rapport (None => toutes les années présentes dans les données)
+ANNEES = None
+
 # Ordre d’affichage des lignes
 ORDRE_TYPES = ["FACTURE", "RELANCE", "COURRIER", "DUPLICATA"]
 
@@ -31,6 +54,10 @@ MOIS_FR = ["Janvier", "Février", "Mars", "Avril", "Mai", "Juin",
 
 
 # ================== OUTILS ==================
+def configurer(dossier_base):
+    """Redirige vers `dossier_base` tous les chemins définis sous DOSSIER_BASE (et les chemins partagés)."""
+    config_npai.configurer(globals(), dossier_base)
+
 def _strip_accents_lower(s: str) -> str:
     """minuscule + sans accents + espaces normalisés (pour matcher les noms de colonnes)."""
     if not isinstance(s, str):
@@ -89,10 +116,24 @@ def trouver_colonnes(df: pd.DataFrame, nom_type="TYPE DE DOCUMENT", nom_date="DA
         )
     return col_type, col_date
 
+def _entete_feuille(ws) -> tuple[pd.Index, bool]:
+    """
+    (noms de colonnes, présence d'au moins une ligne de données) lus sur les deux premières lignes
+    de la feuille seulement. Noms construits comme read_excel ("Unnamed: i" pour une cellule vide).
+    """
+    lignes = list(ws.iter_rows(min_row=1, max_row=2, values_only=True))
+    if not lignes:
+        return pd.Index([]), False
+    entete = pd.Index([f"Unnamed: {i}" if v is None else v for i, v in enumerate(lignes[0])])
+    a_donnees = len(lignes) > 1 and any(v is not None for v in lignes[1])
+    return entete, a_donnees
+
+
 def lire_feuille(chemin_xlsx: str, sheet_name: str | None) -> pd.DataFrame:
     """
     Lit une feuille précise si sheet_name est fourni.
-    Sinon, essaie toutes les feuilles et renvoie la première qui contient les colonnes attendues.
+    Sinon, repère sur les en-têtes seuls la première feuille qui contient les colonnes attendues,
+    puis ne lit que celle-là (classeur ouvert une seule fois).
     """
     if not os.path.exists(chemin_xlsx):
         raise FileNotFoundError(f"Fichier introuvable : {chemin_xlsx}")
@@ -104,53 +145,280 @@ def lire_feuille(chemin_xlsx: str, sheet_name: str | None) -> pd.DataFrame:
         return df
 
     # Auto-détection
-    xls = pd.ExcelFile(chemin_xlsx, engine="openpyxl")
-    last_err = None
-    for sh in xls.sheet_names:
-        try:
-            dfi = pd.read_excel(chemin_xlsx, sheet_name=sh, engine="openpyxl")
-            if dfi.empty:
+    with pd.ExcelFile(chemin_xlsx, engine="openpyxl") as xls:
+        last_err = None
+        for sh in xls.sheet_names:
+            try:
+                entete, a_donnees = _entete_feuille(xls.book[sh])
+                if not a_donnees:
+                    continue
+                # test : trouver les colonnes attendues (ne lève pas si ok)
+                trouver_colonnes(pd.DataFrame(columns=entete))
+                dfi = xls.parse(sh)
+                if dfi.empty:
+                    continue
+                return dfi
+            except Exception as e:
+                last_err = e
                 continue
-            # test : trouver les colonnes attendues (ne lève pas si ok)
-            trouver_colonnes(dfi)
-            return dfi
-        except Exception as e:
-            last_err = e
-            continue
     raise ValueError(
         f"Aucune feuille ne contient les colonnes attendues dans : {chemin_xlsx}. "
         f"Dernière erreur : {last_err}"
     )
 
+
+# ================== CACHE DES CLASSEURS NORMALISÉS ==================
+def _chemin_cache(chemin_xlsx: str, sheet_name: str | None) -> tuple[str, str]:
+    """
+    (préfixe propre au couple fichier/feuille, chemin du cache pour l'état actuel du fichier).
+    La clé porte le chemin, la date de modification, la taille, la feuille et VERSION_CACHE.
+    """
+    st = os.stat(chemin_xlsx)
+    source = f"{os.path.abspath(chemin_xlsx)}|{sheet_name}"
+    etat = f"{st.st_mtime_ns}|{st.st_size}|{VERSION_CACHE}"
+    prefixe = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+    version = hashlib.sha1(etat.encode("utf-8")).hexdigest()[:16]
+    return prefixe, os.path.join(DOSSIER_CACHE, f"{prefixe}-{version}.parquet")
+
+
+def _lire_cache(chemin_cache: str) -> pd.DataFrame | None:
+    if not os.path.exists(chemin_cache):
+        return None
+    try:
+        return pd.read_parquet(chemin_cache)
+    except Exception as e:
+        print(f"⚠️ Cache illisible, le classeur sera relu : {e}")
+        return None
+
+
+def _ecrire_cache(prefixe: str, chemin_cache: str, df: pd.DataFrame):
+    """Écriture atomique ; les caches d'états précédents du même fichier/feuille sont supprimés."""
+    try:
+        os.makedirs(DOSSIER_CACHE, exist_ok=True)
+        tmp = chemin_cache + ".tmp"
+        df.to_parquet(tmp)
+        os.replace(tmp, chemin_cache)
+        for nom in os.listdir(DOSSIER_CACHE):
+            if nom.startswith(prefixe + "-") and os.path.join(DOSSIER_CACHE, nom) != chemin_cache:
+                os.remove(os.path.join(DOSSIER_CACHE, nom))
+    except Exception as e:
+        print(f"⚠️ Cache non écrit : {e}")
+
+
+@mesures_npai.mesurer("lire_fichier")
 def lire_fichier(chemin_xlsx: str, sheet_name: str | None) -> pd.DataFrame:
     """
     Lit l'Excel, récupère 'TYPE DE DOCUMENT' et 'DATE TRAITEMENT PND' par NOM,
     nettoie/normalise, puis ajoute Year/Mois. Renvoie un DF standardisé.
+    Le résultat est mis en cache (DOSSIER_CACHE) : un classeur inchangé n'est parsé qu'une fois.
     """
+    if not os.path.exists(chemin_xlsx):
+        raise FileNotFoundError(f"Fichier introuvable : {chemin_xlsx}")
+    if DOSSIER_CACHE:
+        prefixe, chemin_cache = _chemin_cache(chemin_xlsx, sheet_name)
+        df = _lire_cache(chemin_cache)
+        if df is not None:
+            print(f"⚡ Cache utilisé pour {os.path.basename(chemin_xlsx)}")
+            mesures_npai.compter(octets_lus=mesures_npai.taille_fichier(chemin_cache), lignes_sortie=len(df))
+            return df
+
     df_raw = lire_feuille(chemin_xlsx, sheet_name)
     col_type, col_date = trouver_colonnes(df_raw, "TYPE DE DOCUMENT", "DATE TRAITEMENT PND")
+    df = standardiser(df_raw, col_type, col_date)
+    mesures_npai.compter(octets_lus=mesures_npai.taille_fichier(chemin_xlsx), lignes_entree=len(df_raw),
+                         lignes_sortie=len(df))
+    if DOSSIER_CACHE:
+        _ecrire_cache(prefixe, chemin_cache, df)
+    return df
+
+
+def lire_store(dossier: str, cles=None) -> pd.DataFrame:
+    """
+    Comme lire_fichier, mais depuis le stockage colonnaire : seules les deux colonnes utiles
+    (type de document, date de traitement) sont lues, dans toutes les partitions ou dans `cles`.
+    """
+    colonnes = stockage_npai.colonnes_store(dossier)
+    if not colonnes:
+        raise FileNotFoundError(f"Stockage vide ou introuvable : {dossier}")
+    col_type, col_date = trouver_colonnes(pd.DataFrame(columns=colonnes), "TYPE DE DOCUMENT", "DATE TRAITEMENT PND")
+    df_raw = stockage_npai.lire_store(dossier, colonnes=[col_type, col_date], cles=cles)
+    return standardiser(df_raw.reindex(columns=[col_type, col_date]), col_type, col_date)
+
+
+# Mémo des libellés déjà normalisés : seuls les libellés jamais vus passent par normaliser_type
+_TYPES_NORMALISES = {}
+
+
+def normaliser_types(serie: pd.Series) -> tuple[pd.Categorical, pd.Categorical]:
+    """
+    (TypeDocument, TypeNorm) en catégories : le nettoyage et normaliser_type ne sont appliqués
+    qu'aux quelques dizaines de libellés distincts, puis reportés sur toutes les lignes.
+    """
+    codes, uniques = pd.factorize(serie, use_na_sentinel=False)
+    libelles = pd.Series(uniques).astype(str).str.strip()
+    for lib in libelles:
+        if lib not in _TYPES_NORMALISES:
+            _TYPES_NORMALISES[lib] = normaliser_type(lib)
+    normes = libelles.map(_TYPES_NORMALISES)
+
+    codes_lib, cats_lib = pd.factorize(libelles)
+    codes_norm, cats_norm = pd.factorize(normes)
+    type_doc = pd.Categorical.from_codes(codes_lib[codes], categories=cats_lib)
+    type_norm = pd.Categorical.from_codes(codes_norm[codes], categories=cats_norm)
+    return type_doc, type_norm
+
+
+@lru_cache(maxsize=256)
+def _format_date(premiere_valeur: str) -> str | None:
+    """Format déduit de la première date, comme le fait pd.to_datetime(dayfirst=True) (mémorisé)."""
+    return guess_datetime_format(premiere_valeur, dayfirst=True)
 
+
+def convertir_dates(serie: pd.Series) -> pd.Series:
+    """
+    Équivalent de pd.to_datetime(serie, errors="coerce", dayfirst=True), calculé sur les dates
+    distinctes seulement (quelques centaines par an) avec un format explicite déduit de la première.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return pd.to_datetime(serie, errors="coerce", dayfirst=True)
+    codes, uniques = pd.factorize(serie)
+    uniques = pd.Series(uniques)
+    fmt = _format_date(uniques.iloc[0]) if len(uniques) and isinstance(uniques.iloc[0], str) else None
+    if fmt is not None:
+        dates = pd.to_datetime(uniques, format=fmt, errors="coerce")
+    else:
+        dates = pd.to_datetime(uniques, errors="coerce", dayfirst=True)
+    if len(dates) == 0:
+        return pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns]")
+    valeurs = dates.to_numpy()[codes]
+    valeurs[codes == -1] = None
+    return pd.Series(valeurs, index=serie.index)
+
+
+def standardiser(df_raw: pd.DataFrame, col_type: str, col_date: str) -> pd.DataFrame:
+    """Nettoie/normalise les colonnes type et date, puis ajoute Year/Mois."""
+    type_doc, type_norm = normaliser_types(df_raw[col_type])
     out = pd.DataFrame({
-        "TypeDocument": df_raw[col_type].astype(str).str.strip(),
-        "Date": pd.to_datetime(df_raw[col_date], errors="coerce", dayfirst=True)
-    }).dropna(subset=["TypeDocument", "Date"])
+        "TypeDocument": type_doc,
+        "Date": convertir_dates(df_raw[col_date]),
+        "TypeNorm": type_norm,
+    }, index=df_raw.index).dropna(subset=["TypeDocument", "Date"])
 
-    out["TypeNorm"] = out["TypeDocument"].apply(normaliser_type)
     out["Year"]  = out["Date"].dt.year.astype(int)
     out["Month"] = out["Date"].dt.month.astype(int)
     return out
 
 
-def frais_par_annee(df_total: pd.DataFrame, annee: int) -> pd.DataFrame:
+# ================== CUBE ANNÉE × MOIS × TYPE ==================
+# Nombre de lignes par (Year, Month, TypeNorm), calculé en un seul groupby. Tous les tableaux
+# (frais par année, évolution) et le graphe en sont tirés. Les cubes s'additionnent : un nouveau
+# lot de lignes met le cube à jour sans recalculer l'historique.
+NIVEAUX_CUBE = ["Year", "Month", "TypeNorm"]
+
+
+def _cube_vide() -> pd.Series:
+    index = pd.MultiIndex.from_tuples([], names=NIVEAUX_CUBE)
+    return pd.Series([], index=index, dtype="int64", name="Nombre")
+
+
+def construire_cube(df: pd.DataFrame) -> pd.Series:
+    """Cube de comptages d'un DF standardisé (une seule passe sur les lignes)."""
+    if df.empty:
+        return _cube_vide()
+    cube = df.groupby(["Year", "Month", df["TypeNorm"].astype(str)], observed=True).size()
+    cube.index.names = NIVEAUX_CUBE
+    return cube.rename("Nombre")
+
+
+def additionner_cubes(*cubes) -> pd.Series:
+    cubes = [c for c in cubes if len(c)]
+    if not cubes:
+        return _cube_vide()
+    return pd.concat(cubes).groupby(level=NIVEAUX_CUBE).sum().astype("int64").rename("Nombre")
+
+
+def ajouter_au_cube(cube: pd.Series, df_nouveau: pd.DataFrame) -> pd.Series:
+    """Mise à jour incrémentale : seules les lignes nouvelles sont agrégées."""
+    return additionner_cubes(cube, construire_cube(df_nouveau))
+
+
+def annees_du_cube(cube: pd.Series) -> list[int]:
+    return sorted(int(a) for a in cube.index.get_level_values("Year").unique())
+
+
+def _cube_vers_cellules(cube: pd.Series) -> list:
+    return [[int(a), int(m), str(t), int(n)] for (a, m, t), n in cube.items()]
+
+
+def _cellules_vers_cube(cellules) -> pd.Series:
+    if not cellules:
+        return _cube_vide()
+    df = pd.DataFrame(cellules, columns=NIVEAUX_CUBE + ["Nombre"])
+    return df.set_index(NIVEAUX_CUBE)["Nombre"].astype("int64")
+
+
+def _signature_partition(rep: str) -> list:
+    """Fichiers de la partition avec taille et date de modification : change dès qu'elle est réécrite."""
+    return [[os.path.basename(f), os.path.getsize(f), os.stat(f).st_mtime_ns]
+            for f in stockage_npai.lister_fichiers_partition(rep)]
+
+
+@mesures_npai.mesurer("cube_store")
+def cube_store(dossier: str, chemin_json: str | None = None) -> pd.Series:
+    """
+    Cube du stockage colonnaire, tenu à jour partition par partition : la contribution de chaque
+    partition (annee=/mois=) est mémorisée dans `chemin_json` avec sa signature, et seules les
+    partitions ajoutées ou réécrites depuis le dernier calcul sont relues.
+    """
+    etat = {}
+    if chemin_json and os.path.exists(chemin_json):
+        try:
+            with open(chemin_json, encoding="utf-8") as f:
+                etat = json.load(f)
+        except (OSError, ValueError):
+            etat = {}
+    anciennes = etat.get("partitions", {}) if etat.get("version") == VERSION_CACHE else {}
+
+    partitions, a_relire = {}, []
+    for cle in stockage_npai.lister_partitions(dossier):
+        nom = "/".join(cle)
+        signature = _signature_partition(stockage_npai.chemin_partition(dossier, cle))
+        precedente = anciennes.get(nom)
+        if precedente is not None and precedente["signature"] == signature:
+            partitions[nom] = precedente
+        else:
+            a_relire.append((cle, nom, signature))
+
+    for cle, nom, signature in a_relire:
+        df_partition = lire_store(dossier, cles=[cle])
+        mesures_npai.compter(lignes_entree=len(df_partition))
+        cube_partition = construire_cube(df_partition)
+        partitions[nom] = {"signature": signature, "cellules": _cube_vers_cellules(cube_partition)}
+    if a_relire:
+        print(f"🧮 Cube : {len(a_relire)} partition(s) recalculée(s) sur {len(partitions)}")
+
+    if chemin_json and (a_relire or set(partitions) != set(anciennes)):
+        os.makedirs(os.path.dirname(chemin_json) or ".", exist_ok=True)
+        tmp = chemin_json + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION_CACHE, "partitions": partitions}, f, ensure_ascii=False)
+        os.replace(tmp, chemin_json)
+
+    return additionner_cubes(*(_cellules_vers_cube(p["cellules"]) for p in partitions.values()))
+
+
+@mesures_npai.mesurer("frais_par_annee")
+def frais_par_annee(cube: pd.Series, annee: int) -> pd.DataFrame:
     """
     Tableau (lignes=type, colonnes=mois Jan-Déc, + 'Total annuel') pour une année donnée.
     Calcul = nombre de lignes * tarif, par type et par mois.
     + Ajoute une ligne 'TOTAL (3 types)' = FACTURE + RELANCE + COURRIER
     """
-    sous = df_total[df_total["Year"] == annee].copy()
-    sous = sous[sous["TypeNorm"].isin(TARIFS.keys())]
+    sous = cube[(cube.index.get_level_values("Year") == annee)
+                & cube.index.get_level_values("TypeNorm").isin(list(TARIFS))]
 
-    counts = sous.groupby(["TypeNorm", "Month"]).size().unstack(fill_value=0)
+    counts = sous.groupby(level=["TypeNorm", "Month"]).sum().unstack(fill_value=0)
+    counts.columns.name = None
     # assure 12 mois
     for m in range(1, 13):
         if m not in counts.columns:
@@ -177,11 +445,12 @@ def frais_par_annee(df_total: pd.DataFrame, annee: int) -> pd.DataFrame:
     return costs
 
 
-def evolution_traitements(df_total: pd.DataFrame, annees=(2024, 2025)) -> pd.DataFrame:
+def evolution_traitements(cube: pd.Series, annees=None) -> pd.DataFrame:
     """
     Tableau (index=année, colonnes=mois FR) avec le nombre de traitements (toutes lignes).
     """
-    pivot = df_total.groupby(["Year", "Month"]).size().unstack(fill_value=0)
+    annees = annees_du_cube(cube) if annees is None else list(annees)
+    pivot = cube.groupby(level=["Year", "Month"]).sum().unstack(fill_value=0)
     for m in range(1, 13):
         if m not in pivot.columns:
             pivot[m] = 0
@@ -191,85 +460,91 @@ def evolution_traitements(df_total: pd.DataFrame, annees=(2024, 2025)) -> pd.Dat
     return pivot
 
 
-def tracer_graphe(df_evol: pd.DataFrame, path_png: str = None):
-    """Trace les 2 courbes (2024 vs 2025) et enregistre une image si demandé."""
-    plt.figure(figsize=(11, 6))
-    for an in df_evol.index:
-        y = df_evol.loc[an, :].values
-        plt.plot(MOIS_FR, y, marker="o", label=str(an))
-    plt.title("Évolution mensuelle du nombre de traitements (2024 vs 2025)")
-    plt.xlabel("Mois")
-    plt.ylabel("Nombre de traitements")
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    plt.legend()
-    plt.tight_layout()
-    if path_png:
-        plt.savefig(path_png, dpi=150, bbox_inches="tight")
-    plt.show()
-
-
-def formater_monnaie_excel(fichier_xlsx: str, feuilles=("Frais 2024", "Frais 2025")):
+@mesures_npai.mesurer("graphe")
+def tracer_graphe(df_evol: pd.DataFrame, path_png: str):
     """
-    Ouvre le fichier Excel et applique un format monétaire (€) aux cellules
-    des feuilles de frais (toutes les colonnes de mois + 'Total annuel').
-    Hypothèse : l’index (types) est en colonne A, donc montants à partir de colonne B.
+    Trace une courbe par année et enregistre l'image PNG.
+    Rendu sans interface graphique (Figure, pas pyplot) : utilisable depuis un thread de travail.
     """
-    wb = load_workbook(fichier_xlsx)
-    fmt = '€ #,##0.00'  # format monétaire simple
-
-    for sheet_name in feuilles:
-        if sheet_name not in wb.sheetnames:
-            continue
-        ws = wb[sheet_name]
-        if ws.max_row < 2 or ws.max_column < 3:
-            continue
-
-        # Repérer colonnes numériques : de B à la dernière (mois + Total annuel)
-        first_row = 1  # en-têtes
-        first_data_row = 2
-        first_amount_col = 2  # B
-        last_col = ws.max_column
-        last_row = ws.max_row
-
-        # Appliquer format sur toutes les cellules numériques (B2:LastCol, LastRow)
-        for r in range(first_data_row, last_row + 1):
-            for c in range(first_amount_col, last_col + 1):
-                cell = ws.cell(row=r, column=c)
-                # on force format monétaire (même si la valeur est 0 ou vide)
-                cell.number_format = fmt
-
-    wb.save(fichier_xlsx)
-    wb.close()
+    from matplotlib.figure import Figure   # importé seulement si un graphe est produit
+    fig = Figure(figsize=(11, 6))
+    ax = fig.subplots()
+    for an in df_evol.index:
+        y = df_evol.loc[an, :].values
+        ax.plot(MOIS_FR, y, marker="o", label=str(an))
+    ax.set_title(titre_graphe(df_evol))
+    ax.set_xlabel("Mois")
+    ax.set_ylabel("Nombre de traitements")
+    ax.grid(True)
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path_png, dpi=150, bbox_inches="tight")
+    mesures_npai.compter(octets_ecrits=mesures_npai.taille_fichier(path_png))
+
+
+def titre_graphe(df_evol: pd.DataFrame) -> str:
+    return f"Évolution mensuelle du nombre de traitements ({' vs '.join(map(str, df_evol.index))})"
 
 
 # ================== PIPELINE ==================
 def main():
-    # 1) Charger 2024 (feuille explicite) et 2025 (auto-détection par colonnes)
-    df24 = lire_fichier(FICHIER_2024, FEUILLE_2024)
-    df25 = lire_fichier(FICHIER_2025, FEUILLE_2025)
+    with mesures_npai.execution("analyse_frais", DOSSIER_RAPPORTS):
+        _main()
 
-    # 2) Concaténer (la date fait foi => décembre 2024 dans le fichier 2025 est classé en 2024)
-    df_total = pd.concat([df24, df25], ignore_index=True)
 
-    # 3) Frais documentaires (tableaux par année, avec ligne TOTAL (3 types))
-    frais_2024 = frais_par_annee(df_total, 2024)
-    frais_2025 = frais_par_annee(df_total, 2025)
+def calculer_cube() -> pd.Series:
+    """
+    Cube 2024 (feuille explicite) + cube 2025 (stockage colonnaire, mis à jour partition par
+    partition ; sinon auto-détection par colonnes). La date fait foi : décembre 2024 dans le
+    fichier 2025 est compté en 2024.
+    """
+    cube = construire_cube(lire_fichier(FICHIER_2024, FEUILLE_2024))
+    store = config_npai.store_complet()
+    if stockage_npai.lister_partitions(store):
+        chemin_cube = os.path.join(DOSSIER_CACHE, "cube_store.json") if DOSSIER_CACHE else None
+        return additionner_cubes(cube, cube_store(store, chemin_cube))
+    return ajouter_au_cube(cube, lire_fichier(FICHIER_2025, FEUILLE_2025))
+
+
+def _main():
+    # 1) Cube année × mois × type sur tout l'historique
+    progression.signaler("Chargement des données", 0, 4)
+    cube = calculer_cube()
+    progression.signaler("Calcul des frais", 1, 4)
+    annees = list(ANNEES) if ANNEES else annees_du_cube(cube)
+
+    # 2) Rapport inchangé si le cube et les paramètres n'ont pas bougé depuis la dernière écriture
+    empreinte = rapport_npai.empreinte_donnees(_cube_vers_cellules(cube), annees, TARIFS, ORDRE_TYPES)
+    chemin_etat = os.path.join(DOSSIER_CACHE, "rapport.json") if DOSSIER_CACHE else None
+    sorties = (FICHIER_SORTIE, IMAGE_GRAPHE)
+    if rapport_npai.rapport_a_jour(chemin_etat, empreinte, sorties):
+        print(f"⏭️ Données inchangées, rapport conservé : {FICHIER_SORTIE}")
+        progression.signaler("Rapport à jour", 4, 4)
+        return
+
+    # 3) Frais documentaires (un tableau par année, avec ligne TOTAL (3 types))
+    frais = {an: frais_par_annee(cube, an) for an in annees}
 
     # 4) Évolution des traitements (volume par mois)
-    df_evol = evolution_traitements(df_total, annees=(2024, 2025))
-
-    # 5) Écrire le fichier Excel (3 onglets)
-    with pd.ExcelWriter(FICHIER_SORTIE, engine="openpyxl") as writer:
-        frais_2024.to_excel(writer, sheet_name="Frais 2024")
-        frais_2025.to_excel(writer, sheet_name="Frais 2025")
-        df_evol.to_excel(writer, sheet_name="Évolution traitements")
-
-    # 6) Formater en monétaire (€) les feuilles de frais
-    formater_monnaie_excel(FICHIER_SORTIE, feuilles=("Frais 2024", "Frais 2025"))
+    df_evol = evolution_traitements(cube, annees=annees)
+
+    progression.signaler("Écriture du rapport", 2, 4)
+    # 5) Écrire le fichier Excel en une fois : un onglet de frais par année (format €),
+    #    l'évolution et son graphe
+    feuilles_frais = [(f"Frais {an}", table) for an, table in frais.items()]
+    rapport_npai.ecrire_rapport(
+        FICHIER_SORTIE,
+        feuilles_frais + [("Évolution traitements", df_evol)],
+        feuilles_monnaie={nom for nom, _ in feuilles_frais},
+        graphe=("Évolution traitements", titre_graphe(df_evol)),
+    )
 
-    # 7) Graphe comparatif (deux courbes) + image PNG
+    # 6) Image PNG du graphe
+    progression.signaler("Graphe", 3, 4)
     tracer_graphe(df_evol, path_png=IMAGE_GRAPHE)
+    rapport_npai.noter_rapport(chemin_etat, empreinte, sorties)
+    progression.signaler("Terminé", 4, 4)
 
     print(f"✅ Fichier écrit : {FICHIER_SORTIE}")
     print(f"✅ Graphe enregistré : {IMAGE_GRAPHE}")
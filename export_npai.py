@@ -0,0 +1,93 @@
+import os
+import gzip
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+import mesures_npai
+
+# ============================================================
+#     EXPORTS EN FLUX (mémoire bornée)
+# ============================================================
+# Les données arrivent par morceaux (itérables de DataFrame) et sont écrites au fil de l'eau :
+# classeur openpyxl en mode write_only (les lignes partent dans un fichier temporaire au lieu
+# d'être gardées en mémoire), CSV compressé, Parquet. Une feuille Excel pleine est continuée
+# automatiquement sur une feuille "Nom (2)", "Nom (3)", ...
+
+LIMITE_LIGNES_EXCEL = 1_048_576            # lignes par feuille, en-tête compris
+TAILLE_LOT = 50_000                        # lignes par morceau lu dans le stockage
+
+
+def _valeurs(df: pd.DataFrame):
+    """Lignes prêtes pour openpyxl : valeurs manquantes -> cellule vide."""
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def _aligner(morceaux, colonnes):
+    """Chaque morceau est aligné sur `colonnes` (colonne absente d'un morceau -> vide)."""
+    for df in morceaux:
+        yield df.reindex(columns=colonnes)
+
+
+@mesures_npai.mesurer("ecriture_classeur")
+def ecrire_classeur(chemin: str, feuilles, lignes_par_feuille: int = LIMITE_LIGNES_EXCEL) -> dict:
+    """
+    feuilles : liste de (nom_feuille, colonnes, itérable de DataFrame).
+    Renvoie {nom_feuille: nombre de lignes écrites}.
+    """
+    wb = Workbook(write_only=True)
+    totaux = {}
+    for nom, colonnes, morceaux in feuilles:
+        colonnes = list(colonnes)
+        numero, ws, lignes_ws = 1, None, 0
+        total = 0
+        for df in _aligner(morceaux, colonnes):
+            for ligne in _valeurs(df):
+                if ws is None or lignes_ws >= lignes_par_feuille:
+                    titre = nom if numero == 1 else f"{nom} ({numero})"
+                    ws = wb.create_sheet(title=titre[:31])
+                    ws.append(colonnes)
+                    numero, lignes_ws = numero + 1, 1
+                ws.append(ligne)
+                lignes_ws += 1
+                total += 1
+        if ws is None:                      # aucune ligne : feuille avec en-tête seul
+            wb.create_sheet(title=nom[:31]).append(colonnes)
+        totaux[nom] = total
+    tmp = chemin + ".tmp"
+    wb.save(tmp)
+    os.replace(tmp, chemin)
+    mesures_npai.compter(lignes_sortie=sum(totaux.values()), octets_ecrits=mesures_npai.taille_fichier(chemin))
+    return totaux
+
+
+@mesures_npai.mesurer("ecriture_csv_gz")
+def ecrire_csv_gz(chemin: str, colonnes, morceaux, sep=";") -> int:
+    colonnes = list(colonnes)
+    total = 0
+    tmp = chemin + ".tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", newline="") as f:
+        f.write(sep.join(colonnes) + "\n")
+        for df in _aligner(morceaux, colonnes):
+            df.to_csv(f, sep=sep, index=False, header=False)
+            total += len(df)
+    os.replace(tmp, chemin)
+    mesures_npai.compter(lignes_sortie=total, octets_ecrits=mesures_npai.taille_fichier(chemin))
+    return total
+
+
+@mesures_npai.mesurer("ecriture_parquet")
+def ecrire_parquet(chemin: str, colonnes, morceaux) -> int:
+    """Un seul fichier Parquet, écrit lot par lot (colonnes en texte pour un schéma commun à tous les lots)."""
+    colonnes = list(colonnes)
+    schema = pa.schema([(c, pa.string()) for c in colonnes])
+    total = 0
+    tmp = chemin + ".tmp"
+    with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+        for df in _aligner(morceaux, colonnes):
+            texte = df.astype("string")
+            writer.write_table(pa.Table.from_pandas(texte, schema=schema, preserve_index=False))
+            total += len(df)
+    os.replace(tmp, chemin)
+    mesures_npai.compter(lignes_sortie=total, octets_ecrits=mesures_npai.taille_fichier(chemin))
+    return total
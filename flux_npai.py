@@ -0,0 +1,102 @@
+import queue
+import threading
+from contextlib import contextmanager
+import mesures_npai
+
+# ============================================================
+#     ÉTAGES EN PARALLÈLE RELIÉS PAR DES FILES BORNÉES
+# ============================================================
+# Chaque étage (téléchargement, extraction, lecture / intégration…) tourne dans son thread et passe
+# ses résultats au suivant par une file bornée : un étage en avance attend que le suivant ait
+# consommé (la mémoire reste bornée). La première erreur d'un étage arrête toute la chaîne, puis
+# est relancée par Chaine.attendre() dans le thread appelant.
+# Les threads d'étage portent le nom du thread qui les lance suivi de "/étage" : l'interface
+# rattache leurs logs à la bonne tâche, et leurs mesures vont dans l'exécution en cours.
+
+ATTENTE = 0.1   # secondes entre deux vérifications de l'arrêt pendant une attente sur une file
+_FIN = object()
+
+
+class Arret(Exception):
+    """La chaîne a été arrêtée par l'erreur d'un autre étage."""
+
+
+class FileBornee:
+    def __init__(self, taille: int, arret: threading.Event):
+        self._file = queue.Queue(maxsize=taille)
+        self._arret = arret
+
+    def mettre(self, element):
+        """Attend une place dans la file (contre-pression) ; lève Arret si la chaîne s'arrête."""
+        while True:
+            if self._arret.is_set():
+                raise Arret()
+            try:
+                self._file.put(element, timeout=ATTENTE)
+                return
+            except queue.Full:
+                continue
+
+    def fermer(self):
+        """Plus aucun élément : les consommateurs sortent de leur boucle."""
+        self.mettre(_FIN)
+
+    def __iter__(self):
+        while True:
+            if self._arret.is_set():
+                raise Arret()
+            try:
+                element = self._file.get(timeout=ATTENTE)
+            except queue.Empty:
+                continue
+            if element is _FIN:
+                return
+            yield element
+
+
+class Chaine:
+    def __init__(self):
+        self.arret = threading.Event()
+        self._threads = []
+        self._erreurs = []
+
+    def file(self, taille: int) -> FileBornee:
+        return FileBornee(taille, self.arret)
+
+    def lancer(self, nom: str, fonction, *args, **kwargs) -> threading.Thread:
+        """Exécute fonction(*args, **kwargs) dans un nouveau thread d'étage."""
+        contexte = mesures_npai.contexte()
+
+        def executer():
+            try:
+                with mesures_npai.rattacher(contexte):
+                    fonction(*args, **kwargs)
+            except BaseException as e:
+                self._echec(e)
+
+        thread = threading.Thread(target=executer, name=f"{threading.current_thread().name}/{nom}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+        return thread
+
+    def _echec(self, erreur):
+        if not isinstance(erreur, Arret):
+            self._erreurs.append(erreur)
+        self.arret.set()
+
+    @contextmanager
+    def etage(self):
+        """Étage exécuté dans le thread appelant (objets COM liés à ce thread) ; son erreur arrête la chaîne."""
+        try:
+            yield
+        except BaseException as e:
+            self._echec(e)
+            self.attendre()
+            raise
+
+    def attendre(self):
+        """Attend la fin de tous les étages ; relance la première erreur survenue."""
+        for thread in self._threads:
+            thread.join()
+        if self._erreurs:
+            raise self._erreurs[0]
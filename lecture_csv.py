@@ -0,0 +1,299 @@
+import os
+import re
+import csv
+import io
+import json
+import time
+import queue
+import hashlib
+import zipfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+# ============================================================
+#     LECTURE RAPIDE DES CSV ASTERION
+# ============================================================
+# Le séparateur et l'encodage sont détectés sur un court extrait du fichier (et non plus en
+# parsant tout le fichier avec le moteur python). Le séparateur est mémorisé par « motif » de
+# nom de fichier (chiffres remplacés par #) : les fichiers suivants de la même source n'ont
+# plus besoin du Sniffer. Le fichier est ensuite lu une seule fois avec le moteur C de pandas.
+
+# Les fichiers peuvent aussi être lus directement dans une archive ZIP (SourceCsv.membre) ou en
+# mémoire (SourceCsv.octets), sans extraction préalable sur le partage réseau.
+
+# Types : ceux déclarés par l'appelant (`types`, ex. "category" pour les colonnes à peu de valeurs
+# distinctes) sont appliqués dès le parsing ; les autres colonnes texte dont les valeurs se répètent
+# assez sont ensuite converties en catégories (un code par ligne au lieu d'une chaîne Python).
+
+TAILLE_EXTRAIT = 64 * 1024
+SEPARATEURS = ";,\t|"
+MOTEUR = "c"            # "c" ou "pyarrow" (si installé)
+RATIO_CATEGORIE = 0.5   # colonne texte convertie en catégories si valeurs distinctes <= 50 % des lignes
+
+
+def motif_source(nom_fichier: str) -> str:
+    """'Export_20250312_B2C.csv' -> 'export_#_b#c.csv' : clé commune à tous les envois d'une même source."""
+    return re.sub(r"\d+", "#", os.path.basename(nom_fichier).lower())
+
+
+def _decoder_extrait(extrait: bytes) -> tuple[str, str]:
+    """Renvoie (encodage, texte) pour l'extrait ; un caractère UTF-8 coupé en fin d'extrait est toléré."""
+    if extrait.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig", extrait[3:].decode("utf-8", errors="ignore")
+    for coupe in range(4):
+        try:
+            return "utf-8", extrait[:len(extrait) - coupe].decode("utf-8")
+        except UnicodeDecodeError:
+            continue
+    return "latin1", extrait.decode("latin1")
+
+
+def detecter_separateur(texte: str) -> str:
+    lignes = texte.splitlines()[:20]
+    try:
+        return csv.Sniffer().sniff("\n".join(lignes), delimiters=SEPARATEURS).delimiter
+    except csv.Error:
+        entete = lignes[0] if lignes else ""
+        return max(SEPARATEURS, key=entete.count)
+
+
+def charger_formats(chemin_json: str | None) -> dict:
+    """Formats mémorisés {motif: {"sep", "encoding"}} (dictionnaire vide si absent ou illisible)."""
+    if not chemin_json or not os.path.exists(chemin_json):
+        return {}
+    try:
+        with open(chemin_json, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def sauver_formats(chemin_json: str | None, formats: dict):
+    if not chemin_json:
+        return
+    os.makedirs(os.path.dirname(chemin_json) or ".", exist_ok=True)
+    with open(chemin_json, "w", encoding="utf-8") as f:
+        json.dump(formats, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _entete(texte: str, sep: str) -> list[str]:
+    premiere = texte.splitlines()[0] if texte else ""
+    return next(csv.reader([premiere], delimiter=sep), [])
+
+
+def _parser(source, fmt: dict, usecols=None, types=None) -> pd.DataFrame:
+    return pd.read_csv(source, sep=fmt["sep"], encoding=fmt["encoding"], engine=MOTEUR, usecols=usecols,
+                       dtype=types)
+
+
+def compacter(df: pd.DataFrame, ratio: float = RATIO_CATEGORIE) -> pd.DataFrame:
+    """Colonnes texte aux valeurs répétées -> catégories (en place, renvoie df)."""
+    for col in df.columns:
+        serie = df[col]
+        if not (pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie)) \
+                or isinstance(serie.dtype, pd.CategoricalDtype) or len(serie) == 0:
+            continue
+        codes, uniques = pd.factorize(serie)
+        if len(uniques) <= ratio * len(serie):
+            df[col] = pd.Categorical.from_codes(codes, categories=uniques)
+    return df
+
+
+def lire_octets(octets: bytes, nom: str, formats: dict | None = None, colonnes=None, types=None) -> pd.DataFrame:
+    """
+    Lit le contenu d'un CSV Asterion avec le moteur C (ou pyarrow), en une seule passe.
+    - nom : nom du fichier, sert de clé (motif) pour le cache de formats.
+    - formats : cache {motif: format} consulté puis complété (peut être partagé entre fichiers).
+    - colonnes : si fourni, seules ces colonnes sont décodées (vue étroite).
+    - types : {colonne: dtype} déclarés (colonnes absentes ignorées) ; le reste est compacté après lecture.
+    L'encodage est toujours vérifié sur l'extrait (peu coûteux) ; seul le séparateur est repris du cache,
+    et il est redétecté s'il ne retrouve pas d'en-tête plausible.
+    """
+    formats = {} if formats is None else formats
+    cle = motif_source(nom)
+    extrait = octets[:TAILLE_EXTRAIT]
+    encodage, texte = _decoder_extrait(extrait)
+
+    sep = formats.get(cle, {}).get("sep")
+    if sep is None or len(_entete(texte, sep)) < 2:
+        sep = detecter_separateur(texte)
+    fmt = {"sep": sep, "encoding": encodage}
+
+    def colonnes_utiles(texte):
+        if colonnes is None:
+            return None
+        return [c for c in _entete(texte, sep) if c in set(colonnes)]
+
+    try:
+        df = _parser(io.BytesIO(octets), fmt, colonnes_utiles(texte), types)
+    except UnicodeDecodeError:
+        # L'extrait était en UTF-8 valide mais pas la suite du fichier
+        fmt["encoding"] = "latin1"
+        df = _parser(io.BytesIO(octets), fmt, colonnes_utiles(extrait.decode("latin1")), types)
+
+    formats[cle] = fmt
+    return compacter(df) if types is not None else df
+
+
+def lire_csv(chemin: str, formats: dict | None = None, colonnes=None, types=None) -> pd.DataFrame:
+    """Comme lire_octets, pour un fichier sur disque (lu une seule fois)."""
+    with open(chemin, "rb") as f:
+        return lire_octets(f.read(), chemin, formats, colonnes, types)
+
+
+# ============================================================
+#     SOURCES : FICHIER, MEMBRE D'ARCHIVE ZIP, OCTETS EN MÉMOIRE
+# ============================================================
+SourceCsv = namedtuple("SourceCsv", ["nom", "chemin", "membre", "octets"], defaults=(None, None, None))
+
+
+def source_fichier(chemin: str) -> SourceCsv:
+    return SourceCsv(os.path.basename(chemin), chemin)
+
+
+def sources_zip(archive, nom_archive: str | None = None) -> list[SourceCsv]:
+    """
+    Membres CSV d'une archive ZIP, sans extraction.
+    `archive` est un chemin (les membres seront lus dans l'archive par les processus de lecture)
+    ou le contenu de l'archive en octets (les membres sont alors décompressés ici, en mémoire).
+    """
+    en_memoire = isinstance(archive, (bytes, bytearray))
+    with zipfile.ZipFile(io.BytesIO(archive) if en_memoire else archive) as zf:
+        membres = [m for m in zf.namelist() if m.lower().endswith(".csv") and not m.endswith("/")]
+        if en_memoire:
+            return [SourceCsv(os.path.basename(m), None, m, zf.read(m)) for m in membres]
+    return [SourceCsv(os.path.basename(m), archive, m) for m in membres]
+
+
+def octets_source(source: SourceCsv) -> bytes:
+    if source.octets is not None:
+        return source.octets
+    if source.membre is not None:
+        with zipfile.ZipFile(source.chemin) as zf:
+            return zf.read(source.membre)
+    with open(source.chemin, "rb") as f:
+        return f.read()
+
+
+def empreinte(octets: bytes) -> str:
+    """Empreinte du contenu (SHA-256), indépendante du nom du fichier."""
+    return hashlib.sha256(octets).hexdigest()
+
+
+# ============================================================
+#     LECTURE PARALLÈLE DE PLUSIEURS FICHIERS
+# ============================================================
+ResultatLecture = namedtuple("ResultatLecture", ["source", "df", "erreur", "empreinte", "taille", "duree"])
+
+_DEJA_VUS = frozenset()
+
+
+def _initialiser_processus(deja_vus):
+    global _DEJA_VUS
+    _DEJA_VUS = deja_vus
+
+
+def _lire_tache(tache, deja_vus=None):
+    """
+    Exécutée dans un processus de lecture : ne lève jamais, l'erreur est renvoyée.
+    Un contenu dont l'empreinte est déjà connue n'est pas parsé (df None, erreur None).
+    """
+    source, formats, colonnes, types = tache
+    deja_vus = _DEJA_VUS if deja_vus is None else deja_vus
+    debut = time.perf_counter()
+    emp = taille = None
+    try:
+        octets = octets_source(source)
+        emp, taille = empreinte(octets), len(octets)
+        if emp in deja_vus:
+            return None, None, None, emp, taille, time.perf_counter() - debut
+        df = lire_octets(octets, source.nom, formats, colonnes, types)
+        return df, formats.get(motif_source(source.nom)), None, emp, taille, time.perf_counter() - debut
+    except Exception as e:
+        return None, None, str(e), emp, taille, time.perf_counter() - debut
+
+
+def _en_flux(pool, taches, fenetre: int):
+    """
+    Soumet les tâches au pool au fur et à mesure qu'elles arrivent (`taches` peut être alimenté par un
+    autre étage) et renvoie les (tâche, résultat) dans l'ordre, avec au plus `fenetre` tâches d'avance.
+    """
+    soumises = queue.Queue(maxsize=fenetre)
+    abandon = threading.Event()
+
+    def deposer(element) -> bool:
+        while not abandon.is_set():
+            try:
+                soumises.put(element, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def alimenter():
+        try:
+            for tache in taches:
+                if not deposer((tache, pool.submit(_lire_tache, tache))):
+                    return
+            deposer(None)
+        except BaseException as e:   # erreur de la source de fichiers : relancée chez le consommateur
+            deposer(e)
+
+    threading.Thread(target=alimenter, name=f"{threading.current_thread().name}/soumission", daemon=True).start()
+    try:
+        while (element := soumises.get()) is not None:
+            if isinstance(element, BaseException):
+                raise element
+            tache, future = element
+            yield tache, future.result()
+    finally:
+        abandon.set()
+
+
+def lire_plusieurs(sources, formats: dict | None = None, colonnes=None, nb_processus=None, deja_vus=frozenset(),
+                   types=None):
+    """
+    Lit des sources (SourceCsv ou chemins), en parallèle sur `nb_processus` processus
+    (None = nb de cœurs - 1, 1 = lecture séquentielle dans le processus courant).
+    `sources` peut être une liste ou un itérable alimenté au fil de l'eau (ex. file d'un autre étage) :
+    chaque fichier part à la lecture dès qu'il arrive.
+    Générateur de ResultatLecture dans l'ordre de `sources`, quel que soit l'ordre de fin des lectures.
+    Les lectures ne prennent que deux fichiers d'avance par processus sur le consommateur : les
+    DataFrames lus mais pas encore consommés ne s'accumulent pas en mémoire.
+    Les contenus dont l'empreinte est dans `deja_vus` (ou déjà rencontrée dans ce lot) sont
+    renvoyés avec df=None et erreur=None. Les formats détectés sont reportés dans `formats`.
+    """
+    formats = {} if formats is None else formats
+    deja_vus = frozenset(deja_vus)
+    if nb_processus is None:
+        nb_processus = max(1, (os.cpu_count() or 2) - 1)
+    if hasattr(sources, "__len__"):
+        nb_processus = min(nb_processus, len(sources))
+
+    def taches():
+        # chaque tâche n'emporte que le format mémorisé de sa propre source (y compris un format
+        # détecté sur un fichier précédent du même lot)
+        for source in sources:
+            source = source if isinstance(source, SourceCsv) else source_fichier(source)
+            cle = motif_source(source.nom)
+            yield source, {cle: formats[cle]} if cle in formats else {}, colonnes, types
+
+    def assembler(resultats):
+        vus_dans_lot = set()
+        for (source, *_), (df, fmt, erreur, emp, taille, duree) in resultats:
+            if fmt is not None:
+                formats[motif_source(source.nom)] = fmt
+            if emp is not None and erreur is None:
+                if emp in vus_dans_lot:
+                    df = None
+                vus_dans_lot.add(emp)
+            yield ResultatLecture(source, df, erreur, emp, taille, duree)
+
+    if nb_processus <= 1:
+        yield from assembler((t, _lire_tache(t, deja_vus)) for t in taches())
+        return
+    with ProcessPoolExecutor(max_workers=nb_processus, initializer=_initialiser_processus,
+                             initargs=(deja_vus,)) as pool:
+        yield from assembler(_en_flux(pool, taches(), 2 * nb_processus))
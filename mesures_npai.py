@@ -0,0 +1,291 @@
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import socket
+import cProfile
+import threading
+import functools
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager
+try:
+    import psutil
+except ImportError:   # mémoire lue dans /proc sous Linux, non mesurée ailleurs
+    psutil = None
+
+# ============================================================
+#     MESURES PAR ÉTAPE ET RAPPORT D'EXÉCUTION
+# ============================================================
+# Chaque étape (téléchargement, lecture CSV, stockage, dédoublonnage, exports…) relève sa durée,
+# les lignes en entrée / sortie, les octets lus / écrits et le pic de mémoire du processus pendant
+# l'étape. Une exécution (pipeline, analyse) écrit un rapport JSON et ajoute une ligne de résumé
+# à historique.jsonl : les exécutions se comparent d'un jour à l'autre.
+# Profilage à la demande : NPAI_PROFIL=1 (cProfile) et NPAI_TRACEMALLOC=1 (allocations Python).
+
+PROFILER = os.environ.get("NPAI_PROFIL") == "1"
+TRACEMALLOC = os.environ.get("NPAI_TRACEMALLOC") == "1"
+INTERVALLE_MEMOIRE = 0.05      # secondes entre deux relevés de mémoire pendant une exécution
+NB_LIGNES_PROFIL = 30          # fonctions les plus coûteuses reprises dans le rapport
+COMPTEURS = ("lignes_entree", "lignes_sortie", "octets_lus", "octets_ecrits")
+
+_local = threading.local()
+_ouvertes = []                 # étapes en cours (tous threads) : le relevé de mémoire les met à jour
+_verrou = threading.Lock()
+
+
+def memoire_processus() -> int | None:
+    """Mémoire résidente du processus en octets (None si elle ne peut pas être lue)."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Etape:
+    def __init__(self, nom, parent, origine):
+        self.nom = nom
+        self.parent = parent
+        self.debut = time.perf_counter() - origine
+        self.duree = None
+        self.compteurs = dict.fromkeys(COMPTEURS, 0)
+        self.pic_memoire = memoire_processus()
+        self.pic_python = None
+
+    def noter_memoire(self, rss):
+        if rss is not None and (self.pic_memoire is None or rss > self.pic_memoire):
+            self.pic_memoire = rss
+
+    def noter_python(self, pic):
+        self.pic_python = pic if self.pic_python is None else max(self.pic_python, pic)
+
+    def en_dict(self) -> dict:
+        return {"nom": self.nom, "parent": self.parent, "debut_s": round(self.debut, 3),
+                "duree_s": None if self.duree is None else round(self.duree, 3),
+                **self.compteurs, "pic_memoire": self.pic_memoire, "pic_python": self.pic_python}
+
+
+def _pile() -> list:
+    if not hasattr(_local, "pile"):
+        _local.pile = []
+    return _local.pile
+
+
+def _session():
+    return getattr(_local, "session", None)
+
+
+@contextmanager
+def etape(nom: str):
+    """
+    Mesure le bloc. Sans exécution en cours dans ce thread, le bloc s'exécute sans rien relever.
+    Les étapes s'imbriquent : le parent de chacune est noté dans le rapport.
+    """
+    session = _session()
+    if session is None:
+        yield None
+        return
+    pile = _pile()
+    if TRACEMALLOC and tracemalloc.is_tracing():
+        # le pic courant est reporté sur les étapes ouvertes avant d'être remis à zéro
+        pic = tracemalloc.get_traced_memory()[1]
+        for ouverte in pile:
+            ouverte.noter_python(pic)
+        tracemalloc.reset_peak()
+    e = Etape(nom, pile[-1].nom if pile else None, session.origine)
+    pile.append(e)
+    with _verrou:
+        _ouvertes.append(e)
+    try:
+        yield e
+    finally:
+        e.duree = time.perf_counter() - session.origine - e.debut
+        e.noter_memoire(memoire_processus())
+        if TRACEMALLOC and tracemalloc.is_tracing():
+            e.noter_python(tracemalloc.get_traced_memory()[1])
+            if len(pile) > 1:
+                pile[-2].noter_python(e.pic_python)
+        with _verrou:
+            _ouvertes.remove(e)
+        pile.pop()
+        if pile:
+            pile[-1].noter_memoire(e.pic_memoire)
+        session.etapes.append(e)
+
+
+def contexte():
+    """Exécution et étape en cours dans ce thread, à transmettre à un thread de travail (rattacher)."""
+    pile = _pile()
+    return _session(), (pile[-1] if pile else None)
+
+
+@contextmanager
+def rattacher(ctx):
+    """Dans un thread de travail : ses étapes comptent dans l'exécution `ctx`, sous l'étape qui l'a lancé."""
+    session, parent = ctx
+    _local.session = session
+    _local.pile = [parent] if parent is not None else []
+    try:
+        yield
+    finally:
+        _local.session = None
+        _local.pile = []
+
+
+def mesurer(nom: str):
+    """Décorateur : la fonction entière est une étape."""
+    def decorateur(fonction):
+        @functools.wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            with etape(nom):
+                return fonction(*args, **kwargs)
+        return enveloppe
+    return decorateur
+
+
+def compter(**compteurs):
+    """Ajoute des compteurs (lignes_entree, lignes_sortie, octets_lus, octets_ecrits) à l'étape en cours."""
+    pile = _pile()
+    if not pile:
+        return
+    for cle, valeur in compteurs.items():
+        if cle not in pile[-1].compteurs:
+            raise KeyError(f"Compteur inconnu : {cle}")
+        pile[-1].compteurs[cle] += int(valeur or 0)
+
+
+def taille_fichier(chemin: str) -> int:
+    try:
+        return os.path.getsize(chemin)
+    except OSError:
+        return 0
+
+
+# ============================================================
+#     EXÉCUTION : RAPPORT JSON + HISTORIQUE
+# ============================================================
+class _Session:
+    def __init__(self, nom):
+        self.nom = nom
+        self.origine = time.perf_counter()
+        self.etapes = []
+        self.fin = threading.Event()
+
+
+def _relever_memoire(session):
+    while not session.fin.wait(INTERVALLE_MEMOIRE):
+        rss = memoire_processus()
+        with _verrou:
+            for e in _ouvertes:
+                e.noter_memoire(rss)
+
+
+@contextmanager
+def execution(nom: str, dossier_rapports: str | None, parametres: dict | None = None):
+    """
+    Toutes les étapes du bloc (dans ce thread) sont relevées, puis un rapport
+    <dossier_rapports>/<nom>_<date>.json est écrit, même si le bloc lève une exception.
+    dossier_rapports=None : mesures faites mais aucun fichier écrit.
+    """
+    if _session() is not None:          # exécution imbriquée (ex. pipeline -> maj_aggregats) : une seule
+        with etape(nom):
+            yield
+        return
+
+    session = _Session(nom)
+    _local.session = session
+    debut = datetime.now()
+    profil = cProfile.Profile() if PROFILER else None
+    demarre_tracemalloc = TRACEMALLOC and not tracemalloc.is_tracing()
+    if demarre_tracemalloc:
+        tracemalloc.start()
+    releve = threading.Thread(target=_relever_memoire, args=(session,), daemon=True)
+    releve.start()
+    statut, erreur = "ok", None
+    try:
+        with etape(nom):
+            if profil is not None:
+                profil.enable()
+            try:
+                yield
+            finally:
+                if profil is not None:
+                    profil.disable()
+    except BaseException as e:
+        statut, erreur = "erreur", repr(e)
+        raise
+    finally:
+        session.fin.set()
+        releve.join()
+        allocations = _principales_allocations() if TRACEMALLOC and tracemalloc.is_tracing() else None
+        if demarre_tracemalloc:
+            tracemalloc.stop()
+        _local.session = None
+        if dossier_rapports:
+            try:
+                _ecrire_rapport(dossier_rapports, session, debut, statut, erreur, parametres, profil, allocations)
+            except Exception as e:
+                print(f"⚠️ Rapport d'exécution non écrit : {e}")
+
+
+def _principales_allocations(nb=10) -> list:
+    stats = tracemalloc.take_snapshot().statistics("lineno")[:nb]
+    return [{"lieu": str(s.traceback), "octets": s.size, "nombre": s.count} for s in stats]
+
+
+def _ecrire_rapport(dossier, session, debut, statut, erreur, parametres, profil, allocations):
+    os.makedirs(dossier, exist_ok=True)
+    racine = os.path.join(dossier, f"{session.nom}_{debut:%Y%m%d_%H%M%S}")
+    etapes = sorted(session.etapes, key=lambda e: e.debut)
+    principale = next(e for e in etapes if e.parent is None)
+    rapport = {
+        "nom": session.nom,
+        "debut": debut.isoformat(timespec="seconds"),
+        "duree_s": round(principale.duree, 3),
+        "statut": statut,
+        "erreur": erreur,
+        "pic_memoire": principale.pic_memoire,
+        "machine": socket.gethostname(),
+        "python": sys.version.split()[0],
+        "parametres": parametres or {},
+        "etapes": [e.en_dict() for e in etapes],
+    }
+    if profil is not None:
+        profil.dump_stats(racine + ".prof")
+        texte = io.StringIO()
+        pstats.Stats(profil, stream=texte).sort_stats("cumulative").print_stats(NB_LIGNES_PROFIL)
+        rapport["profil"] = {"fichier": racine + ".prof", "extrait": texte.getvalue().splitlines()}
+    if allocations is not None:
+        rapport["allocations"] = allocations
+
+    with open(racine + ".json", "w", encoding="utf-8") as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2, default=str)
+
+    # résumé d'une ligne par exécution : durée totale et durée cumulée de chaque étape
+    durees = {}
+    for e in etapes:
+        durees[e.nom] = round(durees.get(e.nom, 0) + (e.duree or 0), 3)
+    resume = {"nom": session.nom, "debut": rapport["debut"], "statut": statut, "duree_s": rapport["duree_s"],
+              "pic_memoire": rapport["pic_memoire"], "etapes": durees}
+    with open(os.path.join(dossier, "historique.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(resume, ensure_ascii=False) + "\n")
+    print(f"📊 Rapport d'exécution : {racine}.json")
+
+
+def historique(dossier: str, nom: str | None = None):
+    """Durées par étape de toutes les exécutions (une ligne par exécution), pour repérer les régressions."""
+    import pandas as pd
+    chemin = os.path.join(dossier, "historique.jsonl")
+    if not os.path.exists(chemin):
+        return pd.DataFrame()
+    with open(chemin, encoding="utf-8") as f:
+        lignes = [json.loads(l) for l in f if l.strip()]
+    if nom is not None:
+        lignes = [l for l in lignes if l["nom"] == nom]
+    return pd.DataFrame([{"nom": l["nom"], "debut": l["debut"], "statut": l["statut"], "duree_s": l["duree_s"],
+                          "pic_memoire": l["pic_memoire"], **l["etapes"]} for l in lignes])
@@ -0,0 +1,174 @@
+"""
+Outil RA NPAI en ligne de commande (sans interface graphique, utilisable en tâche planifiée
+ou sur un serveur Linux).
+
+    npai ingest  [--reconstruction] [--sans-mail | --eml DOSSIER] [--budget-memoire MO]
+    npai analyse [--csv DOSSIER]
+    npai report
+    npai export
+    npai recherche [CONTRAT ...] [--liste FICHIER] [--du DATE] [--au DATE] [--csv FICHIER]
+
+Options communes : --config fichier.json (ou variable NPAI_CONFIG), --base DOSSIER
+(ou variable NPAI_DOSSIER_BASE), -p CLE=valeur (constante du module concerné, ou chemin partagé :
+DOSSIER_STORE, DOSSIER_INDEX_CONTRATS), --profil, --tracemalloc.
+"""
+import os
+import sys
+import argparse
+import config_npai
+
+# Les modules de traitement (pandas, pyarrow, openpyxl, matplotlib, COM) ne sont importés que par la
+# commande qui en a besoin : l'aide et la lecture de la configuration sont immédiates.
+
+
+def _configurer(module, args, config):
+    """
+    Dossier de base, puis section du fichier de configuration, puis paramètres -p. Les chemins partagés
+    (config_npai.CHEMINS_PARTAGES) vont à config_npai, quelle que soit la section où ils sont écrits :
+    toutes les commandes voient le même stockage et le même index.
+    """
+    base = args.base or config.get("dossier_base")
+    if base:
+        module.configurer(base)
+    partages = config_npai.CHEMINS_PARTAGES
+    for section in config.values():
+        if isinstance(section, dict):
+            config_npai.appliquer(config_npai, {cle: v for cle, v in section.items() if cle in partages})
+    for reglages in (config.get(module.__name__, {}), dict(config_npai.lire_parametre(p) for p in args.parametre)):
+        config_npai.appliquer(config_npai, {cle: v for cle, v in reglages.items() if cle in partages})
+        config_npai.appliquer(module, {cle: v for cle, v in reglages.items() if cle not in partages})
+
+
+def commande_ingest(args, config):
+    import traitement_npai
+    _configurer(traitement_npai, args, config)
+    if args.budget_memoire:
+        traitement_npai.BUDGET_MEMOIRE_MO = args.budget_memoire
+    if args.sans_mail:
+        import mesures_npai
+        with mesures_npai.execution("ingestion", traitement_npai.DOSSIER_RAPPORTS,
+                                    {"reconstruction_totale": args.reconstruction}):
+            traitement_npai.maj_aggregats(reconstruction_totale=args.reconstruction)
+        return
+    source = None
+    if args.eml:
+        import sources_mail
+        source = sources_mail.SourceDossierEml(args.eml)
+    traitement_npai.pipeline(reconstruction_totale=args.reconstruction, source_mail=source)
+
+
+def commande_analyse(args, config):
+    import couts_et_graphique as cg
+    import mesures_npai
+    _configurer(cg, args, config)
+    with mesures_npai.execution("analyse", cg.DOSSIER_RAPPORTS):
+        cube = cg.calculer_cube()
+        annees = list(cg.ANNEES) if cg.ANNEES else cg.annees_du_cube(cube)
+        tableaux = {f"Frais {an}": cg.frais_par_annee(cube, an) for an in annees}
+        tableaux["Évolution traitements"] = cg.evolution_traitements(cube, annees=annees)
+    for nom, table in tableaux.items():
+        print(f"\n=== {nom} ===")
+        print(table.to_string())
+        if args.csv:
+            os.makedirs(args.csv, exist_ok=True)
+            table.to_csv(os.path.join(args.csv, f"{nom}.csv"), sep=";", encoding="utf-8-sig")
+    if args.csv:
+        print(f"\n✅ Tableaux écrits dans {args.csv}")
+
+
+def commande_report(args, config):
+    import couts_et_graphique as cg
+    _configurer(cg, args, config)
+    cg.main()
+
+
+def commande_export(args, config):
+    import traitement_npai
+    import mesures_npai
+    _configurer(traitement_npai, args, config)
+    with mesures_npai.execution("export", traitement_npai.DOSSIER_RAPPORTS):
+        traitement_npai.exporter_excel()
+
+
+def commande_recherche(args, config):
+    import recherche_npai
+    _configurer(recherche_npai, args, config)
+    recherche_npai.mettre_a_jour_index()
+    contrats = list(args.contrats)
+    if args.liste:
+        contrats.extend(recherche_npai.lire_fichier_contrats(args.liste))
+    if contrats:
+        lignes = recherche_npai.afficher_contrats(contrats)
+        if args.csv:
+            import stockage_npai
+            stockage_npai.sans_colonnes_internes(lignes).to_csv(args.csv, sep=";", index=False, encoding="utf-8-sig")
+            print(f"✅ {len(lignes)} ligne(s) écrites dans {args.csv}")
+    if args.du or args.au or not contrats:
+        recherche_npai.afficher_comptes(args.du, args.au)
+
+
+def analyser_arguments(argv=None):
+    parser = argparse.ArgumentParser(prog="npai", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    communs = argparse.ArgumentParser(add_help=False)
+    communs.add_argument("--config", help="fichier de configuration JSON")
+    communs.add_argument("--base", help="dossier de base des données (remplace le partage U:\\)")
+    communs.add_argument("-p", "--parametre", action="append", default=[], metavar="CLE=valeur",
+                         help="remplace une constante du module (ex. -p NB_PROCESSUS_LECTURE=4)")
+    communs.add_argument("--profil", action="store_true", help="profil cProfile joint au rapport d'exécution")
+    communs.add_argument("--tracemalloc", action="store_true", help="allocations Python jointes au rapport")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+
+    ingest = commandes.add_parser("ingest", parents=[communs], help="récupère les mails et met à jour les agrégats")
+    ingest.add_argument("--reconstruction", action="store_true", help="reconstruction totale de l'état")
+    ingest.add_argument("--budget-memoire", type=float, metavar="MO",
+                        help="CSV lus gardés en mémoire avant intégration au stockage (défaut : tous)")
+    origine = ingest.add_mutually_exclusive_group()
+    origine.add_argument("--sans-mail", action="store_true", help="CSV du dossier seulement, sans Outlook")
+    origine.add_argument("--eml", metavar="DOSSIER", help="lit les mails dans un dossier de .eml au lieu d'Outlook")
+    ingest.set_defaults(fonction=commande_ingest)
+
+    analyse = commandes.add_parser("analyse", parents=[communs], help="calcule et affiche les tableaux de frais")
+    analyse.add_argument("--csv", metavar="DOSSIER", help="écrit aussi les tableaux en CSV")
+    analyse.set_defaults(fonction=commande_analyse)
+
+    report = commandes.add_parser("report", parents=[communs], help="écrit Frais documents.xlsx et le graphe")
+    report.set_defaults(fonction=commande_report)
+
+    export = commandes.add_parser("export", parents=[communs],
+                                  help="réécrit NPAI Léopold.xlsx et NPAI 2025.xlsx depuis le stockage")
+    export.set_defaults(fonction=commande_export)
+
+    recherche = commandes.add_parser("recherche", parents=[communs],
+                                     help="historique de contrats SCS, ou lignes par type sur une période")
+    recherche.add_argument("contrats", nargs="*", metavar="CONTRAT")
+    recherche.add_argument("--liste", metavar="FICHIER", help="contrats d'un fichier texte / CSV / Excel")
+    recherche.add_argument("--du", metavar="DATE", help="début de la période (inclus), ex. 01/03/2025")
+    recherche.add_argument("--au", metavar="DATE", help="fin de la période (incluse)")
+    recherche.add_argument("--csv", metavar="FICHIER", help="écrit aussi les lignes trouvées en CSV")
+    recherche.set_defaults(fonction=commande_recherche)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = analyser_arguments(argv)
+    config = config_npai.charger_config(args.config)
+    if args.profil or args.tracemalloc:
+        import mesures_npai
+        mesures_npai.PROFILER = mesures_npai.PROFILER or args.profil
+        mesures_npai.TRACEMALLOC = mesures_npai.TRACEMALLOC or args.tracemalloc
+    try:
+        args.fonction(args, config)
+    except KeyboardInterrupt:
+        return 130
+    except Exception as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # Requis pour les processus de lecture CSV (exécutable PyInstaller)
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
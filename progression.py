@@ -0,0 +1,39 @@
+import threading
+from collections import namedtuple
+
+# ============================================================
+#     ÉVÉNEMENTS DE PROGRESSION
+# ============================================================
+# Les traitements signalent leur avancement (étape en cours, éléments faits / total) sans savoir
+# qui écoute : l'interface Tk s'abonne pour alimenter ses barres de progression, le script lancé
+# seul n'écoute rien. Les abonnés sont appelés dans le thread du traitement : ils doivent se
+# contenter de mettre l'événement en file (aucun appel Tk direct).
+
+Progression = namedtuple("Progression", ["etape", "fait", "total"])
+
+_ABONNES = []
+_VERROU = threading.Lock()
+
+
+def abonner(fonction):
+    with _VERROU:
+        if fonction not in _ABONNES:
+            _ABONNES.append(fonction)
+
+
+def desabonner(fonction):
+    with _VERROU:
+        if fonction in _ABONNES:
+            _ABONNES.remove(fonction)
+
+
+def signaler(etape: str, fait: int | None = None, total: int | None = None):
+    """Étape en cours ; `fait` / `total` si l'avancement est mesurable (barre déterminée)."""
+    evenement = Progression(etape, fait, total)
+    with _VERROU:
+        abonnes = list(_ABONNES)
+    for fonction in abonnes:
+        try:
+            fonction(evenement)
+        except Exception:
+            pass   # un abonné défaillant ne doit pas interrompre le traitement
@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.chart import LineChart, Reference
+from openpyxl.styles import Font, Alignment
+from openpyxl.utils import get_column_letter
+import mesures_npai
+
+# ============================================================
+#     RAPPORT EXCEL EN UNE SEULE ÉCRITURE
+# ============================================================
+# Les tableaux sont écrits directement avec openpyxl : format monétaire, largeurs de colonnes et
+# graphe Excel sont appliqués pendant l'écriture, le fichier est enregistré une seule fois (plus de
+# relecture par load_workbook). Une empreinte des données permet de ne pas régénérer un rapport
+# dont les données n'ont pas changé.
+
+FORMAT_MONNAIE = '€ #,##0.00'
+LARGEUR_MAX = 40
+
+
+def _valeur(v):
+    """Valeur prête pour une cellule : NaN -> vide, types numpy -> types Python."""
+    if pd.isna(v):
+        return None
+    return v.item() if hasattr(v, "item") else v
+
+
+def _ecrire_tableau(ws, df: pd.DataFrame, format_nombre: str | None = None):
+    """DF (index compris, comme to_excel) en A1 ; largeurs de colonnes ajustées au contenu."""
+    gras = Font(bold=True)
+    centre = Alignment(horizontal="center")
+    entete = [df.index.name or ""] + [str(c) for c in df.columns]
+    ws.append(entete)
+    for cell in ws[1]:
+        cell.font, cell.alignment = gras, centre
+    largeurs = [len(str(v)) for v in entete]
+
+    for i, (idx, ligne) in enumerate(zip(df.index, df.itertuples(index=False, name=None)), start=2):
+        ws.append([_valeur(idx)] + [_valeur(v) for v in ligne])
+        ws.cell(row=i, column=1).font = gras
+        largeurs[0] = max(largeurs[0], len(str(idx)))
+        for c, v in enumerate(ligne, start=2):
+            cell = ws.cell(row=i, column=c)
+            if format_nombre:
+                cell.number_format = format_nombre
+            texte = f"{v:,.2f} €" if format_nombre and not pd.isna(v) else str(v)
+            largeurs[c - 1] = max(largeurs[c - 1], len(texte))
+
+    for c, largeur in enumerate(largeurs, start=1):
+        ws.column_dimensions[get_column_letter(c)].width = min(largeur + 2, LARGEUR_MAX)
+
+
+def _ajouter_graphe(ws, nb_lignes: int, nb_colonnes: int, titre: str):
+    """Graphe en courbes (une série par ligne du tableau), placé sous le tableau."""
+    graphe = LineChart()
+    graphe.title = titre
+    graphe.y_axis.title = "Nombre de traitements"
+    graphe.x_axis.title = "Mois"
+    graphe.height, graphe.width = 9, 22
+    donnees = Reference(ws, min_col=1, max_col=nb_colonnes + 1, min_row=2, max_row=nb_lignes + 1)
+    graphe.add_data(donnees, from_rows=True, titles_from_data=True)
+    graphe.set_categories(Reference(ws, min_col=2, max_col=nb_colonnes + 1, min_row=1, max_row=1))
+    ws.add_chart(graphe, f"A{nb_lignes + 4}")
+
+
+@mesures_npai.mesurer("ecriture_rapport")
+def ecrire_rapport(chemin: str, tableaux, feuilles_monnaie=(), graphe=None):
+    """
+    tableaux : liste de (nom_feuille, DataFrame), dans l'ordre des onglets.
+    feuilles_monnaie : feuilles dont les montants sont formatés en euros.
+    graphe : (nom_feuille, titre) pour ajouter un graphe en courbes sous le tableau de cette feuille.
+    """
+    wb = Workbook()
+    wb.remove(wb.active)
+    for nom, df in tableaux:
+        ws = wb.create_sheet(title=nom[:31])
+        _ecrire_tableau(ws, df, FORMAT_MONNAIE if nom in feuilles_monnaie else None)
+        if graphe is not None and graphe[0] == nom and len(df):
+            _ajouter_graphe(ws, len(df), len(df.columns), graphe[1])
+    tmp = chemin + ".tmp"
+    wb.save(tmp)
+    os.replace(tmp, chemin)
+    mesures_npai.compter(octets_ecrits=mesures_npai.taille_fichier(chemin))
+
+
+# ============================================================
+#     RÉGÉNÉRATION SEULEMENT SI LES DONNÉES ONT CHANGÉ
+# ============================================================
+def empreinte_donnees(*objets) -> str:
+    """Empreinte d'objets sérialisables en JSON (cube, paramètres du rapport)."""
+    texte = json.dumps(objets, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texte.encode("utf-8")).hexdigest()
+
+
+def _etat_sorties(sorties) -> dict:
+    return {s: os.stat(s).st_mtime_ns for s in sorties}
+
+
+def rapport_a_jour(chemin_etat: str | None, empreinte: str, sorties) -> bool:
+    """Vrai si les sorties existent, n'ont pas été modifiées et viennent des mêmes données."""
+    if not chemin_etat or not os.path.exists(chemin_etat) or not all(os.path.exists(s) for s in sorties):
+        return False
+    try:
+        with open(chemin_etat, encoding="utf-8") as f:
+            etat = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return etat.get("empreinte") == empreinte and etat.get("sorties") == _etat_sorties(sorties)
+
+
+def noter_rapport(chemin_etat: str | None, empreinte: str, sorties):
+    if not chemin_etat:
+        return
+    os.makedirs(os.path.dirname(chemin_etat) or ".", exist_ok=True)
+    with open(chemin_etat, "w", encoding="utf-8") as f:
+        json.dump({"empreinte": empreinte, "sorties": _etat_sorties(sorties)}, f, indent=2)
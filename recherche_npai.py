@@ -0,0 +1,352 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import stockage_npai
+import progression
+import mesures_npai
+import config_npai
+
+# ============================================================
+#     INDEX DES CONTRATS (recherche dans l'historique NPAI)
+# ============================================================
+# Arborescence :  <index>/seaux/seau_007/part-<id>.parquet  +  <index>/etat.json
+# Copie du stockage 'Complet' répartie en seaux par SCS-CONTRAT (même hachage que stockage_npai.seaux_de).
+# Chaque fichier d'un seau est trié par contrat puis DATE TRAITEMENT PND et écrit en petits groupes de
+# lignes : une recherche n'ouvre que les fichiers du seau de chaque contrat, et n'y lit que les groupes
+# dont l'intervalle de contrats peut le contenir. À côté (etat.json), le nombre de lignes par jour et par
+# TYPE DE DOCUMENT : un comptage sur une période ne relit aucune ligne.
+# L'index suit le stockage fichier par fichier (append-only) : seuls les fichiers ajoutés depuis la
+# dernière mise à jour sont indexés, chacun ajoutant un petit fichier trié aux seaux qu'il touche ; un
+# seau de plus de MAX_FICHIERS_SEAU fichiers est fusionné en un seul. Une partition compactée garde son
+# index : le journal des compactions (stockage_npai.compacter_partition) dit quelles lignes du nouveau
+# fichier viennent de fichiers déjà indexés, seules les autres sont indexées. Si des lignes indexées ont
+# disparu du stockage (reconstruction), l'index est reconstruit à côté puis remplace l'ancien.
+
+# Stockage lu et emplacement de l'index : config_npai.store_complet(), config_npai.DOSSIER_INDEX_CONTRATS.
+DOSSIER_BASE = config_npai.dossier_base()    # partage U:\ par défaut, ou variable NPAI_DOSSIER_BASE
+COLONNE_CONTRAT = "SCS-CONTRAT"
+COLONNE_DATE = stockage_npai.COLONNE_PARTITION
+COLONNE_TYPE = "TYPE DE DOCUMENT"
+NB_SEAUX_INDEX = 32
+TAILLE_GROUPE_INDEX = 5_000      # lignes par groupe Parquet : plus petit = recherche plus ciblée, fichiers plus gros
+LIGNES_PAR_LOT_INDEX = 500_000   # fichiers du stockage regroupés avant d'être versés dans les seaux
+MAX_FICHIERS_SEAU = 8            # au-delà, les fichiers d'un seau sont fusionnés (chaque recherche les ouvre tous)
+NB_THREADS_RECHERCHE = 8         # fichiers lus en même temps pour une liste de contrats
+MAX_LIGNES_AFFICHEES = 200       # lignes affichées par recherche (interface, ligne de commande)
+VERSION_INDEX = 1                # à incrémenter si le contenu de l'index change (reconstruction automatique)
+
+_VERROU = threading.Lock()       # mise à jour et recherches exclusives (pipeline et interface dans le même processus)
+
+
+def configurer(dossier_base):
+    """Redirige vers `dossier_base` tous les chemins définis sous DOSSIER_BASE (et les chemins partagés)."""
+    config_npai.configurer(globals(), dossier_base)
+
+
+def _rep_seau(dossier_index: str, seau: int) -> str:
+    return os.path.join(dossier_index, "seaux", f"seau_{seau:03d}")
+
+
+def _chemin_etat(dossier_index: str) -> str:
+    """État JSON : nombre de seaux, fichiers du stockage indexés et comptes par jour de chaque partition."""
+    return os.path.join(dossier_index, "etat.json")
+
+
+def _lire_etat(dossier_index: str) -> dict:
+    chemin = _chemin_etat(dossier_index)
+    if not os.path.exists(chemin):
+        return {}
+    try:
+        with open(chemin, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _ecrire_etat(dossier_index: str, etat: dict):
+    chemin = _chemin_etat(dossier_index)
+    os.makedirs(dossier_index, exist_ok=True)
+    tmp = chemin + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(etat, f, ensure_ascii=False)
+    os.replace(tmp, chemin)
+
+
+def _lignes_a_indexer(df: pd.DataFrame) -> pd.DataFrame:
+    """Lignes d'un fichier du stockage telles que rangées dans l'index (lignes sans contrat écartées)."""
+    df = df.drop(columns=[stockage_npai.COLONNE_EMPREINTE], errors="ignore")
+    if COLONNE_CONTRAT not in df.columns:
+        return df.iloc[:0]
+    df = df.assign(**{COLONNE_CONTRAT: stockage_npai.cle_texte(df[COLONNE_CONTRAT])})
+    return df[df[COLONNE_CONTRAT].fillna("") != ""]
+
+
+def _ecrire_seau(rep: str, df: pd.DataFrame):
+    """Nouveau fichier du seau, trié par contrat puis date (à égalité, ordre d'ajout ; dates illisibles en dernier)."""
+    dates = stockage_npai.lire_dates(df[COLONNE_DATE]) if COLONNE_DATE in df.columns else pd.NaT
+    ordre = pd.DataFrame({"contrat": df[COLONNE_CONTRAT].to_numpy(), "date": dates}, index=df.index)
+    df = df.loc[ordre.sort_values(["contrat", "date"], kind="stable", na_position="last").index]
+    stockage_npai.ecrire_table(os.path.join(rep, stockage_npai.nom_fichier()), df, TAILLE_GROUPE_INDEX)
+
+
+def _fusionner_seau(rep: str):
+    """Fichiers du seau regroupés en un seul, trié (écriture puis suppression des anciens)."""
+    anciens = stockage_npai.lister_fichiers_partition(rep)
+    if len(anciens) > 1:
+        _ecrire_seau(rep, stockage_npai.lire_fichiers(anciens))
+        for f in anciens:
+            os.remove(f)
+
+
+def _verser(dossier_index: str, lot: pd.DataFrame, nb_seaux: int):
+    """Lignes d'un lot ajoutées aux seaux de leurs contrats (un fichier trié par seau touché)."""
+    if lot.empty:
+        return
+    for seau, morceau in lot.groupby(stockage_npai.seaux_de(lot[COLONNE_CONTRAT], nb_seaux), sort=True):
+        rep = _rep_seau(dossier_index, seau)
+        _ecrire_seau(rep, morceau)
+        if len(stockage_npai.lister_fichiers_partition(rep)) > MAX_FICHIERS_SEAU:
+            _fusionner_seau(rep)
+
+
+def _comptes_jour(df: pd.DataFrame) -> Counter:
+    """Lignes datées par (jour AAAA-MM-JJ, TYPE DE DOCUMENT)."""
+    if COLONNE_DATE not in df.columns:
+        return Counter()
+    jours = stockage_npai.lire_dates(df[COLONNE_DATE]).dt.strftime("%Y-%m-%d")
+    types = df[COLONNE_TYPE].astype("string").str.strip().fillna("") if COLONNE_TYPE in df.columns else ""
+    nombres = pd.DataFrame({"jour": jours, "type": types}).dropna().value_counts(sort=False)
+    return Counter({cle: int(n) for cle, n in nombres.items()})
+
+
+def _plages_indexees(fichier: str, compactions: dict, indexes: set, retrouves: set) -> list:
+    """
+    Lignes de `fichier` déjà dans l'index, en plages [début, fin) : celles qui viennent, par une ou
+    plusieurs compactions, de fichiers indexés. Ces fichiers indexés sont ajoutés à `retrouves`.
+    """
+    plages, debut = [], 0
+    for ancien, nb in compactions.get(fichier, []):
+        if ancien in indexes:
+            retrouves.add(ancien)
+            plages.append((debut, debut + nb))
+        else:
+            plages.extend((debut + a, debut + b) for a, b in _plages_indexees(ancien, compactions, indexes, retrouves))
+        debut += nb
+    return plages
+
+
+def _fichiers_a_indexer(store: str, fichiers: dict, indexees: dict) -> list | None:
+    """
+    (partition, fichier, plages déjà indexées) des fichiers du stockage pas encore entièrement indexés,
+    dans l'ordre d'écriture. None si des fichiers indexés ont disparu sans être retrouvés dans une
+    compaction : leurs lignes ne sont plus dans le stockage, l'index est à reconstruire.
+    """
+    a_indexer = []
+    for nom, noms in fichiers.items():
+        indexes = set(indexees.get(nom, {}).get("fichiers", []))
+        compactions = stockage_npai.compactions_partition(stockage_npai.chemin_partition(store, tuple(nom.split("/"))))
+        retrouves = indexes & set(noms)
+        for f in noms:
+            if f in indexes:
+                continue
+            plages = _plages_indexees(f, compactions, indexes, retrouves)
+            if not plages or sum(b - a for a, b in plages) < sum(nb for _, nb in compactions[f]):
+                a_indexer.append((nom, f, plages))
+        if retrouves != indexes:
+            return None
+    if any(p["fichiers"] for nom, p in indexees.items() if nom not in fichiers):
+        return None
+    return a_indexer
+
+
+@mesures_npai.mesurer("index_contrats")
+def mettre_a_jour_index(store: str | None = None, dossier_index: str | None = None) -> int:
+    """
+    Indexe les fichiers du stockage 'Complet' ajoutés depuis la dernière mise à jour (partitions
+    compactées : seulement les lignes pas encore indexées), ou reconstruit l'index si des lignes
+    indexées ont disparu. Renvoie le nombre de lignes indexées.
+    """
+    store = store or config_npai.store_complet()
+    dossier_index = dossier_index or config_npai.DOSSIER_INDEX_CONTRATS
+    with _VERROU:
+        etat = _lire_etat(dossier_index)
+        fichiers = {"/".join(cle): [os.path.basename(f) for f in stockage_npai.lister_fichiers_partition(
+            stockage_npai.chemin_partition(store, cle))] for cle in stockage_npai.lister_partitions(store)}
+        indexees = etat.get("partitions", {})
+        # à reconstruire : autre version ou nombre de seaux, mise à jour interrompue (des lignes ont pu
+        # être indexées sans être notées), lignes indexées disparues
+        reconstruction = (etat.get("version") != VERSION_INDEX or etat.get("nb_seaux") != NB_SEAUX_INDEX
+                          or etat.get("en_cours"))
+        a_indexer = None if reconstruction else _fichiers_a_indexer(store, fichiers, indexees)
+        if a_indexer is None:
+            reconstruction, indexees = True, {}
+            a_indexer = [(nom, f, []) for nom, noms in fichiers.items() for f in noms]
+        elif not a_indexer and all(set(noms) == set(indexees.get(nom, {}).get("fichiers", []))
+                                   for nom, noms in fichiers.items()):
+            return etat["nb_lignes"]
+
+        cible = dossier_index + ".reconstruction" if reconstruction else dossier_index
+        if reconstruction:
+            stockage_npai.vider_store(cible)
+        else:
+            _ecrire_etat(dossier_index, {**etat, "en_cours": True})
+        nb = 0 if reconstruction else etat["nb_lignes"]
+        # une fois la mise à jour faite, tous les fichiers présents sont indexés (compactés compris)
+        partitions = {nom: {"fichiers": noms, "comptes": Counter(
+                            {(j, t): n for j, t, n in indexees.get(nom, {}).get("comptes", [])})}
+                      for nom, noms in fichiers.items()}
+
+        def lignes():
+            for i, (nom, fichier, plages) in enumerate(a_indexer, start=1):
+                progression.signaler("Indexation des contrats", i, len(a_indexer))
+                rep = stockage_npai.chemin_partition(store, tuple(nom.split("/")))
+                df = pd.read_parquet(os.path.join(rep, fichier))
+                if plages:      # fichier compacté : ses lignes venues de fichiers indexés sont écartées
+                    garder = np.ones(len(df), dtype=bool)
+                    for debut, fin in plages:
+                        garder[debut:fin] = False
+                    df = df[garder]
+                mesures_npai.compter(lignes_entree=len(df))
+                partitions[nom]["comptes"].update(_comptes_jour(df))
+                yield _lignes_a_indexer(df)
+
+        def lots():
+            # petits fichiers regroupés : moins de morceaux versés par seau
+            lot = []
+            for df in lignes():
+                lot.append(df)
+                if sum(len(d) for d in lot) >= LIGNES_PAR_LOT_INDEX:
+                    yield stockage_npai.concatener(lot)
+                    lot = []
+            if lot:
+                yield stockage_npai.concatener(lot)
+
+        for lot in lots():
+            _verser(cible, lot, NB_SEAUX_INDEX)
+            nb += len(lot)
+        if reconstruction:      # index neuf : un seul fichier par seau
+            for seau in range(NB_SEAUX_INDEX):
+                _fusionner_seau(_rep_seau(cible, seau))
+        _ecrire_etat(cible, {"version": VERSION_INDEX, "nb_seaux": NB_SEAUX_INDEX, "nb_lignes": nb, "partitions": {
+            nom: {"fichiers": p["fichiers"], "comptes": [[j, t, n] for (j, t), n in sorted(p["comptes"].items())]}
+            for nom, p in partitions.items()}})
+        if reconstruction:
+            stockage_npai.vider_store(dossier_index)
+            os.replace(cible, dossier_index)
+        mesures_npai.compter(lignes_sortie=nb)
+        print(f"🔎 Index des contrats {'reconstruit' if reconstruction else 'mis à jour'} : "
+              f"{len(a_indexer)} fichier(s) indexé(s), {nb} lignes")
+        return nb
+
+
+# ============================================================
+#     RECHERCHES
+# ============================================================
+def lire_contrats(texte: str) -> list[str]:
+    """Contrats d'une liste collée (un par ligne, ou séparés par espaces, virgules, points-virgules), sans doublons."""
+    return list(dict.fromkeys(c for c in re.split(r"[\s,;]+", texte) if c))
+
+
+def lire_fichier_contrats(chemin: str) -> list[str]:
+    """Contrats d'un fichier texte / CSV, ou de la première colonne d'un classeur Excel (en-tête ignoré)."""
+    if chemin.lower().endswith((".xlsx", ".xlsm", ".xls")):
+        colonne = pd.read_excel(chemin, header=None, usecols=[0]).iloc[:, 0].dropna()
+        contrats = stockage_npai.cle_texte(colonne)
+        return [c for c in dict.fromkeys(contrats) if c and c != COLONNE_CONTRAT]
+    with open(chemin, encoding="utf-8-sig", errors="replace") as f:
+        return [c for c in lire_contrats(f.read()) if c != COLONNE_CONTRAT]
+
+
+def chercher_contrats(contrats, dossier_index: str | None = None) -> pd.DataFrame:
+    """
+    Toutes les lignes de l'historique des `contrats`, dans l'ordre de la liste puis par date de
+    traitement. Seuls les fichiers des seaux des contrats demandés sont lus, en parallèle, et dans
+    chacun seulement les groupes de lignes qui peuvent les contenir (statistiques min / max Parquet).
+    """
+    dossier_index = dossier_index or config_npai.DOSSIER_INDEX_CONTRATS
+    contrats = list(dict.fromkeys(stockage_npai.cle_texte(pd.Series(list(contrats), dtype="string")).dropna()))
+    demandes = pd.Series(contrats, dtype="string")
+    with _VERROU:
+        nb_seaux = _lire_etat(dossier_index).get("nb_seaux")
+        if nb_seaux is None:
+            raise FileNotFoundError(f"Index des contrats absent : {dossier_index} (mettre_a_jour_index)")
+        lectures = [(f, groupe.tolist())
+                    for seau, groupe in demandes.groupby(stockage_npai.seaux_de(demandes, nb_seaux), sort=True)
+                    for f in stockage_npai.lister_fichiers_partition(_rep_seau(dossier_index, seau))]
+        with ThreadPoolExecutor(max_workers=max(1, min(len(lectures), NB_THREADS_RECHERCHE))) as pool:
+            morceaux = list(pool.map(
+                lambda lecture: pd.read_parquet(lecture[0], filters=[(COLONNE_CONTRAT, "in", lecture[1])]), lectures))
+    if not morceaux:
+        return pd.DataFrame(columns=[COLONNE_CONTRAT])
+    lignes = stockage_npai.concatener(morceaux)
+    rang = pd.Categorical(lignes[COLONNE_CONTRAT], categories=contrats, ordered=True)
+    return lignes.iloc[pd.Series(rang.codes).sort_values(kind="stable").index].reset_index(drop=True)
+
+
+def _date(valeur) -> pd.Timestamp | None:
+    """Borne de période : None, Timestamp, ou texte ISO (AAAA-MM-JJ) ou jour/mois/année."""
+    if valeur is None or (isinstance(valeur, str) and not valeur.strip()):
+        return None
+    date = stockage_npai.lire_dates(pd.Series([valeur]))[0]
+    if pd.isna(date):
+        raise ValueError(f"Date illisible : {valeur}")
+    return date.normalize()
+
+
+def compter_par_type(debut=None, fin=None, dossier_index: str | None = None) -> pd.DataFrame:
+    """
+    Lignes par TYPE DE DOCUMENT dont la DATE TRAITEMENT PND est entre `debut` et `fin` (inclus ;
+    None = sans limite), avec une ligne TOTAL. Calculé sur les comptes par jour de l'index.
+    """
+    dossier_index = dossier_index or config_npai.DOSSIER_INDEX_CONTRATS
+    etat = _lire_etat(dossier_index)
+    if "partitions" not in etat:
+        raise FileNotFoundError(f"Index des contrats absent : {dossier_index} (mettre_a_jour_index)")
+    debut, fin = _date(debut), _date(fin)
+    comptes = pd.DataFrame([c for p in etat["partitions"].values() for c in p["comptes"]],
+                           columns=["jour", COLONNE_TYPE, "Nombre"])
+    jours = pd.to_datetime(comptes["jour"])
+    garder = pd.Series(True, index=comptes.index)
+    if debut is not None:
+        garder &= jours >= debut
+    if fin is not None:
+        garder &= jours <= fin
+    table = (comptes[garder].groupby(COLONNE_TYPE)["Nombre"].sum()
+             .sort_values(ascending=False).astype("int64").to_frame())
+    table.loc["TOTAL"] = int(table["Nombre"].sum())
+    return table
+
+
+def afficher_contrats(contrats) -> pd.DataFrame:
+    """Recherche et affichage (interface, ligne de commande) : lignes trouvées et contrats absents."""
+    t0 = time.perf_counter()
+    lignes = chercher_contrats(contrats)
+    duree = time.perf_counter() - t0
+    demandes = list(dict.fromkeys(stockage_npai.cle_texte(pd.Series(list(contrats), dtype="string")).dropna()))
+    trouves = set(lignes[COLONNE_CONTRAT]) if not lignes.empty else set()
+    print(f"🔎 {len(lignes)} ligne(s) pour {len(trouves)} contrat(s) sur {len(demandes)} ({duree * 1000:.0f} ms)")
+    if not lignes.empty:
+        with pd.option_context("display.width", 400, "display.max_columns", None):
+            print(stockage_npai.sans_colonnes_internes(lignes).head(MAX_LIGNES_AFFICHEES).to_string(index=False))
+        if len(lignes) > MAX_LIGNES_AFFICHEES:
+            print(f"… {len(lignes) - MAX_LIGNES_AFFICHEES} ligne(s) de plus non affichées")
+    absents = [c for c in demandes if c not in trouves]
+    if absents:
+        print(f"ℹ️ Contrats absents de l'historique ({len(absents)}) : {', '.join(absents[:50])}"
+              + (" …" if len(absents) > 50 else ""))
+    return lignes
+
+
+def afficher_comptes(debut=None, fin=None) -> pd.DataFrame:
+    """Comptage par type sur la période, affiché (interface, ligne de commande)."""
+    table = compter_par_type(debut, fin)
+    print(f"📅 Lignes par {COLONNE_TYPE} du {debut or 'début'} au {fin or 'dernier jour'}")
+    print(table.to_string())
+    return table
+
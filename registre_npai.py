@@ -0,0 +1,156 @@
+import os
+import sqlite3
+from datetime import datetime
+import pandas as pd
+import stockage_npai
+
+# ============================================================
+#     REGISTRE D'INTÉGRATION (SQLite, remplace Consigne_NPAI.xlsx)
+# ============================================================
+# Une ligne par contenu intégré, identifié par son empreinte (SHA-256) et non plus par son nom :
+# un fichier renvoyé sous le même nom mais modifié est intégré, un même contenu renommé ne l'est
+# qu'une fois. Les lignes du stockage portent l'empreinte de leur fichier d'origine
+# (stockage_npai.COLONNE_SOURCE), ce qui permet de retrouver les lignes venues d'un fichier.
+# Pas de mode WAL : le fichier peut être sur un partage réseau.
+
+STATUT_INTEGRE = "X"
+STATUT_ERREUR = "Erreur"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fichiers (
+    id               INTEGER PRIMARY KEY,
+    empreinte        TEXT UNIQUE,          -- NULL : entrée reprise de l'ancienne consigne ou fichier illisible
+    fichier          TEXT NOT NULL,
+    origine          TEXT,                 -- chemin du CSV ou de l'archive ZIP
+    taille           INTEGER,
+    date_modification INTEGER,             -- date de modification du CSV du dossier (os.stat, en ns)
+    nb_lignes        INTEGER,
+    duree_lecture    REAL,
+    statut           TEXT NOT NULL,
+    date_integration TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fichiers_nom ON fichiers(fichier);
+"""
+_COLONNES_AJOUTEES = {"date_modification": "INTEGER"}   # registres créés avant l'ajout de ces colonnes
+
+
+def ouvrir(chemin_db: str, consigne_xlsx: str | None = None) -> sqlite3.Connection:
+    """
+    Ouvre (ou crée) le registre. À la création, l'ancienne consigne Excel est reprise si elle existe
+    (noms, et empreintes quand la consigne en contient).
+    """
+    os.makedirs(os.path.dirname(chemin_db) or ".", exist_ok=True)
+    nouveau = not os.path.exists(chemin_db)
+    conn = sqlite3.connect(chemin_db)
+    conn.executescript(_SCHEMA)
+    existantes = {nom for _, nom, *_ in conn.execute("PRAGMA table_info(fichiers)")}
+    with conn:
+        for nom, type_sql in _COLONNES_AJOUTEES.items():
+            if nom not in existantes:
+                conn.execute(f"ALTER TABLE fichiers ADD COLUMN {nom} {type_sql}")
+    if nouveau and consigne_xlsx and os.path.exists(consigne_xlsx):
+        importer_consigne(conn, consigne_xlsx)
+    return conn
+
+
+def importer_consigne(conn: sqlite3.Connection, consigne_xlsx: str):
+    df_log = pd.read_excel(consigne_xlsx).dropna(subset=["Fichier"])
+    if "Empreinte" not in df_log.columns:
+        df_log["Empreinte"] = None
+    lignes = [(None if pd.isna(r["Empreinte"]) else str(r["Empreinte"]), str(r["Fichier"]),
+               str(r.get("Statut", STATUT_INTEGRE)), str(r["Date"]))
+              for _, r in df_log.iterrows()]
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO fichiers (empreinte, fichier, statut, date_integration) "
+                         "VALUES (?, ?, ?, ?)", lignes)
+    print(f"📝 Consigne reprise dans le registre : {len(lignes)} fichiers")
+
+
+def vider(conn: sqlite3.Connection, garder=()):
+    """
+    Reconstruction totale : les fichiers relus seront réenregistrés. garder : empreintes des fichiers
+    intégrés qui n'ont pas pu être relus (leurs lignes sont reprises de l'ancien stockage).
+    """
+    garder = set(garder)
+    with conn:
+        if not garder:
+            conn.execute("DELETE FROM fichiers")
+            return
+        supprimer = [(e,) for (e,) in conn.execute("SELECT DISTINCT empreinte FROM fichiers") if e not in garder]
+        conn.executemany("DELETE FROM fichiers WHERE empreinte IS ?", supprimer)
+
+
+# ============================================================
+#     CONSULTATION
+# ============================================================
+def empreintes_integrees(conn: sqlite3.Connection) -> set:
+    """Empreintes des contenus déjà intégrés (ensemble : test d'appartenance en O(1))."""
+    return {e for (e,) in conn.execute(
+        "SELECT empreinte FROM fichiers WHERE empreinte IS NOT NULL AND statut = ?", (STATUT_INTEGRE,))}
+
+
+def deja_integre(conn: sqlite3.Connection, empreinte: str) -> bool:
+    return conn.execute("SELECT 1 FROM fichiers WHERE empreinte = ? AND statut = ?",
+                        (empreinte, STATUT_INTEGRE)).fetchone() is not None
+
+
+def fichiers_connus(conn: sqlite3.Connection) -> set:
+    """
+    Pour éviter de relire les CSV déjà intégrés du dossier : (nom, taille, date de modification)
+    intégrés. Un fichier réécrit sous le même nom change de date de modification, même à taille
+    égale : il est relu (son empreinte décide alors s'il est nouveau). Les entrées sans date
+    (ancienne consigne, registre antérieur) ne court-circuitent rien.
+    """
+    return set(conn.execute("SELECT fichier, taille, date_modification FROM fichiers "
+                            "WHERE statut = ? AND taille IS NOT NULL AND date_modification IS NOT NULL",
+                            (STATUT_INTEGRE,)))
+
+
+def historique(conn: sqlite3.Connection) -> pd.DataFrame:
+    return pd.read_sql_query("SELECT * FROM fichiers ORDER BY id", conn)
+
+
+def lignes_du_fichier(conn: sqlite3.Connection, dossier_store: str, fichier_ou_empreinte: str) -> pd.DataFrame:
+    """Lignes du stockage venues d'un fichier donné (par nom ou par empreinte)."""
+    empreintes = [e for (e,) in conn.execute(
+        "SELECT empreinte FROM fichiers WHERE (fichier = ? OR empreinte = ?) AND empreinte IS NOT NULL",
+        (fichier_ou_empreinte, fichier_ou_empreinte))]
+    if not empreintes:
+        return pd.DataFrame()
+    return stockage_npai.lire_store(dossier_store, filtre_source=empreintes)
+
+
+# ============================================================
+#     ENREGISTREMENT
+# ============================================================
+def enregistrer(conn: sqlite3.Connection, entrees):
+    """
+    Enregistre un lot de fichiers en une transaction.
+    entrees : dicts {fichier, empreinte, origine, taille, date_modification, nb_lignes, duree_lecture, statut}.
+    """
+    maintenant = datetime.now().isoformat(timespec="seconds")
+    lignes = [(e.get("empreinte"), e["fichier"], e.get("origine"), e.get("taille"), e.get("date_modification"),
+               e.get("nb_lignes"), e.get("duree_lecture"), e.get("statut", STATUT_INTEGRE), maintenant)
+              for e in entrees]
+    with conn:
+        conn.executemany("""
+            INSERT INTO fichiers (empreinte, fichier, origine, taille, date_modification, nb_lignes, duree_lecture,
+                                  statut, date_integration)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(empreinte) DO UPDATE SET
+                fichier = excluded.fichier, origine = excluded.origine, taille = excluded.taille,
+                date_modification = excluded.date_modification,
+                nb_lignes = excluded.nb_lignes, duree_lecture = excluded.duree_lecture,
+                statut = excluded.statut, date_integration = excluded.date_integration
+        """, lignes)
+
+
+def noter_dates_modification(conn: sqlite3.Connection, vus):
+    """
+    CSV du dossier relus mais dont le contenu était déjà intégré (fichier touché sans être modifié,
+    entrée sans date) : leur date de modification est notée pour ne plus les relire.
+    vus : tuples (empreinte, fichier, date_modification).
+    """
+    with conn:
+        conn.executemany("UPDATE fichiers SET date_modification = ? WHERE empreinte = ? AND fichier = ?",
+                         [(date, empreinte, fichier) for empreinte, fichier, date in vus])
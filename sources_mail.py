@@ -0,0 +1,146 @@
+import os
+import abc
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta
+from email import policy
+from email.parser import BytesParser
+from email.utils import parsedate_to_datetime
+
+# ============================================================
+#     SOURCES DE MAILS (Outlook ou dossier de .eml)
+# ============================================================
+# Une source renvoie les messages reçus après un filigrane, avec leurs pièces jointes.
+# SourceOutlook interroge la boîte partagée via COM (Windows) ; SourceDossierEml lit un dossier
+# de fichiers .eml et permet de tester / chronométrer la récupération sans Outlook.
+
+Message = namedtuple("Message", ["identifiant", "recu_le", "pieces_jointes"])
+
+
+class PieceJointeOctets:
+    def __init__(self, nom, octets):
+        self.nom = nom
+        self.octets = octets
+
+    def sauver(self, chemin):
+        with open(chemin, "wb") as f:
+            f.write(self.octets)
+
+
+class PieceJointeOutlook:
+    def __init__(self, att):
+        self.nom = att.FileName
+        self._att = att
+
+    def sauver(self, chemin):
+        self._att.SaveAsFile(chemin)
+
+
+def _sans_fuseau(d: datetime) -> datetime:
+    """Datetime naïf à l'heure locale (les dates COM et les en-têtes mail n'ont pas le même fuseau)."""
+    if d.tzinfo is not None:
+        d = d.astimezone().replace(tzinfo=None)
+    return datetime(d.year, d.month, d.day, d.hour, d.minute, d.second)
+
+
+class SourceMail(abc.ABC):
+    """Interface commune : messages(depuis) -> itérable de Message triés par date de réception."""
+    sauvegarde_concurrente = True   # False si les pièces jointes doivent être sauvées depuis le thread appelant
+
+    @abc.abstractmethod
+    def messages(self, depuis: datetime | None):
+        """Messages reçus après `depuis` (None = tous), du plus ancien au plus récent."""
+
+
+class SourceOutlook(SourceMail):
+    """
+    Boîte partagée Outlook. Le filtre (date de réception + présence de pièces jointes) est évalué
+    par Outlook (Items.Restrict) : seuls les nouveaux messages traversent COM.
+    Les objets COM sont liés au thread qui les a créés : les pièces jointes sont donc sauvées
+    séquentiellement, dans le thread appelant.
+    """
+    sauvegarde_concurrente = False
+
+    def __init__(self, adresse="SFR-RA-NPAI@sfr.com"):
+        self.adresse = adresse
+
+    def messages(self, depuis=None):
+        import win32com.client
+        print("📩 Connexion à Outlook…")
+        outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
+
+        destinataire = outlook.CreateRecipient(self.adresse)
+        destinataire.Resolve()
+        if not destinataire.Resolved:
+            raise Exception("❌ Impossible de trouver la boîte mail partagée SFR-RA-NPAI.")
+
+        inbox = outlook.GetSharedDefaultFolder(destinataire, 6)  # 6 = Boîte de réception
+        filtre = '"urn:schemas:httpmail:hasattachment" = 1'
+        if depuis is not None:
+            # DASL compare en UTC : marge d'un jour, le filtre exact est refait ci-dessous
+            borne = (depuis - timedelta(days=1)).strftime("%Y-%m-%d %H:%M")
+            filtre += f' AND "urn:schemas:httpmail:datereceived" >= \'{borne}\''
+        items = inbox.Items.Restrict("@SQL=" + filtre)
+        items.Sort("[ReceivedTime]")
+
+        for message in items:
+            try:
+                recu_le = _sans_fuseau(message.ReceivedTime)
+                if depuis is not None and recu_le < depuis:
+                    continue
+                pieces = [PieceJointeOutlook(att) for att in message.Attachments]
+                yield Message(message.EntryID, recu_le, pieces)
+            except Exception as e:
+                print(f"⚠️ Erreur lecture mail : {e}")
+
+
+class SourceDossierEml(SourceMail):
+    """Dossier de fichiers .eml (export de la boîte, jeux de test, bancs d'essai)."""
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+
+    def messages(self, depuis=None):
+        lus = []
+        for nom in sorted(os.listdir(self.dossier)):
+            if not nom.lower().endswith(".eml"):
+                continue
+            chemin = os.path.join(self.dossier, nom)
+            try:
+                with open(chemin, "rb") as f:
+                    entetes = BytesParser(policy=policy.default).parse(f, headersonly=True)
+                date = entetes["Date"]
+                recu_le = _sans_fuseau(parsedate_to_datetime(str(date))) if date \
+                    else datetime.fromtimestamp(os.path.getmtime(chemin)).replace(microsecond=0)
+                if depuis is not None and recu_le < depuis:
+                    continue    # message ancien : le corps n'est pas analysé
+                with open(chemin, "rb") as f:
+                    mail = BytesParser(policy=policy.default).parse(f)
+                pieces = [PieceJointeOctets(part.get_filename(), part.get_content())
+                          for part in mail.iter_attachments() if part.get_filename()]
+                if pieces:
+                    lus.append(Message(str(mail["Message-ID"] or nom), recu_le, pieces))
+            except Exception as e:
+                print(f"⚠️ Erreur lecture mail {nom} : {e}")
+        return sorted(lus, key=lambda m: m.recu_le)
+
+
+# ============================================================
+#     FILIGRANE (dernier message traité)
+# ============================================================
+def charger_filigrane(chemin_json: str) -> tuple[datetime | None, set]:
+    """(date de réception du dernier message traité, identifiants reçus à cette date-là)."""
+    if not os.path.exists(chemin_json):
+        return None, set()
+    try:
+        with open(chemin_json, encoding="utf-8") as f:
+            data = json.load(f)
+        return datetime.fromisoformat(data["recu_le"]), set(data.get("identifiants", []))
+    except (OSError, ValueError, KeyError):
+        return None, set()
+
+
+def sauver_filigrane(chemin_json: str, recu_le: datetime, identifiants):
+    os.makedirs(os.path.dirname(chemin_json) or ".", exist_ok=True)
+    with open(chemin_json, "w", encoding="utf-8") as f:
+        json.dump({"recu_le": recu_le.isoformat(), "identifiants": sorted(identifiants)}, f, indent=2)
@@ -0,0 +1,518 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# ============================================================
+#     STOCKAGE COLONNAIRE (Parquet partitionné par année/mois)
+# ============================================================
+# Arborescence :  <dossier>/annee=2025/mois=03/part-<id>.parquet
+# Les lignes dont la date est illisible vont dans annee=inconnue/mois=inconnu.
+# Chaque ajout écrit un nouveau fichier dans les partitions touchées (les anciens ne sont pas relus) ;
+# une partition de plus de MAX_FICHIERS_PARTITION fichiers est compactée en un seul. Chaque compaction
+# est notée dans la partition (_compactions.json : fichiers remplacés et leur nombre de lignes) ; les
+# vues dérivées du stockage (index des contrats) y retrouvent les lignes qu'elles ont déjà.
+
+COLONNE_PARTITION = "DATE TRAITEMENT PND"
+PARTITION_INCONNUE = ("inconnue", "inconnu")
+COLONNE_SOURCE = "_source"   # empreinte du fichier d'origine (colonnes "_..." : internes, hors doublons et exports)
+COLONNE_EMPREINTE = "_empreinte"   # empreinte 64 bits des colonnes métier : index des doublons de lignes
+MAX_FICHIERS_PARTITION = 24
+FICHIER_COMPACTIONS = "_compactions.json"   # "_" : ignoré des lectures Parquet du dossier
+
+
+def colonnes_internes(colonnes) -> list[str]:
+    return [c for c in colonnes if str(c).startswith("_")]
+
+
+def sans_colonnes_internes(df: pd.DataFrame) -> pd.DataFrame:
+    internes = colonnes_internes(df.columns)
+    return df.drop(columns=internes) if internes else df
+
+
+def lire_dates(serie: pd.Series) -> pd.Series:
+    """
+    Dates calculées valeur par valeur, donc indépendantes du lot (partitionnement, écart à
+    DATE_COMPARAISON) : ISO (AAAA-MM-JJ) d'abord, puis format jour/mois pour le reste.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    codes, uniques = pd.factorize(serie.astype("string"))
+    if len(uniques) == 0:
+        return pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns]")
+    uniques = pd.Series(uniques, dtype="string")
+    dates = pd.to_datetime(uniques, format="ISO8601", errors="coerce")
+    reste = dates.isna() & uniques.notna()
+    if reste.any():
+        dates[reste] = pd.to_datetime(uniques[reste], format="mixed", dayfirst=True, errors="coerce")
+    valeurs = dates.to_numpy()[codes]
+    valeurs[codes == -1] = None
+    return pd.Series(pd.to_datetime(valeurs), index=serie.index)
+
+
+def texte_canonique(serie: pd.Series) -> pd.Series:
+    """Valeurs en texte, les nombres entiers lus en flottant (colonne avec des vides) écrits sans ".0"."""
+    if pd.api.types.is_float_dtype(serie):
+        entiers = (serie % 1 == 0) & (serie.abs() < 2 ** 53)
+        texte = serie.astype("string")
+        if entiers.any():
+            texte[entiers] = serie[entiers].astype("int64").astype("string")
+        return texte
+    return serie.astype("string")
+
+
+def cle_texte(serie: pd.Series) -> pd.Series:
+    """Clé de comparaison (SCS-CONTRAT) : texte canonique sans espaces autour (123, 123.0, " 123" -> "123")."""
+    return texte_canonique(serie).str.strip()
+
+
+def empreintes_lignes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Empreinte 64 bits de chaque ligne sur ses colonnes métier : indépendante de l'ordre des colonnes
+    et du type lu (123, 123.0 et "123" sont égaux) ; une valeur vide compte comme une colonne absente,
+    comme pour un drop_duplicates sur la concaténation de fichiers aux colonnes différentes.
+    """
+    total = np.zeros(len(df), dtype=np.uint64)
+    for col in _colonnes_metier(df):
+        # chaque valeur distincte n'est convertie et hachée qu'une fois
+        codes, uniques = pd.factorize(df[col])
+        h = pd.util.hash_array(texte_canonique(pd.Series(uniques)).to_numpy(dtype=object, na_value=""),
+                               categorize=False)
+        # le nom de colonne entre dans l'empreinte : la même valeur dans deux colonnes ne se compense pas
+        h = pd.util.hash_array(h ^ pd.util.hash_array(np.array([str(col)], dtype=object))[0])
+        total += np.append(h, np.uint64(0))[codes]    # code -1 (vide) -> 0
+    return total
+
+
+def cle_partition(annee, mois) -> tuple[str, str]:
+    if pd.isna(annee):
+        return PARTITION_INCONNUE
+    return f"{int(annee):04d}", f"{int(mois):02d}"
+
+
+def chemin_partition(dossier: str, cle: tuple[str, str]) -> str:
+    return os.path.join(dossier, f"annee={cle[0]}", f"mois={cle[1]}")
+
+
+def _preparer_pour_parquet(df: pd.DataFrame) -> pd.DataFrame:
+    """Colonnes objet (texte, éventuellement mélangé à des nombres) -> type 'string' stable pour Parquet."""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype("string")
+    df.columns = [str(c) for c in df.columns]
+    return df
+
+
+def concatener(morceaux) -> pd.DataFrame:
+    """
+    pd.concat qui garde les colonnes catégorielles : les catégories des morceaux sont réunies
+    (pd.concat repasserait en texte toute colonne dont les catégories diffèrent d'un morceau à l'autre).
+    """
+    morceaux = list(morceaux)
+    if len(morceaux) == 1:
+        return morceaux[0].reset_index(drop=True)
+    colonnes = {c for m in morceaux for c in m.columns if isinstance(m[c].dtype, pd.CategoricalDtype)}
+    for col in colonnes:
+        series = [m[col] for m in morceaux if col in m.columns]
+        if not all(isinstance(x.dtype, pd.CategoricalDtype) for x in series):
+            continue
+        categories = pd.Index(pd.unique(np.concatenate([x.cat.categories.to_numpy(dtype=object) for x in series])))
+        morceaux = [m.assign(**{col: m[col].cat.set_categories(categories)}) if col in m.columns else m
+                    for m in morceaux]
+    return pd.concat(morceaux, ignore_index=True)
+
+
+# ============================================================
+#                     LECTURE
+# ============================================================
+def lister_partitions(dossier: str) -> list[tuple[str, str]]:
+    """Clés (annee, mois) présentes dans le stockage, triées."""
+    if not os.path.isdir(dossier):
+        return []
+    cles = []
+    for rep_annee in sorted(os.listdir(dossier)):
+        if not rep_annee.startswith("annee="):
+            continue
+        for rep_mois in sorted(os.listdir(os.path.join(dossier, rep_annee))):
+            if rep_mois.startswith("mois="):
+                cles.append((rep_annee.split("=", 1)[1], rep_mois.split("=", 1)[1]))
+    return cles
+
+
+def nom_fichier() -> str:
+    """Noms triés dans l'ordre d'écriture : les lignes se relisent dans l'ordre où elles ont été ajoutées."""
+    return f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+
+
+def lister_fichiers_partition(rep: str) -> list[str]:
+    if not os.path.isdir(rep):
+        return []
+    return [os.path.join(rep, f) for f in sorted(os.listdir(rep)) if f.endswith(".parquet")]
+
+
+def lister_fichiers(dossier: str, cles=None) -> list[str]:
+    """Fichiers Parquet du stockage (toutes partitions, ou seulement `cles`), dans un ordre stable."""
+    fichiers = []
+    for cle in (lister_partitions(dossier) if cles is None else cles):
+        fichiers.extend(lister_fichiers_partition(chemin_partition(dossier, cle)))
+    return fichiers
+
+
+def colonnes_store(dossier: str) -> list[str]:
+    """Union des colonnes présentes dans le stockage (ordre de première apparition)."""
+    colonnes = []
+    for f in lister_fichiers(dossier):
+        for c in pq.read_schema(f).names:
+            if c not in colonnes:
+                colonnes.append(c)
+    return colonnes
+
+
+def lire_fichiers(fichiers, colonnes=None, filtre_source=None) -> pd.DataFrame:
+    """
+    Lit et concatène des fichiers Parquet ; seules les `colonnes` demandées sont décodées.
+    filtre_source : liste d'empreintes, pour ne garder que les lignes venues de ces fichiers.
+    """
+    morceaux = []
+    for f in fichiers:
+        dispo = pq.read_schema(f).names
+        options = {}
+        if colonnes is not None:
+            options["columns"] = [c for c in colonnes if c in dispo]
+        if filtre_source is not None:
+            if COLONNE_SOURCE not in dispo:
+                continue
+            options["filters"] = [(COLONNE_SOURCE, "in", list(filtre_source))]
+        morceaux.append(pd.read_parquet(f, **options))
+    if not morceaux:
+        return pd.DataFrame(columns=colonnes or [])
+    return concatener(morceaux)
+
+
+def lire_store(dossier: str, colonnes=None, cles=None, filtre_source=None) -> pd.DataFrame:
+    """Lit tout le stockage (ou certaines partitions), éventuellement restreint à quelques colonnes."""
+    return lire_fichiers(lister_fichiers(dossier, cles), colonnes, filtre_source)
+
+
+def iterer_store(dossier: str, colonnes=None, taille_lot: int = 50_000):
+    """Parcourt le stockage par lots d'au plus `taille_lot` lignes (mémoire bornée, quel que soit le volume)."""
+    for f in lister_fichiers(dossier):
+        yield from iterer_table(f, colonnes, taille_lot)
+
+
+def iterer_partitions(dossier: str, colonnes=None):
+    """Parcourt le stockage partition par partition (un mois à la fois)."""
+    for cle in lister_partitions(dossier):
+        yield cle, lire_store(dossier, colonnes, cles=[cle])
+
+
+def lire_empreintes(rep: str) -> np.ndarray:
+    """Index des doublons d'une partition : seule la colonne d'empreintes est lue."""
+    morceaux = []
+    for f in lister_fichiers_partition(rep):
+        if COLONNE_EMPREINTE in pq.read_schema(f).names:
+            morceaux.append(pd.read_parquet(f, columns=[COLONNE_EMPREINTE])[COLONNE_EMPREINTE].to_numpy(np.uint64))
+        else:   # fichier écrit avant l'index : empreintes recalculées
+            morceaux.append(empreintes_lignes(pd.read_parquet(f)))
+    return np.concatenate(morceaux) if morceaux else np.empty(0, dtype=np.uint64)
+
+
+def iterer_table(chemin: str, colonnes=None, taille_lot: int = 50_000):
+    if not os.path.exists(chemin):
+        return
+    fichier = pq.ParquetFile(chemin)
+    if colonnes is not None:
+        colonnes = [c for c in colonnes if c in fichier.schema_arrow.names]
+    for lot in fichier.iter_batches(batch_size=taille_lot, columns=colonnes):
+        yield lot.to_pandas()
+
+
+# ============================================================
+#                     ÉCRITURE
+# ============================================================
+def _ecrire_fichier(rep: str, df: pd.DataFrame) -> str:
+    """Nouveau fichier de la partition, écrit sous un nom temporaire puis renommé (jamais lu à moitié)."""
+    os.makedirs(rep, exist_ok=True)
+    nouveau = os.path.join(rep, nom_fichier())
+    _preparer_pour_parquet(df).to_parquet(nouveau + ".tmp", index=False)
+    os.replace(nouveau + ".tmp", nouveau)
+    return nouveau
+
+
+def compactions_partition(rep: str) -> dict:
+    """Fichier écrit par chaque compaction -> [[fichier remplacé, nb lignes], …], dans l'ordre de ses lignes."""
+    chemin = os.path.join(rep, FICHIER_COMPACTIONS)
+    if not os.path.exists(chemin):
+        return {}
+    with open(chemin, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _noter_compaction(rep: str, nouveau: str, remplaces: list):
+    compactions = compactions_partition(rep)
+    compactions[nouveau] = remplaces
+    chemin = os.path.join(rep, FICHIER_COMPACTIONS)
+    with open(chemin + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(compactions, f)
+    os.replace(chemin + ".tmp", chemin)
+
+
+def compacter_partition(rep: str) -> list[str]:
+    """
+    Regroupe les fichiers d'une partition en un seul, empreintes comprises (ajoutées si absentes).
+    Le nouveau fichier est écrit et noté dans _compactions.json avant la suppression des anciens.
+    Renvoie les noms des fichiers remplacés (aucun si la partition était déjà compacte).
+    """
+    anciens = lister_fichiers_partition(rep)
+    morceaux, sans_index = [], False
+    for f in anciens:
+        df = pd.read_parquet(f)
+        if COLONNE_EMPREINTE not in df.columns:
+            df[COLONNE_EMPREINTE] = empreintes_lignes(df)
+            sans_index = True
+        morceaux.append(df)
+    if len(morceaux) <= 1 and not sans_index:
+        return []
+    nouveau = _ecrire_fichier(rep, pd.concat(morceaux, ignore_index=True))
+    remplaces = [[os.path.basename(f), len(df)] for f, df in zip(anciens, morceaux)]
+    _noter_compaction(rep, os.path.basename(nouveau), remplaces)
+    for f in anciens:
+        os.remove(f)
+    return [nom for nom, _ in remplaces]
+
+
+def _colonnes_metier(df: pd.DataFrame) -> list:
+    internes = set(colonnes_internes(df.columns))
+    return [c for c in df.columns if c not in internes]
+
+
+def ajouter_lignes(dossier: str, lignes, dedoublonner=True) -> int:
+    """
+    Ajoute des lignes (un DataFrame ou une liste de DataFrames, pris dans l'ordre) au stockage,
+    partition par partition : seules les lignes de la partition en cours sont rassemblées, jamais
+    une copie concaténée de tout le lot.
+    Avec dedoublonner=True, les lignes déjà présentes (toutes colonnes métier identiques) sont ignorées.
+    Une ligne et son doublon ont la même date, donc la même partition : seules les empreintes de la
+    partition concernée sont relues (8 octets par ligne), jamais les lignes elles-mêmes, et les nouvelles
+    lignes sont écrites dans un fichier à part. Renvoie le nombre de lignes réellement ajoutées.
+    """
+    morceaux = [lignes] if isinstance(lignes, pd.DataFrame) else list(lignes)
+    par_partition = {}    # partition -> [(morceau, positions)]
+    for i, df in enumerate(morceaux):
+        if df.empty:
+            continue
+        dates = lire_dates(df[COLONNE_PARTITION]) if COLONNE_PARTITION in df.columns \
+            else pd.Series(pd.NaT, index=df.index)
+        for (an, mo), positions in df.groupby([dates.dt.year, dates.dt.month], dropna=False).indices.items():
+            par_partition.setdefault(cle_partition(an, mo), []).append((i, positions))
+
+    ajoutees = 0
+    for cle in sorted(par_partition):
+        rep = chemin_partition(dossier, cle)
+        nouvelles = concatener(morceaux[i].iloc[positions] for i, positions in par_partition[cle])
+        empreintes = empreintes_lignes(nouvelles)
+        if dedoublonner:
+            # une ligne reçue deux fois garde sa première origine
+            garder = ~pd.Series(empreintes).duplicated().to_numpy()
+            existantes = lire_empreintes(rep)
+            if len(existantes):
+                garder &= ~pd.Series(empreintes).isin(existantes).to_numpy()
+            nouvelles, empreintes = nouvelles[garder], empreintes[garder]
+        if nouvelles.empty:
+            continue
+        _ecrire_fichier(rep, nouvelles.assign(**{COLONNE_EMPREINTE: empreintes}))
+        if len(lister_fichiers_partition(rep)) > MAX_FICHIERS_PARTITION:
+            compacter_partition(rep)
+        ajoutees += len(nouvelles)
+    return ajoutees
+
+
+def vider_store(dossier: str):
+    """Supprime tout le contenu du stockage (reconstruction totale)."""
+    if os.path.isdir(dossier):
+        shutil.rmtree(dossier)
+
+
+def ecrire_table(chemin: str, df: pd.DataFrame, taille_groupe: int | None = None):
+    """
+    Table non partitionnée (ex. 'Sans doublons'), remplacée de façon atomique.
+    taille_groupe : lignes par groupe Parquet (petits groupes = lecture filtrée plus ciblée).
+    """
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    tmp = chemin + ".tmp"
+    _preparer_pour_parquet(df).to_parquet(tmp, index=False, row_group_size=taille_groupe)
+    os.replace(tmp, chemin)
+
+
+def colonnes_table(chemin: str) -> list[str]:
+    return pq.read_schema(chemin).names if os.path.exists(chemin) else []
+
+
+def lire_table(chemin: str, colonnes=None) -> pd.DataFrame | None:
+    if not os.path.exists(chemin):
+        return None
+    return pd.read_parquet(chemin, columns=colonnes)
+
+
+# ============================================================
+#     TABLES RÉPARTIES EN SEAUX (hachage d'une clé)
+# ============================================================
+# <dossier>/_table.json  +  <dossier>/seau_007/part-<id>.parquet
+# Toutes les lignes d'une même clé sont dans le même seau ; chaque ligne porte sa clé (cle_texte)
+# en COLONNE_CLE, les autres colonnes gardent leur type (un contrat lu en nombre reste un nombre).
+# Une réduction par clé (ex. une ligne par SCS-CONTRAT) ne relit, dans chaque seau touché, que les
+# lignes des clés reçues, et n'écrit que les lignes qui changent, dans un nouveau fichier du seau :
+# pour une clé, la ligne du fichier le plus récent fait foi. Au-delà de MAX_FICHIERS_SEAU fichiers,
+# les fichiers récents d'un seau sont fusionnés (avec le plus ancien quand ils l'égalent en lignes) :
+# une mise à jour coûte la taille du lot reçu, pas celle de la table.
+
+NB_SEAUX = 16
+MAX_FICHIERS_SEAU = 8
+COLONNE_CLE = "_cle"
+FICHIER_TABLE = "_table.json"   # nombre de seaux, version du contenu
+
+
+def seaux_de(cles: pd.Series, nb_seaux: int) -> np.ndarray:
+    """Numéro de seau de chaque clé (stable d'une exécution à l'autre)."""
+    h = pd.util.hash_array(cle_texte(cles).to_numpy(dtype=object, na_value=""))
+    return (h % np.uint64(nb_seaux)).astype(np.int64)
+
+
+def _lire_description(dossier: str) -> dict:
+    chemin = os.path.join(dossier, FICHIER_TABLE)
+    if not os.path.exists(chemin):
+        return {}
+    with open(chemin, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def version_seaux(dossier: str) -> int | None:
+    """Version du contenu d'une table en seaux (celle passée à reduire_par_seaux), None si absente."""
+    return _lire_description(dossier).get("version")
+
+
+def _rep_seau(dossier: str, seau: int) -> str:
+    return os.path.join(dossier, f"seau_{seau:03d}")
+
+
+def lister_seaux(dossier: str) -> list[list[str]]:
+    """Fichiers de chaque seau de la table, du plus ancien au plus récent."""
+    nb_seaux = _lire_description(dossier).get("nb_seaux", 0)
+    return [lister_fichiers_partition(_rep_seau(dossier, seau)) for seau in range(nb_seaux)]
+
+
+def _lire_seau(fichiers, colonnes=None, filtre_cles=None) -> pd.DataFrame:
+    """Lignes en vigueur d'un seau (la plus récente par clé), éventuellement pour quelques clés seulement."""
+    morceaux = []
+    for f in fichiers:
+        options = {"filters": [(COLONNE_CLE, "in", filtre_cles)]} if filtre_cles is not None else {}
+        if colonnes is not None:
+            dispo = pq.read_schema(f).names
+            options["columns"] = [c for c in dict.fromkeys([*colonnes, COLONNE_CLE]) if c in dispo]
+        morceaux.append(pd.read_parquet(f, **options))
+    if not morceaux:
+        return pd.DataFrame(columns=[COLONNE_CLE])
+    df = concatener(morceaux)
+    df = df[~df[COLONNE_CLE].duplicated(keep="last")].reset_index(drop=True)
+    return df if colonnes is None or COLONNE_CLE in colonnes else df.drop(columns=[COLONNE_CLE])
+
+
+def colonnes_seaux(dossier: str) -> list[str]:
+    colonnes = []
+    for fichiers in lister_seaux(dossier):
+        for f in fichiers:
+            for c in pq.read_schema(f).names:
+                if c not in colonnes:
+                    colonnes.append(c)
+    return colonnes
+
+
+def iterer_seaux(dossier: str, colonnes=None, taille_lot: int = 50_000):
+    """Parcourt la table seau par seau (lignes en vigueur), par lots d'au plus `taille_lot` lignes."""
+    for fichiers in lister_seaux(dossier):
+        df = _lire_seau(fichiers, colonnes)
+        for debut in range(0, len(df), taille_lot):
+            yield df.iloc[debut:debut + taille_lot]
+
+
+def lire_seaux(dossier: str, colonnes=None) -> pd.DataFrame:
+    morceaux = list(iterer_seaux(dossier, colonnes, taille_lot=2 ** 62))
+    return concatener(morceaux) if morceaux else pd.DataFrame(columns=colonnes or [])
+
+
+def nb_lignes_seaux(dossier: str) -> int:
+    """Nombre de lignes en vigueur (une par clé), en ne lisant que la colonne des clés."""
+    return sum(len(_lire_seau(fichiers, [COLONNE_CLE])) for fichiers in lister_seaux(dossier))
+
+
+def _fusionner_seau(rep: str):
+    """
+    Fichiers récents du seau fusionnés en un seul ; le plus ancien (le plus gros) n'est réécrit que
+    lorsque les récents l'égalent en lignes. Écriture du nouveau fichier, puis suppression des anciens.
+    """
+    fichiers = lister_fichiers_partition(rep)
+    nb = [pq.ParquetFile(f).metadata.num_rows for f in fichiers]
+    a_fusionner = fichiers if sum(nb[1:]) >= nb[0] else fichiers[1:]
+    df = _lire_seau(a_fusionner)
+    ecrire_table(os.path.join(rep, nom_fichier()), df)   # nom plus récent que tous ceux du seau
+    for f in a_fusionner:
+        os.remove(f)
+
+
+def reduire_par_seaux(dossier: str, lots, cle: str, reduire, nb_seaux: int | None = None,
+                      version: int = 1) -> int:
+    """
+    Met à jour une table répartie en seaux selon `cle`. Les lignes des `lots` sont d'abord versées
+    par seau dans un dossier de transit ; puis, pour chaque seau touché, les lignes en vigueur des clés
+    reçues sont relues, placées en tête, et reduire(df) désigne les nouvelles lignes en vigueur (à
+    égalité, reduire doit garder la première). Seules les lignes qui changent sont écrites.
+    Un seul lot, puis un seul seau, en mémoire à la fois. Renvoie le nombre de lignes écrites.
+    """
+    description = _lire_description(dossier)
+    nb_seaux = description.get("nb_seaux") or nb_seaux or NB_SEAUX
+    os.makedirs(dossier, exist_ok=True)
+    transit = dossier + ".transit"
+    shutil.rmtree(transit, ignore_errors=True)
+    ecrites = 0
+    try:
+        touches = set()
+        for n, lot in enumerate(lots):
+            if lot.empty or cle not in lot.columns:   # lignes sans clé : écartées par toute réduction par clé
+                continue
+            lot = lot[lot[cle].notna()]
+            cles = cle_texte(lot[cle])
+            for seau, morceau in _preparer_pour_parquet(lot.assign(**{COLONNE_CLE: cles})).groupby(
+                    seaux_de(cles, nb_seaux), sort=True):
+                rep = os.path.join(transit, f"{seau:03d}")
+                os.makedirs(rep, exist_ok=True)
+                morceau.to_parquet(os.path.join(rep, f"lot-{n:06d}.parquet"), index=False)
+                touches.add(seau)
+        for seau in sorted(touches):
+            rep = os.path.join(transit, f"{seau:03d}")
+            recues = lire_fichiers([os.path.join(rep, f) for f in sorted(os.listdir(rep))])
+            rep_seau = _rep_seau(dossier, seau)
+            fichiers = lister_fichiers_partition(rep_seau)
+            en_vigueur = _lire_seau(fichiers, filtre_cles=list(pd.unique(recues[COLONNE_CLE]))) \
+                if fichiers else recues.iloc[:0]
+            candidats = concatener([en_vigueur.assign(_en_vigueur=True), recues.assign(_en_vigueur=False)])
+            gagnants = reduire(candidats)
+            nouveaux = gagnants[~gagnants["_en_vigueur"].astype(bool)].drop(columns=["_en_vigueur"])
+            if nouveaux.empty:
+                continue
+            ecrire_table(os.path.join(rep_seau, nom_fichier()), nouveaux)
+            ecrites += len(nouveaux)
+            if len(fichiers) + 1 > MAX_FICHIERS_SEAU:
+                _fusionner_seau(rep_seau)
+    finally:
+        shutil.rmtree(transit, ignore_errors=True)
+    if description.get("nb_seaux") != nb_seaux or description.get("version") != version:
+        chemin = os.path.join(dossier, FICHIER_TABLE)
+        with open(chemin + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"nb_seaux": nb_seaux, "version": version}, f)
+        os.replace(chemin + ".tmp", chemin)
+    return ecrites
@@ -1,72 +1,176 @@
 import os
+import shutil
 import zipfile
-import win32com.client
+import itertools
+import threading
+from collections import deque
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, Future
+import numpy as np
 import pandas as pd
 from datetime import datetime
+import stockage_npai
+import lecture_csv
+import sources_mail
+import registre_npai
+import export_npai
+import progression
+import mesures_npai
+import config_npai
+import flux_npai
+import recherche_npai
 
 # ============================================================
 #                PARAMÈTRES GÉNÉRAUX
 # ============================================================
-DOSSIER_BASE = r"U:\Business Assurance\Revenue Assurance\RA_2024\FE2026\PND-NPAI\Fichiers Asterion\B2C\Etude Asterion 2025"
+DOSSIER_BASE = config_npai.dossier_base()    # partage U:\ par défaut, ou variable NPAI_DOSSIER_BASE
 DOSSIER_CSV = os.path.join(DOSSIER_BASE, "Fichiers traités")
 
 FICHIER_COLONNES = os.path.join(DOSSIER_BASE, "NPAI Léopold.xlsx")
 FICHIER_COMPLET = os.path.join(DOSSIER_BASE, "NPAI 2025.xlsx")
-FICHIER_CONSIGNE = os.path.join(DOSSIER_BASE, "Consigne_NPAI.xlsx")
+FICHIER_REGISTRE = os.path.join(DOSSIER_BASE, "registre_npai.sqlite")   # fichiers intégrés (empreinte, taille, lignes…)
+FICHIER_CONSIGNE = os.path.join(DOSSIER_BASE, "Consigne_NPAI.xlsx")      # ancienne consigne, reprise une fois dans le registre
+FICHIER_FORMATS_CSV = os.path.join(DOSSIER_BASE, "formats_csv.json")   # séparateur/encodage mémorisés par source
+
+# Stockage colonnaire = source de vérité ; les classeurs Excel ne sont plus que des exports.
+# Emplacement partagé avec l'analyse et la recherche : config_npai.DOSSIER_STORE (store_complet(),
+# store_sans_doublons()), index des contrats : config_npai.DOSSIER_INDEX_CONTRATS.
+VERSION_SANS_DOUBLONS = 4     # format de 'Sans doublons' ; une table d'une autre version est recalculée depuis 'Complet'
+EXPORTER_EXCEL = False    # True = classeurs réécrits à chaque intégration (durée proportionnelle à tout
+                          # l'historique) ; sinon étape à part : npai export, ou bouton "Exporter les classeurs"
+EXPORT_CSV_GZ = False     # en plus du classeur : NPAI 2025.csv.gz
+EXPORT_PARQUET = False    # en plus du classeur : NPAI 2025.parquet (un seul fichier)
 
 COLONNES_VOULUES = ["ENTITÉ", "TYPE DE DOCUMENT", "SCS-CONTRAT", "DATE RÉCEPTION", "DATE TRAITEMENT PND"]
+# Schéma déclaré des CSV Asterion : colonnes à peu de valeurs distinctes en catégories dès la lecture.
+# Les dates restent le texte reçu (une date invalide est conservée telle quelle) ; les autres colonnes
+# texte aux valeurs répétées sont compactées après lecture (lecture_csv.compacter).
+TYPES_COLONNES = {"ENTITÉ": "category", "TYPE DE DOCUMENT": "category",
+                  "DATE RÉCEPTION": "category", "DATE TRAITEMENT PND": "category"}
 DOSSIER_TEMP = os.path.join(DOSSIER_BASE, "tmp_zip")
+FICHIER_FILIGRANE_MAIL = os.path.join(DOSSIER_BASE, "filigrane_mail.json")   # dernier mail déjà récupéré
+NB_TELECHARGEMENTS = 4        # pièces jointes sauvées en parallèle (si la source de mails le permet)
+EXTRAIRE_CSV = False          # True = ancien mode : CSV extraits dans DOSSIER_CSV ; False = lus directement dans les ZIP
+ARCHIVER_ZIP = True           # ZIP d'origine (compressés) conservés dans DOSSIER_ARCHIVE_ZIP après intégration
+DOSSIER_ARCHIVE_ZIP = os.path.join(DOSSIER_BASE, "Archives ZIP")
 DATE_COMPARAISON = pd.Timestamp(2020, 1, 1)
+NB_PROCESSUS_LECTURE = None   # processus de lecture CSV en parallèle (None = nb de cœurs - 1, 1 = séquentiel)
+DOSSIER_RAPPORTS = os.path.join(DOSSIER_BASE, "rapports_execution")   # rapport JSON par exécution (durées, volumes, mémoire)
+BUDGET_MEMOIRE_MO = None      # CSV lus gardés en mémoire avant intégration au stockage (None = tous, intégrés à la fin)
+INDEXER_CONTRATS = True       # index des contrats (recherche_npai) mis à jour après chaque intégration
+TAILLE_FILE_ETAGES = 8        # ZIP / CSV en attente entre deux étages du pipeline (au-delà, l'étage amont attend)
+
+def configurer(dossier_base):
+    """Redirige vers `dossier_base` tous les chemins définis sous DOSSIER_BASE (et les chemins partagés)."""
+    config_npai.configurer(globals(), dossier_base)
 
 # ============================================================
-#         1. CHARGER OU CRÉER LA CONSIGNE
+#         1. REGISTRE D'INTÉGRATION
 # ============================================================
-def charger_consigne():
-    if os.path.exists(FICHIER_CONSIGNE):
-        return pd.read_excel(FICHIER_CONSIGNE)
-    else:
-        return pd.DataFrame(columns=["Date", "Fichier", "Statut"])
+def ouvrir_registre():
+    return registre_npai.ouvrir(FICHIER_REGISTRE, consigne_xlsx=FICHIER_CONSIGNE)
 
 # ============================================================
-#         2. RÉCUPÉRER LES ZIP DANS OUTLOOK
+#         2. RÉCUPÉRER LES ZIP DANS OUTLOOK (ou autre source de mails)
 # ============================================================
-def telecharger_zip_outlook():
-    print("📩 Connexion à Outlook…")
-    outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
+def _nom_libre(nom, noms_pris):
+    """Évite d'écraser une pièce jointe homonyme (envoi renouvelé sous le même nom)."""
+    racine, ext = os.path.splitext(nom)
+    candidat, n = nom, 1
+    while candidat in noms_pris:
+        n += 1
+        candidat = f"{racine}_{n}{ext}"
+    return candidat
 
-    destinataire = outlook.CreateRecipient("SFR-RA-NPAI@sfr.com")
-    destinataire.Resolve()
-    if not destinataire.Resolved:
-        raise Exception("❌ Impossible de trouver la boîte mail partagée SFR-RA-NPAI.")
-
-    inbox = outlook.GetSharedDefaultFolder(destinataire, 6)  # 6 = Boîte de réception
+@mesures_npai.mesurer("telechargement_mail")
+def telecharger_zip_outlook(source=None, au_fil_de_l_eau=None):
+    """
+    Sauve dans DOSSIER_TEMP les ZIP des messages reçus depuis le filigrane (FICHIER_FILIGRANE_MAIL),
+    puis avance le filigrane. `source` : source de mails (par défaut la boîte partagée Outlook).
+    Chaque pièce jointe est sauvée dès que son message est parcouru. `au_fil_de_l_eau(chemin_zip)` :
+    appelée pour chaque ZIP dès qu'il est disponible (ceux restés d'un lancement interrompu d'abord).
+    Renvoie tous les ZIP présents dans DOSSIER_TEMP (y compris ceux restés d'un lancement interrompu).
+    """
+    source = source or sources_mail.SourceOutlook()
+    progression.signaler("Récupération des mails")
     os.makedirs(DOSSIER_TEMP, exist_ok=True)
+    depuis, ids_filigrane = sources_mail.charger_filigrane(FICHIER_FILIGRANE_MAIL)
+    noms_pris = set(os.listdir(DOSSIER_TEMP))
+    if au_fil_de_l_eau is not None:
+        for fichier in sorted(f for f in noms_pris if f.lower().endswith(".zip")):
+            au_fil_de_l_eau(os.path.join(DOSSIER_TEMP, fichier))
 
-    nouveaux_fichiers = []
-    for message in inbox.Items:
+    def sauver(piece, chemin_zip):
         try:
-            if message.Attachments.Count > 0:
-                for att in message.Attachments:
-                    if att.FileName.lower().endswith(".zip"):
-                        chemin_zip = os.path.join(DOSSIER_TEMP, att.FileName)
-                        if not os.path.exists(chemin_zip):
-                            att.SaveAsFile(chemin_zip)
-                            print(f"📥 ZIP téléchargé : {att.FileName}")
-                            nouveaux_fichiers.append(chemin_zip)
+            piece.sauver(chemin_zip)
+            print(f"📥 ZIP téléchargé : {piece.nom}")
+            return True
         except Exception as e:
-            print(f"⚠️ Erreur lecture mail : {e}")
+            print(f"⚠️ Erreur sauvegarde {piece.nom} : {e}")
+            return False
+
+    # Sauvegardes en cours, transmises dans l'ordre des messages dès qu'elles sont terminées
+    # (hors du try de sauver : un arrêt de la chaîne remonte jusqu'ici)
+    ok, octets, en_cours = [], 0, deque()
+    def suivre(jusqu_au_bout=False):
+        nonlocal octets
+        while en_cours and (jusqu_au_bout or en_cours[0][1].done()):
+            chemin_zip, resultat = en_cours.popleft()
+            ok.append(resultat.result())
+            progression.signaler("Téléchargement des pièces jointes", len(ok))
+            if ok[-1]:
+                octets += mesures_npai.taille_fichier(chemin_zip)
+                if au_fil_de_l_eau is not None:
+                    au_fil_de_l_eau(chemin_zip)
 
-    return nouveaux_fichiers
+    pool = None
+    if source.sauvegarde_concurrente:
+        pool = ThreadPoolExecutor(max_workers=NB_TELECHARGEMENTS,
+                                  thread_name_prefix=f"{threading.current_thread().name}/telechargement")
+    try:
+        dernier, ids_dernier = depuis, set(ids_filigrane)
+        for message in source.messages(depuis):
+            if message.recu_le == depuis and message.identifiant in ids_filigrane:
+                continue
+            for piece in message.pieces_jointes:
+                if piece.nom and piece.nom.lower().endswith(".zip"):
+                    nom = _nom_libre(piece.nom, noms_pris)
+                    noms_pris.add(nom)
+                    chemin_zip = os.path.join(DOSSIER_TEMP, nom)
+                    if pool is not None:
+                        resultat = pool.submit(sauver, piece, chemin_zip)
+                    else:   # sauvée dans le thread appelant, suivie comme une sauvegarde terminée
+                        resultat = Future()
+                        resultat.set_result(sauver(piece, chemin_zip))
+                    en_cours.append((chemin_zip, resultat))
+                    suivre()
+            if dernier is None or message.recu_le > dernier:
+                dernier, ids_dernier = message.recu_le, set()
+            ids_dernier.add(message.identifiant)
+        suivre(jusqu_au_bout=True)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    # Filigrane avancé seulement si tout a été sauvé (sinon ces messages seront repris au prochain lancement)
+    if dernier is not None and all(ok):
+        sources_mail.sauver_filigrane(FICHIER_FILIGRANE_MAIL, dernier, ids_dernier)
+    mesures_npai.compter(lignes_sortie=sum(ok), octets_ecrits=octets)
+
+    return sorted(os.path.join(DOSSIER_TEMP, f) for f in os.listdir(DOSSIER_TEMP) if f.lower().endswith(".zip"))
 
 # ============================================================
-#         3. DÉZIPPER LES NOUVEAUX FICHIERS
+#         3. DÉZIPPER / LIRE LES NOUVEAUX FICHIERS
 # ============================================================
+@mesures_npai.mesurer("extraction_zip")
 def extraire_zip(fichiers_zip):
+    """Ancien mode (EXTRAIRE_CSV) : extraction des CSV dans DOSSIER_CSV puis suppression du ZIP."""
     csv_extraits = []
     os.makedirs(DOSSIER_CSV, exist_ok=True)
 
     for fichier_zip in fichiers_zip:
         try:
+            mesures_npai.compter(octets_lus=mesures_npai.taille_fichier(fichier_zip))
             with zipfile.ZipFile(fichier_zip, "r") as zip_ref:
                 zip_ref.extractall(DOSSIER_CSV)
                 csv_extraits.extend(zip_ref.namelist())
@@ -74,90 +178,373 @@ def extraire_zip(fichiers_zip):
             os.remove(fichier_zip)
         except Exception as e:
             print(f"⚠️ Erreur sur {fichier_zip} : {e}")
+    mesures_npai.compter(lignes_sortie=len(csv_extraits))
     return csv_extraits
 
+@mesures_npai.mesurer("liste_zip")
+def lister_csv_zip(fichiers_zip):
+    """Membres CSV des ZIP, à lire directement dans l'archive (aucune extraction sur le partage)."""
+    sources = []
+    for fichier_zip in fichiers_zip:
+        try:
+            sources.extend(lecture_csv.sources_zip(fichier_zip))
+        except Exception as e:
+            print(f"⚠️ Erreur sur {fichier_zip} : {e}")
+    return sources
+
+def archiver_zip(fichiers_zip):
+    """Après intégration : ZIP compressé déplacé dans DOSSIER_ARCHIVE_ZIP (ou supprimé si ARCHIVER_ZIP=False)."""
+    if ARCHIVER_ZIP:
+        os.makedirs(DOSSIER_ARCHIVE_ZIP, exist_ok=True)
+    for fichier_zip in fichiers_zip:
+        try:
+            if not ARCHIVER_ZIP:
+                os.remove(fichier_zip)
+                continue
+            cible = os.path.join(DOSSIER_ARCHIVE_ZIP, os.path.basename(fichier_zip))
+            if os.path.exists(cible):
+                racine, ext = os.path.splitext(cible)
+                cible = f"{racine}_{datetime.now():%Y%m%d%H%M%S}{ext}"
+            shutil.move(fichier_zip, cible)
+            print(f"🗃️ ZIP archivé : {os.path.basename(cible)}")
+        except Exception as e:
+            print(f"⚠️ Erreur archivage {fichier_zip} : {e}")
+
 # ============================================================
-#         4. METTRE À JOUR LES AGRÉGATS
+#         4. ÉTAT PERSISTANT DES AGRÉGATS
 # ============================================================
-def maj_aggregats(reconstruction_totale=False):
-    df_log = charger_consigne()
-    dfs_colonnes, dfs_complet = [], []
+def etat_existe():
+    return (bool(stockage_npai.lister_partitions(config_npai.store_complet()))
+            and stockage_npai.version_seaux(config_npai.store_sans_doublons()) == VERSION_SANS_DOUBLONS)
 
-    fichiers_a_traiter = []
-    for fichier in os.listdir(DOSSIER_CSV):
-        if fichier.lower().endswith(".csv"):
-            if reconstruction_totale or fichier not in df_log["Fichier"].values:
-                fichiers_a_traiter.append(fichier)
+def recalculer_sans_doublons():
+    """
+    'Sans doublons' recalculé depuis le stockage 'Complet', sans relire aucun CSV (table absente, ou
+    d'un format antérieur : sans_doublons.parquet, seaux d'une autre version). Les lignes sont parcourues
+    partition par partition, dans l'ordre d'écriture : à écart égal, le gagnant est le même qu'à
+    l'intégration. La table est construite à côté, puis mise en place (un recalcul interrompu est
+    simplement repris à l'exécution suivante).
+    """
+    print("ℹ️ Table 'Sans doublons' absente ou d'un format antérieur : recalcul depuis le stockage 'Complet'")
+    store_sans_doublons = config_npai.store_sans_doublons()
+    cible = store_sans_doublons + ".reconstruction"
+    stockage_npai.vider_store(cible)
+    vues = stockage_npai.iterer_store(config_npai.store_complet(), COLONNES_VOULUES)
+    stockage_npai.reduire_par_seaux(cible, vues, "SCS-CONTRAT", reduire_sans_doublons,
+                                    version=VERSION_SANS_DOUBLONS)
+    nb = stockage_npai.nb_lignes_seaux(cible)
+    stockage_npai.vider_store(store_sans_doublons)
+    os.replace(cible, store_sans_doublons)
+    ancien = os.path.join(config_npai.DOSSIER_STORE, "sans_doublons.parquet")   # format d'avant les seaux
+    if os.path.exists(ancien):
+        os.remove(ancien)
+    print(f"✅ 'Sans doublons' recalculé : {nb} contrats")
 
-    for fichier in fichiers_a_traiter:
-        chemin = os.path.join(DOSSIER_CSV, fichier)
-        print(f"📑 Lecture du CSV : {fichier}")
+def reduire_sans_doublons(candidats):
+    """
+    Une seule ligne par SCS-CONTRAT : celle dont la DATE TRAITEMENT PND est la plus proche
+    de DATE_COMPARAISON (une date illisible est la plus éloignée). Les dates sont lues valeur par valeur
+    (même résultat quel que soit le lot). Réduction par contrat, sans tri : à écart égal, la première
+    ligne rencontrée (l'ancien gagnant, placé en tête des candidats) est conservée ; les gagnants
+    gardent l'ordre des candidats. Les contrats sont comparés en texte (123, 123.0 et "123" sont le même
+    contrat, comme " 123") ; la colonne SCS-CONTRAT garde le type lu.
+    """
+    candidats = candidats.dropna(subset=["SCS-CONTRAT", "DATE TRAITEMENT PND"]).reset_index(drop=True)
+    if candidats.empty:
+        return candidats
+    ecart = (stockage_npai.lire_dates(candidats["DATE TRAITEMENT PND"]) - DATE_COMPARAISON).abs()
+    ecart = ecart.fillna(pd.Timedelta.max)
+    cles = (candidats[stockage_npai.COLONNE_CLE] if stockage_npai.COLONNE_CLE in candidats.columns
+            else stockage_npai.cle_texte(candidats["SCS-CONTRAT"]))
+    contrats = pd.factorize(cles)[0]
+    gagnants = ecart.groupby(contrats, sort=False).idxmin().to_numpy()
+    garder = np.zeros(len(candidats), dtype=bool)
+    garder[gagnants] = True
+    return candidats[garder]
 
-        try:
-            df = pd.read_csv(chemin, encoding="utf-8", sep=None, engine="python")
-        except UnicodeDecodeError:
-            df = pd.read_csv(chemin, encoding="latin1", sep=None, engine="python")
-        except Exception as e:
-            print(f"⚠️ Erreur lecture {fichier} : {e}")
-            continue
+# ============================================================
+#         5. METTRE À JOUR LES AGRÉGATS
+# ============================================================
+@mesures_npai.mesurer("maj_aggregats")
+def maj_aggregats(reconstruction_totale=False, sources=()):
+    """
+    Mode incrémental (par défaut) : seuls les CSV absents du registre sont lus, puis fusionnés
+    dans l'état persistant ('Complet' et 'Sans doublons'). Le gagnant par SCS-CONTRAT est recalculé
+    uniquement entre l'ancien gagnant et les nouvelles lignes.
+    sources : CSV supplémentaires (ex. membres des ZIP du jour, lus sans extraction), en liste ou
+    alimentés au fil de l'eau par un autre étage (file du pipeline). Un contenu dont l'empreinte
+    figure déjà dans le registre est ignoré, quel que soit son nom.
+    reconstruction_totale=True : relit tous les CSV (dossier + ZIP archivés) et reconstruit l'état depuis zéro ;
+    les lignes des fichiers qui ne sont plus relisibles (ZIP non archivés, CSV non extraits) sont reprises
+    de l'ancien stockage, jamais perdues.
+    Le stockage n'est jamais remplacé sans reconstruction_totale explicite : s'il ne manque que la table
+    'Sans doublons', elle est recalculée depuis 'Complet'.
+    """
+    with closing(ouvrir_registre()) as registre:
+        _maj_aggregats(registre, reconstruction_totale, sources)
 
-        colonnes_dispo = [col for col in COLONNES_VOULUES if col in df.columns]
-        dfs_colonnes.append(df[colonnes_dispo])
-        dfs_complet.append(df)
+def _integrer_lot(dfs, store_complet, store_sans_doublons):
+    """
+    Intègre des CSV lus : lignes ajoutées au stockage 'Complet', puis gagnants par contrat mis à jour
+    dans 'Sans doublons'. La vue étroite (COLONNES_VOULUES) est prise fichier par fichier au moment
+    de la réduction, jamais gardée en double pour tout le lot. Renvoie le nombre de lignes ajoutées.
+    """
+    progression.signaler("Mise à jour du stockage")
+    nb = 0
+    if dfs:
+        with mesures_npai.etape("stockage"):
+            nb = stockage_npai.ajouter_lignes(store_complet, dfs)
+            mesures_npai.compter(lignes_entree=sum(len(d) for d in dfs), lignes_sortie=nb)
 
-        # Mise à jour log
-        df_log = pd.concat([
-            df_log,
-            pd.DataFrame([[datetime.today().date(), fichier, "X"]],
-                         columns=["Date", "Fichier", "Statut"])
-        ], ignore_index=True)
+    # "Sans doublons" = une seule ligne par SCS-CONTRAT, avec date la plus proche de DATE_COMPARAISON.
+    # Table en seaux par contrat : dans chaque seau touché, seuls les gagnants des contrats reçus sont
+    # relus et comparés aux nouvelles lignes ; seuls les gagnants qui changent sont écrits.
+    with mesures_npai.etape("sans_doublons"):
+        vues = (d[[col for col in COLONNES_VOULUES if col in d.columns]] for d in dfs)
+        nb_sd = stockage_npai.reduire_par_seaux(store_sans_doublons, vues, "SCS-CONTRAT", reduire_sans_doublons,
+                                                version=VERSION_SANS_DOUBLONS)
+        mesures_npai.compter(lignes_entree=sum(len(d) for d in dfs), lignes_sortie=nb_sd)
+    return nb
 
-    if dfs_colonnes:
-        fusion_colonnes = pd.concat(dfs_colonnes, ignore_index=True)
+def _reprendre_non_relus(relus, store_complet, store_sans_doublons):
+    """
+    Reconstruction : lignes de l'ancien stockage dont le fichier d'origine n'a pas été relu (ou d'origine
+    inconnue) reprises dans le nouveau, mois par mois. Une ligne aussi présente dans un fichier relu
+    n'est pas ajoutée deux fois. Renvoie (lignes reprises, fichiers d'origine concernés).
+    """
+    nb, origines = 0, set()
+    for _, df in stockage_npai.iterer_partitions(config_npai.store_complet()):
+        if stockage_npai.COLONNE_SOURCE in df.columns:
+            source = df[stockage_npai.COLONNE_SOURCE]
+            df = df[source.isna().to_numpy() | ~source.isin(relus).to_numpy()]
+            origines.update(df[stockage_npai.COLONNE_SOURCE].dropna().unique())
+        if not df.empty:
+            nb += _integrer_lot([df], store_complet, store_sans_doublons)
+    return nb, origines
 
-        # Onglet principal = toutes les colonnes demandées
-        fusion_colonnes_clean = fusion_colonnes.drop_duplicates()
+def _maj_aggregats(registre, reconstruction_totale, sources):
+    if not reconstruction_totale and not etat_existe():
+        if stockage_npai.lister_partitions(config_npai.store_complet()):
+            # Les CSV déjà intégrés ne sont plus tous relisibles (ZIP lus sans extraction, puis supprimés
+            # si ARCHIVER_ZIP = False) : le stockage est la seule copie de l'historique.
+            recalculer_sans_doublons()
+        else:
+            print("ℹ️ Aucun état enregistré : reconstruction totale")
+            reconstruction_totale = True
 
-        # Onglet "Sans doublons" = une seule ligne par SCS-CONTRAT, avec date la plus proche de DATE_COMPARAISON
-        sans_doublons = (
-            fusion_colonnes
-            .dropna(subset=["SCS-CONTRAT", "DATE TRAITEMENT PND"])
-            .assign(Diff=lambda x: (pd.to_datetime(x["DATE TRAITEMENT PND"], errors="coerce") - DATE_COMPARAISON).abs())
-            .sort_values("Diff")
-            .drop_duplicates(subset=["SCS-CONTRAT"], keep="first")
-            .drop(columns=["Diff"])
-        )
+    if reconstruction_totale:
+        connus, deja_vus = set(), set()
+        integres_avant = registre_npai.empreintes_integrees(registre)
+    else:
+        connus = registre_npai.fichiers_connus(registre)
+        deja_vus = registre_npai.empreintes_integrees(registre)
+    formats_csv = lecture_csv.charger_formats(FICHIER_FORMATS_CSV)
+
+    a_lire, dates_modification = [], {}
+    if os.path.isdir(DOSSIER_CSV):
+        for fichier in sorted(os.listdir(DOSSIER_CSV)):
+            if fichier.lower().endswith(".csv"):
+                chemin = os.path.join(DOSSIER_CSV, fichier)
+                # même nom, même taille et même date de modification qu'un fichier intégré => non relu
+                infos = os.stat(chemin)
+                if (fichier, infos.st_size, infos.st_mtime_ns) in connus:
+                    continue
+                dates_modification[chemin] = infos.st_mtime_ns
+                a_lire.append(lecture_csv.source_fichier(chemin))
+    if reconstruction_totale and os.path.isdir(DOSSIER_ARCHIVE_ZIP):
+        archives = sorted(f for f in os.listdir(DOSSIER_ARCHIVE_ZIP) if f.lower().endswith(".zip"))
+        a_lire.extend(lister_csv_zip([os.path.join(DOSSIER_ARCHIVE_ZIP, f) for f in archives]))
+    total = len(a_lire) + len(sources) if hasattr(sources, "__len__") else None   # inconnu en flux
+
+    # Reconstruction : le nouvel état est construit à côté de l'ancien, qui n'est remplacé qu'une fois
+    # toutes les lignes intégrées (une reconstruction interrompue laisse l'état précédent intact).
+    dossier_store = config_npai.DOSSIER_STORE
+    if reconstruction_totale:
+        dossier_store += ".reconstruction"
+        stockage_npai.vider_store(dossier_store)
+    store_complet = config_npai.store_complet(dossier_store)
+    store_sans_doublons = config_npai.store_sans_doublons(dossier_store)
+
+    # Les CSV lus s'accumulent dans un lot, intégré au stockage (sur disque) dès que sa taille
+    # dépasse BUDGET_MEMOIRE_MO, puis à la fin de la lecture.
+    lot, taille_lot, nb_lus, nb_nouvelles = [], 0, 0, 0
+    with mesures_npai.etape("lecture_csv"):
+        entrees_registre, vus_sans_date = [], []
+        progression.signaler("Lecture des CSV", 0, total)
+        resultats = lecture_csv.lire_plusieurs(itertools.chain(a_lire, sources), formats_csv,
+                                               nb_processus=NB_PROCESSUS_LECTURE, deja_vus=deja_vus,
+                                               types=TYPES_COLONNES)
+        for i, res in enumerate(resultats, start=1):
+            progression.signaler("Lecture des CSV", i, total)
+            mesures_npai.compter(octets_lus=res.taille)
+            fichier = res.source.nom
+            date_modification = dates_modification.get(res.source.chemin)   # CSV du dossier seulement
+            entree = {"fichier": fichier, "empreinte": res.empreinte, "origine": res.source.chemin,
+                      "taille": res.taille, "date_modification": date_modification,
+                      "duree_lecture": round(res.duree, 3)}
+            if res.erreur is not None:
+                print(f"⚠️ Erreur lecture {fichier} : {res.erreur}")
+                entrees_registre.append({**entree, "statut": registre_npai.STATUT_ERREUR})
+                continue
+            if res.df is None:
+                print(f"⏭️ Contenu déjà intégré : {fichier}")
+                if date_modification is not None:
+                    vus_sans_date.append((res.empreinte, fichier, date_modification))
+                continue
+            print(f"📑 CSV lu : {fichier}")
+            mesures_npai.compter(lignes_sortie=len(res.df))
+
+            df = res.df
+            # origine de chaque ligne : catégorie unique (1 octet par ligne au lieu de 64 caractères)
+            df[stockage_npai.COLONNE_SOURCE] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8),
+                                                                         categories=[res.empreinte])
+            lot.append(df)
+            taille_lot += int(df.memory_usage(deep=True).sum())
+            nb_lus += 1
+            entrees_registre.append({**entree, "nb_lignes": len(df), "statut": registre_npai.STATUT_INTEGRE})
+            del df, res
+            if BUDGET_MEMOIRE_MO and taille_lot > BUDGET_MEMOIRE_MO * 2**20:
+                print(f"💾 Budget mémoire atteint ({taille_lot / 2**20:.0f} Mo) : intégration de {len(lot)} CSV")
+                nb_nouvelles += _integrer_lot(lot, store_complet, store_sans_doublons)
+                lot, taille_lot = [], 0
+
+    lecture_csv.sauver_formats(FICHIER_FORMATS_CSV, formats_csv)
+    if vus_sans_date and not reconstruction_totale:
+        registre_npai.noter_dates_modification(registre, vus_sans_date)
+
+    if not nb_lus and not reconstruction_totale:
+        registre_npai.enregistrer(registre, entrees_registre)
+        print("ℹ️ Aucun nouveau CSV : agrégats inchangés")
+        return
+
+    # Fusion des nouveaux fichiers dans le stockage (seules les empreintes des partitions touchées sont relues)
+    nb_nouvelles += _integrer_lot(lot, store_complet, store_sans_doublons)
+    del lot
+    if nb_lus:
+        print(f"🗄️ {nb_nouvelles} nouvelles lignes dans le stockage")
+
+    non_relus = set()
+    if reconstruction_totale:
+        # Seuls DOSSIER_CSV et DOSSIER_ARCHIVE_ZIP sont relus : l'historique venu d'ailleurs (ZIP lus sans
+        # extraction puis supprimés) n'existe plus que dans l'ancien stockage.
+        relus = {e["empreinte"] for e in entrees_registre if e["statut"] == registre_npai.STATUT_INTEGRE}
+        nb_repris, origines = _reprendre_non_relus(relus, store_complet, store_sans_doublons)
+        non_relus = (integres_avant - relus) | origines
+        if nb_repris:
+            print(f"♻️ {nb_repris} lignes reprises de l'ancien stockage ({len(origines)} fichiers non relus)")
+        stockage_npai.vider_store(config_npai.DOSSIER_STORE)
+        os.replace(dossier_store, config_npai.DOSSIER_STORE)
+
+    if EXPORTER_EXCEL:
+        exporter_excel()
 
-        with pd.ExcelWriter(FICHIER_COLONNES, engine="openpyxl") as writer:
-            fusion_colonnes_clean.to_excel(writer, sheet_name="Complet", index=False)
-            sans_doublons.to_excel(writer, sheet_name="Sans doublons", index=False)
+    if reconstruction_totale:
+        registre_npai.vider(registre, garder=non_relus)
+    registre_npai.enregistrer(registre, entrees_registre)
+    print(f"📝 Registre mis à jour")
 
-        print(f"✅ NPAI Léopold mis à jour avec feuille 'Sans doublons'")
+    # Index dérivé du stockage : en cas d'échec, il sera complété (ou reconstruit) à la prochaine mise à jour
+    if INDEXER_CONTRATS:
+        try:
+            recherche_npai.mettre_a_jour_index(config_npai.store_complet(), config_npai.DOSSIER_INDEX_CONTRATS)
+        except Exception as e:
+            print(f"⚠️ Index des contrats non mis à jour : {e}")
+
+# ============================================================
+#         6. EXPORTS (depuis le stockage, en flux)
+# ============================================================
+@mesures_npai.mesurer("exports")
+def exporter_excel():
+    """
+    Exports écrits en flux depuis le stockage : la mémoire utilisée dépend de la taille d'un lot
+    (ou d'un mois pour la vue 'Complet'), pas du volume total. Au-delà de la limite d'Excel,
+    les lignes continuent sur une feuille "Nom (2)".
+    """
+    progression.signaler("Exports Excel")
+    store_complet = config_npai.store_complet()
+    store_sans_doublons = config_npai.store_sans_doublons()
+    tout = stockage_npai.colonnes_store(store_complet)
+    internes = set(stockage_npai.colonnes_internes(tout))
+    colonnes = [c for c in tout if c not in internes]
+    colonnes_etroites = [col for col in COLONNES_VOULUES if col in colonnes]
 
-    if dfs_complet:
-        fusion_complet = pd.concat(dfs_complet, ignore_index=True)
-        fusion_complet.drop_duplicates(inplace=True)
-        fusion_complet.to_excel(FICHIER_COMPLET, index=False, engine="openpyxl")
-        print(f"✅ NPAI 2025 mis à jour")
+    def complet_etroit():
+        # Onglet principal = toutes les colonnes demandées. Deux lignes identiques ont la même
+        # DATE TRAITEMENT PND, donc la même partition : dédoublonner mois par mois suffit.
+        for _, df in stockage_npai.iterer_partitions(store_complet, colonnes_etroites):
+            yield df.drop_duplicates()
 
-    df_log.drop_duplicates(subset=["Fichier"], inplace=True)
-    df_log.to_excel(FICHIER_CONSIGNE, index=False)
-    print(f"📝 Consigne mise à jour")
+    tout_sd = stockage_npai.colonnes_seaux(store_sans_doublons)
+    colonnes_sd = [c for c in tout_sd if c not in stockage_npai.colonnes_internes(tout_sd)] or COLONNES_VOULUES
+    export_npai.ecrire_classeur(FICHIER_COLONNES, [
+        ("Complet", colonnes_etroites, complet_etroit()),
+        ("Sans doublons", colonnes_sd, stockage_npai.iterer_seaux(store_sans_doublons, colonnes_sd)),
+    ])
+    print(f"✅ NPAI Léopold mis à jour avec feuille 'Sans doublons'")
+
+    def complet():
+        return stockage_npai.iterer_store(store_complet, colonnes)
+
+    export_npai.ecrire_classeur(FICHIER_COMPLET, [("Sheet1", colonnes, complet())])
+    print(f"✅ NPAI 2025 mis à jour")
+
+    racine = os.path.splitext(FICHIER_COMPLET)[0]
+    if EXPORT_CSV_GZ:
+        export_npai.ecrire_csv_gz(racine + ".csv.gz", colonnes, complet())
+        print(f"✅ {os.path.basename(racine)}.csv.gz écrit")
+    if EXPORT_PARQUET:
+        export_npai.ecrire_parquet(racine + ".parquet", colonnes, complet())
+        print(f"✅ {os.path.basename(racine)}.parquet écrit")
 
 # ============================================================
-#             5. PIPELINE GLOBAL
+#             7. PIPELINE GLOBAL
 # ============================================================
-def pipeline(reconstruction_totale=False):
+# Trois étages en parallèle, reliés par des files bornées (flux_npai) :
+#   téléchargement (thread appelant : les objets COM d'Outlook restent dans leur appartement)
+#   -> extraction (ouverture de chaque ZIP dès qu'il est sauvé)
+#   -> lecture et intégration (chaque CSV part au pool de lecture dès qu'il est listé).
+# La durée totale tend vers celle de l'étage le plus lent au lieu de la somme des trois.
+# Ancien mode EXTRAIRE_CSV : maj_aggregats relit DOSSIER_CSV, l'intégration attend donc la fin
+# de l'extraction (seuls téléchargement et extraction se recouvrent).
+
+def _etage_extraction(zips, csv_prets, traites):
+    """Chaque ZIP reçu est ouvert (ou extrait) ; ses CSV passent aussitôt à la lecture."""
+    with mesures_npai.etape("extraction"):
+        for fichier_zip in zips:
+            if EXTRAIRE_CSV:
+                extraire_zip([fichier_zip])
+            else:
+                for source in lister_csv_zip([fichier_zip]):
+                    csv_prets.mettre(source)
+            traites.append(fichier_zip)
+    if csv_prets is not None:
+        csv_prets.fermer()
+
+def pipeline(reconstruction_totale=False, source_mail=None):
     print("=== DÉMARRAGE DU PROCESS ===")
-    fichiers_zip = telecharger_zip_outlook()
-    if fichiers_zip:
-        extraire_zip(fichiers_zip)
-    maj_aggregats(reconstruction_totale=reconstruction_totale)
+    with mesures_npai.execution("pipeline", DOSSIER_RAPPORTS, {"reconstruction_totale": reconstruction_totale}):
+        chaine = flux_npai.Chaine()
+        zips = chaine.file(TAILLE_FILE_ETAGES)
+        csv_prets = None if EXTRAIRE_CSV else chaine.file(TAILLE_FILE_ETAGES)
+        fichiers_zip = []
+        chaine.lancer("extraction", _etage_extraction, zips, csv_prets, fichiers_zip)
+        if csv_prets is not None:
+            chaine.lancer("integration", maj_aggregats, reconstruction_totale=reconstruction_totale,
+                          sources=csv_prets)
+        with chaine.etage():
+            telecharger_zip_outlook(source_mail, au_fil_de_l_eau=zips.mettre)
+            zips.fermer()
+        chaine.attendre()
+        if EXTRAIRE_CSV:
+            maj_aggregats(reconstruction_totale=reconstruction_totale)
+        elif fichiers_zip:
+            progression.signaler("Archivage des ZIP")
+            archiver_zip(fichiers_zip)
     print("=== PROCESS TERMINÉ ✅ ===")
 
 # ============================================================
 #             LANCEMENT DU SCRIPT
 # ============================================================
 if __name__ == "__main__":
-    # Première exécution = reconstruire depuis zéro
-    pipeline(reconstruction_totale=True)
+    # Première exécution (aucun état enregistré) = reconstruction automatique depuis zéro
+    pipeline()